@@ -0,0 +1,618 @@
+"""
+acquisition_classes.py
+
+Purpose:  read PLC tags once per cycle, detect changed values once, and
+          pass that single snapshot of [TagName,Value,Timestamp]
+          triplets to every logger from logger_classes.py
+
+          Timestamps are UTC datetime.datetime instances, with
+          microseconds, taken once per cycle when the PLC replies, from
+          a wall clock anchored to the monotonic clock; each logger
+          formats them to its own native type
+
+"""
+import re
+import time
+import datetime
+import concurrent.futures
+import metrics_classes as MC
+
+########################################################################
+########################################################################
+
+class PYLOGIX_CLOCK:
+    """
+UTC wall-clock time that advances with the monotonic clock, so a step of
+the system clock e.g. by NTP cannot reorder logged data
+
+"""
+
+    EPOCH = datetime.datetime(1970,1,1)
+
+    ################################
+    def __init__(self,*args
+                ,wall=time.time
+                ,monotonic=time.monotonic
+                ,**kwargs
+                ):
+        """
+     wall:  wall clock function, s since epoch; read once, as anchor
+monotonic:  monotonic clock function, s
+
+"""
+        self.monotonic = monotonic
+        self.t_anchor = monotonic()
+        self.anchor = self.EPOCH + datetime.timedelta(seconds=wall())
+
+    ################################
+    def __call__(self):
+        """Return current UTC time as naive datetime.datetime"""
+        return self.anchor + datetime.timedelta(
+                               seconds=self.monotonic() - self.t_anchor
+                             )
+
+### Clock shared by all acquisition stages, by default
+CLOCK = PYLOGIX_CLOCK()
+
+########################################################################
+########################################################################
+
+class PYLOGIX_LOGIX_READER:
+    """Read list of tags from Logix PLC with one pylogix .Read call"""
+
+    ################################
+    def __init__(self,comm,tags,*args,**kwargs):
+        """
+comm:  open pylogix.PLC instance
+tags:  sequence of PLC tag names
+
+"""
+        self.comm = comm
+        self.tags = list(tags)
+
+    ################################
+    def __call__(self):
+        """
+Return pylogix element list, each with .TagName and .Value attributes
+
+- Older pylogix versions return one Response with .Value as the list
+
+"""
+        rtn = self.comm.Read(self.tags)
+        return rtn if isinstance(rtn,list) else rtn.Value
+
+    ################################
+    def close(self): pass
+
+########################################################################
+########################################################################
+
+class PYLOGIX_CHUNKED_READER:
+    """Read long list of tags from Logix PLC in packet-sized groups,
+spread across parallel sessions"""
+
+    ### Multi-service packet overheads, bytes, as estimated by pylogix
+    SEND_OVERHEAD,RECEIVE_OVERHEAD = 30,28
+
+    rgx_index = re.compile(r'\[[^\]]*\]')
+
+    ################################
+    def __init__(self,comm,tags,*args
+                ,sessions=1
+                ,make_comm=None
+                ,connection_size=None
+                ,value_bytes=8
+                ,**kwargs
+                ):
+        """
+           comm:  open pylogix.PLC instance
+           tags:  sequence of PLC tag names
+       sessions:  number of parallel sessions
+      make_comm:  function returning a new pylogix.PLC instance, for
+                  sessions after the first; required if sessions > 1
+connection_size:  CIP connection size, bytes, to request; None => let
+                  pylogix try Large Forward Open (4002), then 504
+    value_bytes:  estimated reply size, bytes, of each tag value; use
+                  88 if many tags are STRINGs or structures
+
+Groups are sized from the connection size negotiated by the first
+session on the first read, so that each group fits in one request and
+one reply; groups are dealt to sessions in turn, each session reads
+its groups in order on its own thread, and results are rejoined in tag
+order
+
+"""
+        self.tags = list(tags)
+        self.sessions = max([1,int(sessions)])
+        self.comms = [comm] + [make_comm()
+                               for i in range(self.sessions-1)
+                              ]
+        self.connection_size = connection_size
+        if connection_size:
+            for c in self.comms: c.ConnectionSize = int(connection_size)
+        self.value_bytes = int(value_bytes)
+        self.groups = None
+
+        self.pool = None
+        if self.sessions > 1:
+            self.pool = concurrent.futures.ThreadPoolExecutor(
+                          max_workers=self.sessions
+                         ,thread_name_prefix='logix'
+                        )
+
+    ################################
+    def request_bytes(self,tag):
+        """Estimate size, bytes, of read service for tag in request"""
+        ioi = 0
+        for segment in self.rgx_index.sub('',tag).split('.'):
+            ioi += 2 + len(segment) + (len(segment) & 1)
+        ioi += 4 * len(self.rgx_index.findall(tag))
+        return 2 + ioi + 2 + 2         ### Service; IOI; count; offset
+
+    ################################
+    def reply_bytes(self,tag):
+        """Estimate size, bytes, of reply for tag"""
+        return 4 + 2 + self.value_bytes + 2
+
+    ################################
+    def make_groups(self):
+        """Split tags into groups that fit the negotiated connection"""
+
+        ### Read one tag to open connection, and negotiate its size; ask
+        ### for that same size on the other sessions
+        if not self.connection_size: self.comms[0].Read(self.tags[0])
+        size = self.comms[0].ConnectionSize
+        for comm in self.comms[1:]: comm.ConnectionSize = size
+
+        self.groups,group = list(),list()
+        send,receive = self.SEND_OVERHEAD,self.RECEIVE_OVERHEAD
+        for tag in self.tags:
+            nsend,nreceive = self.request_bytes(tag),self.reply_bytes(tag)
+            if group and (send + nsend >= size or receive + nreceive >= size):
+                self.groups.append(group)
+                group = list()
+                send,receive = self.SEND_OVERHEAD,self.RECEIVE_OVERHEAD
+            group.append(tag)
+            send += nsend
+            receive += nreceive
+        if group: self.groups.append(group)
+
+    ################################
+    @staticmethod
+    def read_groups(comm,groups):
+        rtn = list()
+        for group in groups:
+            result = comm.Read(group)
+            rtn.append(result if isinstance(result,list) else result.Value)
+        return rtn
+
+    ################################
+    def __call__(self):
+        """Return pylogix element list, in tag order"""
+        if None is self.groups: self.make_groups()
+        if None is self.pool:
+            results = self.read_groups(self.comms[0],self.groups)
+        else:
+            ### Deal groups to sessions:  session k reads groups k, k+N, ...
+            n = len(self.comms)
+            futures = [self.pool.submit(self.read_groups,comm,self.groups[k::n])
+                       for k,comm in enumerate(self.comms)
+                      ]
+            per_session = [future.result() for future in futures]
+            results = [None] * len(self.groups)
+            for k,session_results in enumerate(per_session):
+                results[k::n] = session_results
+        return [element for result in results for element in result]
+
+    ################################
+    def close(self):
+        """Stop threads; close sessions opened here"""
+        if self.pool: self.pool.shutdown()
+        for comm in self.comms[1:]: comm.Close()
+
+########################################################################
+########################################################################
+
+class PYLOGIX_MICRO800_READER:
+    """Read list of tags from Micro8xx PLC, with several requests in
+flight over parallel sessions"""
+
+    ################################
+    def __init__(self,comm,tags,*args
+                ,sessions=1
+                ,make_comm=None
+                ,**kwargs
+                ):
+        """
+     comm:  open pylogix.PLC instance, with .Micro800 True
+     tags:  sequence of PLC tag names
+ sessions:  number of sessions, so number of requests in flight
+make_comm:  function returning a new pylogix.PLC instance, for sessions
+            after the first; required if sessions > 1
+
+Micro8xx controllers do not accept pylogix's multi-service read, so
+each tag is one request; with N sessions, the tag list is split into
+N contiguous slices, each read by one session on its own thread, and
+the results are rejoined in tag order
+
+"""
+        self.tags = list(tags)
+        self.sessions = max([1,min([int(sessions),len(self.tags)])])
+        self.comms = [comm] + [make_comm()
+                               for i in range(self.sessions-1)
+                              ]
+        for c in self.comms: c.Micro800 = True
+
+        n,extra = divmod(len(self.tags),self.sessions)
+        self.slices,i = list(),0
+        for k in range(self.sessions):
+            j = i + n + (k < extra and 1 or 0)
+            self.slices.append(self.tags[i:j])
+            i = j
+
+        self.pool = None
+        if self.sessions > 1:
+            self.pool = concurrent.futures.ThreadPoolExecutor(
+                          max_workers=self.sessions
+                         ,thread_name_prefix='micro800'
+                        )
+
+    ################################
+    @staticmethod
+    def read_slice(comm,tags):
+        return [comm.Read(tag) for tag in tags]
+
+    ################################
+    def __call__(self):
+        """Return pylogix element list, in tag order"""
+        if None is self.pool:
+            return self.read_slice(self.comms[0],self.tags)
+        rtn = list()
+        for future in [self.pool.submit(self.read_slice,comm,tags)
+                       for comm,tags in zip(self.comms,self.slices)
+                      ]:
+            rtn.extend(future.result())
+        return rtn
+
+    ################################
+    def close(self):
+        """Stop threads; close sessions opened here"""
+        if self.pool: self.pool.shutdown()
+        for comm in self.comms[1:]: comm.Close()
+
+########################################################################
+########################################################################
+
+class PYLOGIX_ARRAY_TAG:
+    """
+Array, or UDT, tag read as one block of elements, with one pylogix
+element-count read per cycle; changed elements are found by comparing
+the whole block with the previous block, as one NumPy array, instead of
+one Python comparison per element
+
+"""
+
+    ### Spec:  NAME:COUNT or NAME[FIRST]:COUNT e.g. Arr[0]:500, MyUdt:1
+    rgx_spec = re.compile(r'^(?P<base>.+?)(\[(?P<first>\d+)\])?'
+                          r':(?P<count>\d+)$'
+                         )
+
+    ################################
+    @classmethod
+    def is_spec(cls,tag):
+        """Return True if tag is an array spec, not a scalar tag name"""
+        return isinstance(tag,str) and not (None is cls.rgx_spec.match(tag))
+
+    ################################
+    def __init__(self,spec,*args,**kwargs):
+        """
+spec:  NAME[FIRST]:COUNT, to read COUNT elements of array NAME from
+       element FIRST (default 0) e.g. 'Arr[0]:500'; or NAME:1 to read
+       a whole UDT e.g. 'Motor1:1'
+
+Elements are logged as NAME[i], FIRST <= i < FIRST+COUNT, or, for
+NAME:1, as NAME; with UDTs, which pylogix returns as raw bytes, each
+element's value is the hex string of its bytes
+
+"""
+        ### Optional dependency, only needed for array tags
+        import numpy
+        self.np = numpy
+
+        match = self.rgx_spec.match(spec)
+        assert not (None is match),('Invalid array spec [{0}]; must be'
+                                    ' NAME[FIRST]:COUNT'.format(spec)
+                                   )
+        base,first,count = match.group('base','first','count')
+        self.spec = spec
+        self.tag = spec[:spec.rindex(':')]
+        self.count = max([1,int(count)])
+        if 1 == self.count and None is first:
+            self.names = [base]
+        else:
+            first = int(first or 0)
+            self.names = ['{0}[{1}]'.format(base,first+i)
+                          for i in range(self.count)
+                         ]
+        self.olds = None
+
+        ### Counters:  failed reads
+        self.errors = 0
+
+    ################################
+    def read(self,comm):
+        """Return block of values, as list or bytes, or None on error"""
+        response = comm.Read(self.tag,count=self.count)
+        if response.Status not in (0,'Success',) or None is response.Value:
+            self.errors += 1
+            return None
+        return response.Value
+
+    ################################
+    def detect(self,value,now):
+        """
+Return list of (TagName,Value,now) triplets for elements that differ
+from the previous block, and hold block
+
+value:  block from .read(); None => no changes
+  now:  timestamp to put in each triplet
+
+- REALs are compared NaN-safe:  NaN followed by NaN is not a change
+
+"""
+        if None is value: return list()
+        np = self.np
+
+        if isinstance(value,(bytes,bytearray,)):
+            ### UDTs:  one row of raw bytes per element
+            news = np.frombuffer(value,np.uint8)
+            if len(value) % self.count: news = news.reshape(1,-1)
+            else                      : news = news.reshape(self.count,-1)
+            size = news.shape[1]
+            element = lambda i: value[i*size:(i+1)*size].hex()
+        else:
+            if not isinstance(value,list): value = [value]
+            news = np.asarray(value)
+            element = value.__getitem__
+
+        olds,self.olds = self.olds,news
+        if None is olds or olds.shape != news.shape:
+            indices = range(min([len(news),len(self.names)]))
+        else:
+            ### Block dtype may change between reads, e.g. a longer
+            ### STRING (<U1 => <U2), or a REAL in a list of integers;
+            ### numbers compare with numbers, strings with strings, and
+            ### anything else as objects
+            kinds = olds.dtype.kind + news.dtype.kind
+            if not (kinds[0] == kinds[1] or set(kinds) <= set('biuf')):
+                olds,news = olds.astype(object),news.astype(object)
+            flags = np.asarray(news != olds,dtype=np.bool_)
+            if 2 == flags.ndim:
+                flags = flags.any(axis=1)
+            elif 'f' == news.dtype.kind:
+                flags &= ~(np.isnan(news) & np.isnan(olds))
+            indices = np.flatnonzero(flags).tolist()
+
+        names = self.names
+        return [(names[i],element(i),now,) for i in indices]
+
+########################################################################
+def split_tags(tags):
+    """Return list of scalar tag names, and list of PYLOGIX_ARRAY_TAG,
+from tags that may include array specs, cf. PYLOGIX_ARRAY_TAG"""
+    return ([tag for tag in tags if not PYLOGIX_ARRAY_TAG.is_spec(tag)]
+           ,[PYLOGIX_ARRAY_TAG(tag) for tag in tags
+             if PYLOGIX_ARRAY_TAG.is_spec(tag)
+            ]
+           )
+
+########################################################################
+########################################################################
+
+class PYLOGIX_ACQUISITION:
+    """Single acquisition stage shared by all PYLOGIX_LOGGER sinks"""
+
+    ################################
+    def __init__(self,comm,tags,*args
+                ,pyloggers=None
+                ,micro8xx=False
+                ,reader=None
+                ,change_filter=None
+                ,clock=None
+                ,controller_id=None
+                ,arrays=None
+                ,metrics=None
+                ,debug=False
+                ,**kwargs
+                ):
+        """
+     comm:  open pylogix.PLC instance
+     tags:  sequence of PLC tag names to read each cycle
+pyloggers:  sequence of PYLOGIX_LOGGER instances (sinks); cf. .add()
+ micro8xx:  True if PLC is Micro8xx i.e. cannot read list of tags
+   reader:  function returning pylogix element list for tags e.g.
+            PYLOGIX_MICRO800_READER; default depends on micro8xx
+change_filter:  filter_classes.PYLOGIX_CHANGE_FILTER for tags, to apply
+                deadbands, minimum and maximum times between logged
+                samples; None => log every change
+    clock:  function returning timestamp of PLC reply; default is
+            CLOCK, a PYLOGIX_CLOCK shared by all acquisition stages
+controller_id:  name of PLC, when logging several; each record's
+                TagName is passed to sinks as 'controller_id/TagName'
+   arrays:  sequence of array specs, or PYLOGIX_ARRAY_TAG, each read
+            as one block, with one request, after tags; change filter
+            does not apply to their elements
+  metrics:  metrics_classes.PYLOGIX_METRICS, to time PLC read, change
+            detection and each sink call, and to count cycles, tags
+            read, requests and changes; default is a private instance
+    debug:  Set to True to send debugging info to stdout
+
+"""
+        self.comm = comm
+        self.tags = list(tags)
+        self.micro8xx = micro8xx
+        self.debug = debug
+        if None is reader:
+            reader = (micro8xx and PYLOGIX_MICRO800_READER
+                      or PYLOGIX_LOGIX_READER
+                     )(comm,self.tags)
+        self.reader = reader
+        self.change_filter = change_filter
+        self.clock = clock or CLOCK
+        self.prefix = controller_id and '{0}/'.format(controller_id) or ''
+        self.arrays = [isinstance(array,PYLOGIX_ARRAY_TAG) and array
+                       or PYLOGIX_ARRAY_TAG(array)
+                       for array in (arrays or list())
+                      ]
+
+        ### Stage timings, and counters; sink timings are added by .add()
+        self.metrics = metrics or MC.PYLOGIX_METRICS()
+        self.labels = dict(controller=controller_id)
+        self.h_read = self.metrics.histogram('plc_read',**self.labels)
+        self.h_detect = self.metrics.histogram('detect',**self.labels)
+        self.h_sinks = list()
+        self.metrics.add_counters(self,dict(cycles='cycles'
+                                           ,plc_requests='reads'
+                                           ,tags_read='tags_read'
+                                           ,changes='changes'
+                                           )
+                                 ,**self.labels
+                                 )
+        for array in self.arrays:
+            self.metrics.add_counters(array,dict(errors='errors')
+                                     ,source='array',**self.labels
+                                     )
+
+        self.pyloggers = list()
+        for pylogger in (pyloggers or list()): self.add(pylogger)
+
+        ### Previous values, one per tag; None forces logging of all
+        ### values on the first cycle
+        self.olds = [None] * len(self.tags)
+        self.changeds = list()
+        self.now = None
+
+        ### Counters:  cycles run; PLC reads sent; tags (and array
+        ###            elements) read; changes detected
+        self.cycles = self.reads = self.tags_read = self.changes = 0
+
+    ################################
+    def add(self,pylogger):
+        """Add a sink to receive each cycle's changes"""
+        self.pyloggers.append(pylogger)
+        self.h_sinks.append(self.metrics.histogram('sink_submit'
+                                                  ,sink=MC.sink_name(pylogger)
+                                                  ,**self.labels
+                                                  ))
+        return pylogger
+
+    ################################
+    def read(self):
+        """Read all tags from PLC, return pylogix element list"""
+        if not self.tags: return list()     ### Arrays only
+        self.reads += 1
+        self.tags_read += len(self.tags)
+        return self.reader()
+
+    ################################
+    def detect(self,news,now=None):
+        """
+Detect changes in tracked values, once for all sinks:
+
+  Initialize timestamp and empty list of changed values
+  For changed values:
+  - Append .Tagname, .Value and timestamp triplet to changed list
+  - Update value stored in self.olds
+
+news:  pylogix element list, each with .TagName and .Value attributes
+ now:  timestamp of PLC reply; default is current time of self.clock
+
+- REALs are compared NaN-safe:  NaN followed by NaN is not a change
+
+With a change filter, self.olds holds last logged, not last read, values
+
+"""
+        self.now = self.clock() if None is now else now
+
+        if not (None is self.change_filter):
+            self.changeds = changeds = self.change_filter.detect(news
+                                                                ,self.olds
+                                                                ,self.now
+                                                                )
+            self.changes += len(changeds)
+            return changeds
+
+        self.changeds = changeds = list()
+        olds = self.olds
+
+        for i,new in enumerate(news):
+            value = new.Value
+            if olds[i] != value:
+                ### NaN-safe:  NaN followed by NaN is not a change
+                if value != value and olds[i] != olds[i]: continue
+                changeds.append((new.TagName,value,self.now,))
+                olds[i] = value
+
+        self.changes += len(changeds)
+        return changeds
+
+    ################################
+    def qualify(self,changeds):
+        """Return changeds with controller ID prefixed to tag names, if
+any controller ID was given"""
+        if not self.prefix: return changeds
+        prefix = self.prefix
+        return [(prefix+name,value,timestamp,)
+                for name,value,timestamp in changeds
+               ]
+
+    ################################
+    def __call__(self,*args,**kwargs):
+        """
+Run one cycle:  one PLC read, plus one per array; one change detection;
+pass the same changes and timestamp to every sink
+
+"""
+        self.cycles += 1
+        t0 = time.perf_counter()
+        news = self.read()
+        ### Time of PLC reply to tag read, before array reads; time of
+        ### last array reply when there are only arrays
+        now = self.tags and self.clock() or None
+        blocks = [array.read(self.comm) for array in self.arrays]
+        self.reads += len(blocks)
+        self.tags_read += sum([array.count for array in self.arrays])
+        t1 = time.perf_counter()
+        changeds = self.detect(news,now)
+        for array,block in zip(self.arrays,blocks):
+            array_changeds = array.detect(block,self.now)
+            self.changes += len(array_changeds)
+            changeds.extend(array_changeds)
+        changeds = self.qualify(changeds)
+        t2 = time.perf_counter()
+        self.h_read.observe(t1 - t0)
+        self.h_detect.observe(t2 - t1)
+
+        ### Time each sink's call:  the whole sink when inline; queue
+        ### put, including any wait for room, behind a worker
+        for pylogger,h_sink in zip(self.pyloggers,self.h_sinks):
+            pylogger.log_changeds(changeds,self.now,*args,**kwargs)
+            t3 = time.perf_counter()
+            h_sink.observe(t3 - t2)
+            t2 = t3
+        return changeds
+
+    ################################
+    def close(self):
+        """
+Pass samples held back by the change filter, if any, to every sink;
+close reader; sinks are closed by caller
+
+"""
+        if not (None is self.change_filter):
+            changeds = self.qualify(self.change_filter.flush())
+            self.changes += len(changeds)
+            if changeds:
+                for pylogger in self.pyloggers:
+                    pylogger.log_changeds(changeds,self.now)
+        self.reader.close()
@@ -0,0 +1,68 @@
+"""
+bench_acquisition.py
+
+Purpose:  compare PLC requests and time per cycle, for 1 to 4 sinks,
+          between
+          - legacy:  each logger reads the PLC and detects changes
+          - shared:  PYLOGIX_ACQUISITION reads and detects once
+
+Usage:  python bench/bench_acquisition.py [--tags=200] [--cycles=500]
+                                          [--latency=0.0]
+
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0,os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import logger_classes as LC
+import acquisition_classes as AC
+from simulated_plc import SIMULATED_PLC
+
+def getarg(av1,name,default):
+    pfx = '--{0}='.format(name)
+    return type(default)(([default]
+                         +[a[len(pfx):] for a in av1 if a.startswith(pfx)]
+                         )[-1]
+                        )
+
+def bench(mode,ntags,nsinks,ncycles,latency):
+    tags = ['Tag{0}'.format(i) for i in range(ntags)]
+    comm = SIMULATED_PLC(change_rate=0.1,latency=latency,seed=1)
+
+    if 'legacy' == mode:
+        R = lambda : comm.Read(tags)
+        pyloggers = [LC.PYLOGIX_LOGGER_CSV(os.devnull,R())
+                     for i in range(nsinks)
+                    ]
+        def cycle():
+            for pylogger in pyloggers: pylogger.log_news(R())
+    else:
+        cycle = AC.PYLOGIX_ACQUISITION(comm,tags)
+        for i in range(nsinks): cycle.add(LC.PYLOGIX_LOGGER_CSV(os.devnull))
+
+    comm.requests = 0
+    t0 = time.perf_counter()
+    for i in range(ncycles): cycle()
+    dt = time.perf_counter() - t0
+
+    return comm.requests / ncycles, 1e6 * dt / ncycles
+
+if "__main__" == __name__:
+    av1 = sys.argv[1:]
+    ntags = getarg(av1,'tags',200)
+    ncycles = getarg(av1,'cycles',500)
+    latency = getarg(av1,'latency',0.0)
+
+    print('{0:>6} {1:>5} {2:>12} {3:>12}'.format('mode','sinks'
+                                                ,'reads/cycle','us/cycle'
+                                                )
+         )
+    for nsinks in range(1,5):
+        for mode in ('legacy','shared',):
+            reads,us = bench(mode,ntags,nsinks,ncycles,latency)
+            print('{0:>6} {1:>5} {2:>12.1f} {3:>12.1f}'.format(mode,nsinks
+                                                               ,reads,us
+                                                               )
+                 )
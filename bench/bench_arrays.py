@@ -0,0 +1,80 @@
+"""
+bench_arrays.py
+
+Purpose:  compare PLC requests and time per cycle logging one array of
+          N elements, between
+          - tags:  N scalar tags Arr[0] ... Arr[N-1], read as a tag list
+                   (--tags-per-request per request; 1 => as a Micro8xx
+                   does), with one Python comparison per element
+          - array:  one element-count read, Arr[0]:N, with one NumPy
+                    comparison of the whole block
+
+Usage:  python bench/bench_arrays.py [--elements=500] [--cycles=200]
+                                     [--change-rate=0.01]
+                                     [--latency=0.002]
+                                     [--tags-per-request=100]
+
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0,os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import acquisition_classes as AC
+from simulated_plc import SIMULATED_PLC
+
+def getarg(av1,name,default):
+    pfx = '--{0}='.format(name)
+    return type(default)(([default]
+                         +[a[len(pfx):] for a in av1 if a.startswith(pfx)]
+                         )[-1]
+                        )
+
+def bench(mode,nelements,ncycles,change_rate,latency,tags_per_request):
+    """Return requests per cycle, ms per cycle, and changes logged"""
+    comm = SIMULATED_PLC(change_rate=change_rate,latency=latency
+                        ,tags_per_request=tags_per_request,seed=1
+                        )
+    if 'tags' == mode:
+        tags = ['Arr[{0}]'.format(i) for i in range(nelements)]
+        acq = AC.PYLOGIX_ACQUISITION(comm,tags)
+    else:
+        acq = AC.PYLOGIX_ACQUISITION(comm,list()
+                                    ,arrays=['Arr[0]:{0}'.format(nelements)]
+                                    )
+    acq()                             ### First cycle logs all elements
+    requests0 = comm.requests
+    changes0 = acq.changes
+    t0 = time.perf_counter()
+    for i in range(ncycles): acq()
+    dt = time.perf_counter() - t0
+    return ((comm.requests - requests0) / ncycles
+           ,1e3 * dt / ncycles
+           ,acq.changes - changes0
+           )
+
+if "__main__" == __name__:
+    av1 = sys.argv[1:]
+    nelements = getarg(av1,'elements',500)
+    ncycles = getarg(av1,'cycles',200)
+    change_rate = getarg(av1,'change-rate',0.01)
+    latency = getarg(av1,'latency',0.002)
+    tags_per_request = getarg(av1,'tags-per-request',100)
+
+    fmt = '{0:>6} {1:>14} {2:>10} {3:>9} {4:>14}'
+    print(fmt.format('mode','requests/cycle','ms/cycle','changes'
+                    ,'ms/cycle@0lat'
+                    )
+         )
+    for mode in ('tags','array',):
+        requests,ms,changes = bench(mode,nelements,ncycles,change_rate
+                                   ,latency,tags_per_request
+                                   )
+        r0,ms0,c0 = bench(mode,nelements,ncycles,change_rate,0.0
+                         ,tags_per_request
+                         )
+        print(fmt.format(mode,'{0:.1f}'.format(requests)
+                        ,'{0:.3f}'.format(ms),changes,'{0:.3f}'.format(ms0)
+                        )
+             )
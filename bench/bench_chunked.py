@@ -0,0 +1,78 @@
+"""
+bench_chunked.py
+
+Purpose:  compare Logix scan time for a long tag list, split into
+          packet-sized groups, read over 1 to N parallel sessions,
+          against a simulated PLC that adds latency to each request and
+          serves at most --slots requests at once
+
+Usage:  python bench/bench_chunked.py [--tags=2000] [--latency=0.005]
+                                      [--cycles=5] [--sessions=1,2,4,8]
+                                      [--slots=4] [--connection-size=4002]
+
+"""
+import os
+import sys
+import time
+import threading
+
+sys.path.insert(0,os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import acquisition_classes as AC
+from simulated_plc import SIMULATED_PLC
+
+def getarg(av1,name,default):
+    pfx = '--{0}='.format(name)
+    return type(default)(([default]
+                         +[a[len(pfx):] for a in av1 if a.startswith(pfx)]
+                         )[-1]
+                        )
+
+if "__main__" == __name__:
+    av1 = sys.argv[1:]
+    ntags = getarg(av1,'tags',2000)
+    latency = getarg(av1,'latency',0.005)
+    ncycles = getarg(av1,'cycles',5)
+    sessions = [int(n) for n in getarg(av1,'sessions','1,2,4,8').split(',')]
+    slots = threading.Semaphore(getarg(av1,'slots',4))
+    connection_size = getarg(av1,'connection-size',4002)
+
+    tags = ['Program:MainProgram.Tag{0}'.format(i) for i in range(ntags)]
+
+    ### One group per request, as sized by the reader
+    probe = AC.PYLOGIX_CHUNKED_READER(SIMULATED_PLC(),tags
+                                     ,connection_size=connection_size
+                                     )
+    probe.make_groups()
+    per_request = max([len(group) for group in probe.groups])
+    make_comm = lambda : SIMULATED_PLC(latency=latency
+                                      ,tags_per_request=per_request
+                                      ,server_slots=slots
+                                      )
+
+    print('{0} tags; {1} groups of up to {2} tags; connection size {3}'
+          .format(ntags,len(probe.groups),per_request,connection_size)
+         )
+    print('{0:>8} {1:>14} {2:>12} {3:>8}'.format('sessions','requests/cycle'
+                                                 ,'ms/cycle','speedup'
+                                                 )
+         )
+    base = None
+    for nsessions in sessions:
+        reader = AC.PYLOGIX_CHUNKED_READER(make_comm(),tags
+                                          ,sessions=nsessions
+                                          ,make_comm=make_comm
+                                          ,connection_size=connection_size
+                                          )
+        t0 = time.perf_counter()
+        for i in range(ncycles):
+            assert [r.TagName for r in reader()] == tags
+        ms = 1e3 * (time.perf_counter() - t0) / ncycles
+        requests = sum([c.requests for c in reader.comms]) / ncycles
+        reader.close()
+        base = base or ms
+        print('{0:>8} {1:>14.1f} {2:>12.1f} {3:>8.2f}'.format(nsessions
+                                                               ,requests,ms
+                                                               ,base/ms
+                                                               )
+             )
@@ -0,0 +1,82 @@
+"""
+bench_controllers.py
+
+Purpose:  measure total read cycles and records per second, logging N
+          stand-in PLCs through PYLOGIX_CONTROLLER_POOL into one shared
+          counting sink, with one thread per PLC and with one process
+          per PLC; each PLC is read as fast as it can be (no latency),
+          so the work per cycle is CPU-bound, and only processes can
+          use more than one core
+
+Usage:  python bench/bench_controllers.py [--controllers=1,2,4]
+                                          [--tags=2000]
+                                          [--change-rate=0.05]
+                                          [--seconds=3]
+
+"""
+import os
+import sys
+import time
+import functools
+
+sys.path.insert(0,os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import logger_classes as LC
+import controller_classes as CC
+from simulated_plc import SIMULATED_PLC
+
+def getarg(av1,name,default):
+    pfx = '--{0}='.format(name)
+    return type(default)(([default]
+                         +[a[len(pfx):] for a in av1 if a.startswith(pfx)]
+                         )[-1]
+                        )
+
+class COUNTING_LOGGER(LC.PYLOGIX_LOGGER):
+    """Sink that only counts records"""
+    def __init__(self,*args,**kwargs):
+        super().__init__(*args,**kwargs)
+        self.records = 0
+    def __call__(self,*args,**kwargs):
+        self.records += len(self.changeds)
+
+def bench(pool,ncontrollers,tags,change_rate,seconds):
+    """Return cycles/s, records/s"""
+    plc = functools.partial(SIMULATED_PLC,change_rate=change_rate)
+    controllers = [('plc{0}'.format(i),'10.0.0.{0}'.format(i+1),)
+                   for i in range(ncontrollers)
+                  ]
+    controller_pool = CC.PYLOGIX_CONTROLLER_POOL(
+                        controllers,[(0.0001,tags,)]
+                       ,pool=pool
+                       ,acquisition_kwargs=dict(plc=plc)
+                       )
+    sink = COUNTING_LOGGER()
+    controller_pool.start()
+    controller_pool.add_sinks([sink])
+    time.sleep(seconds)
+    controller_pool.close()
+    cycles = sum([stats['cycles'] for stats
+                  in controller_pool.controller_stats.values()
+                 ])
+    return cycles / seconds,sink.records / seconds
+
+if "__main__" == __name__:
+    av1 = sys.argv[1:]
+    counts = [int(n) for n in getarg(av1,'controllers','1,2,4').split(',')]
+    ntags = getarg(av1,'tags',2000)
+    change_rate = getarg(av1,'change-rate',0.05)
+    seconds = getarg(av1,'seconds',3.0)
+
+    tags = ['Tag{0:05d}'.format(i) for i in range(ntags)]
+
+    fmt = '{0:>8} {1:>12} {2:>10} {3:>12}'
+    print(dict(cpus=os.cpu_count(),tags=ntags,change_rate=change_rate))
+    print(fmt.format('pool','controllers','cycles/s','records/s'))
+    for pool in CC.PYLOGIX_CONTROLLER_POOL.POOLS:
+        for n in counts:
+            cycles,records = bench(pool,n,tags,change_rate,seconds)
+            print(fmt.format(pool,n,'{0:.1f}'.format(cycles)
+                            ,'{0:.0f}'.format(records)
+                            )
+                 )
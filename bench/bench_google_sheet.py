@@ -0,0 +1,101 @@
+"""
+bench_google_sheet.py
+
+Purpose:  drive PYLOGIX_LOGGER_GOOGLE_SHEET against a mocked
+          spreadsheets() service that counts requests and keeps the
+          sheet's row count, to check coalescing, quota and trimming
+
+Usage:  python bench/bench_google_sheet.py [--cycles=600] [--tags=5]
+                                           [--interval=0.01]
+                                           [--requests-per-minute=60]
+                                           [--max-rows=200]
+
+"""
+import os
+import sys
+import time
+import collections
+
+sys.path.insert(0,os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import logger_classes as LC
+
+def getarg(av1,name,default):
+    pfx = '--{0}='.format(name)
+    return type(default)(([default]
+                         +[a[len(pfx):] for a in av1 if a.startswith(pfx)]
+                         )[-1]
+                        )
+
+class MOCK_REQUEST:
+    def __init__(self,result): self.result = result
+    def execute(self): return self.result
+
+class MOCK_SPREADSHEETS:
+    """Mock of googleapiclient spreadsheets() service; counts requests,
+and tracks the number of rows on the sheet"""
+
+    def __init__(self,title='PLCLOGPOC'):
+        self.title = title
+        self.nrows = 2
+        self.max_seen = 2
+        self.counts = collections.Counter()
+
+    def get(self,**kwargs):
+        self.counts['get'] += 1
+        return MOCK_REQUEST({'sheets':[{'properties':{'sheetId':0
+                                                     ,'title':self.title
+                                                     }
+                                       }
+                                      ]
+                            }
+                           )
+
+    def values(self): return self
+
+    def batchUpdate(self,spreadsheetId,body):
+        self.counts['batchUpdate'] += 1
+        for request in body['requests']:
+            kind, = request.keys()
+            self.counts[kind] += 1
+            if 'appendCells' == kind:
+                self.nrows += len(request[kind]['rows'])
+                self.max_seen = max(self.max_seen,self.nrows)
+            elif 'deleteDimension' == kind:
+                rng = request[kind]['range']
+                self.nrows -= rng['endIndex'] - rng['startIndex']
+        return MOCK_REQUEST(dict())
+
+if "__main__" == __name__:
+    av1 = sys.argv[1:]
+    ncycles = getarg(av1,'cycles',600)
+    ntags = getarg(av1,'tags',5)
+    interval = getarg(av1,'interval',0.01)
+    rpm = getarg(av1,'requests-per-minute',60.0)
+    max_rows = getarg(av1,'max-rows',200)
+
+    mock = MOCK_SPREADSHEETS()
+    gs = LC.PYLOGIX_LOGGER_GOOGLE_SHEET(max_rows=max_rows
+                                       ,requests_per_minute=rpm
+                                       ,burst=2
+                                       ,ssheets=mock
+                                       )
+    mock.counts.clear()
+    t0 = time.perf_counter()
+    for i in range(ncycles):
+        gs.log_changeds([('Tag{0}'.format(j),i,'2026-01-01T00:00:00',)
+                         for j in range(ntags)
+                        ]
+                       ,'2026-01-01T00:00:00'
+                       )
+        time.sleep(interval)
+    gs.close()
+    dt = time.perf_counter() - t0
+
+    print(dict(cycles=ncycles,seconds=round(dt,3)
+              ,requests=mock.counts['batchUpdate']
+              ,allowed=int(rpm * dt / 60.0) + 2
+              ,final_rows=mock.nrows,max_rows_seen=mock.max_seen
+              ,max_rows=max_rows,requests_by_kind=dict(mock.counts)
+              )
+         )
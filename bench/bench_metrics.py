@@ -0,0 +1,111 @@
+"""
+bench_metrics.py
+
+Purpose:  measure the cost of stage timing, per cycle, against cycle
+          time, for one acquisition stage of N tags with inline sinks:
+          - on:  histograms as used by the logger
+          - off:  histograms replaced by a no-op, i.e. without the
+                  bisect and additions (the clock reads remain)
+          - record:  the recording alone, i.e. the clock reads and
+                     histogram updates of one cycle, repeated in a
+                     tight loop; this is the cost, as a percentage of
+                     the "on" cycle time
+
+          A/B cycle times (on vs off) differ by less than their own
+          noise, so the tight-loop figure is the one to read
+
+Usage:  python bench/bench_metrics.py [--tags=10000] [--cycles=300]
+                                      [--sinks=2]
+                                      [--change-rate=0.01]
+
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0,os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import logger_classes as LC
+import acquisition_classes as AC
+import metrics_classes as MC
+from simulated_plc import SIMULATED_PLC
+
+def getarg(av1,name,default):
+    pfx = '--{0}='.format(name)
+    return type(default)(([default]
+                         +[a[len(pfx):] for a in av1 if a.startswith(pfx)]
+                         )[-1]
+                        )
+
+class COUNTING_LOGGER(LC.PYLOGIX_LOGGER):
+    """Sink that only counts records"""
+    def __init__(self,*args,**kwargs):
+        super().__init__(*args,**kwargs)
+        self.records = 0
+    def __call__(self,*args,**kwargs):
+        self.records += len(self.changeds)
+
+class NULL_HISTOGRAM:
+    """Histogram that records nothing"""
+    def observe(self,seconds): pass
+
+def bench(mode,tags,ncycles,nsinks,change_rate):
+    """Return ms per cycle"""
+    comm = SIMULATED_PLC(change_rate=change_rate,seed=1)
+    acq = AC.PYLOGIX_ACQUISITION(comm,tags,metrics=MC.PYLOGIX_METRICS())
+    for i in range(nsinks): acq.add(COUNTING_LOGGER())
+    if 'off' == mode:
+        acq.h_read = acq.h_detect = NULL_HISTOGRAM()
+        acq.h_sinks = [NULL_HISTOGRAM() for h in acq.h_sinks]
+    acq()                             ### First cycle logs all tags
+    t0 = time.perf_counter()
+    for i in range(ncycles): acq()
+    return 1e3 * (time.perf_counter() - t0) / ncycles
+
+def bench_record(nsinks,n=200000):
+    """Return ms per cycle of clock reads and histogram updates alone,
+as in PYLOGIX_ACQUISITION.__call__"""
+    metrics = MC.PYLOGIX_METRICS()
+    h_read = metrics.histogram('plc_read')
+    h_detect = metrics.histogram('detect')
+    h_sinks = [metrics.histogram('sink_submit',sink=str(i))
+               for i in range(nsinks)
+              ]
+    perf_counter = time.perf_counter
+    t_start = perf_counter()
+    for k in range(n):
+        t0 = perf_counter()
+        t1 = perf_counter()
+        t2 = perf_counter()
+        h_read.observe(t1 - t0)
+        h_detect.observe(t2 - t1)
+        for h_sink in h_sinks:
+            t3 = perf_counter()
+            h_sink.observe(t3 - t2)
+            t2 = t3
+    return 1e3 * (perf_counter() - t_start) / n
+
+if "__main__" == __name__:
+    av1 = sys.argv[1:]
+    ntags = getarg(av1,'tags',10000)
+    ncycles = getarg(av1,'cycles',300)
+    nsinks = getarg(av1,'sinks',2)
+    change_rate = getarg(av1,'change-rate',0.01)
+
+    tags = ['Tag{0:05d}'.format(i) for i in range(ntags)]
+
+    fmt = '{0:>7} {1:>12} {2:>12}'
+    print(dict(tags=ntags,sinks=nsinks,change_rate=change_rate))
+    print(fmt.format('mode','ms/cycle','% of cycle'))
+    ms_on = bench('on',tags,ncycles,nsinks,change_rate)
+    ms_off = bench('off',tags,ncycles,nsinks,change_rate)
+    ms_record = bench_record(nsinks)
+    print(fmt.format('on','{0:.4f}'.format(ms_on),'100'))
+    print(fmt.format('off','{0:.4f}'.format(ms_off)
+                    ,'{0:.3f}'.format(100.0 * ms_off / ms_on)
+                    )
+         )
+    print(fmt.format('record','{0:.4f}'.format(ms_record)
+                    ,'{0:.3f}'.format(100.0 * ms_record / ms_on)
+                    )
+         )
@@ -0,0 +1,59 @@
+"""
+bench_micro800.py
+
+Purpose:  compare Micro8xx scan time, reading one tag per request,
+          with 1 session (sequential) against N parallel sessions,
+          against a simulated PLC that adds latency to each request
+
+Usage:  python bench/bench_micro800.py [--tags=200] [--latency=0.002]
+                                       [--cycles=5] [--sessions=1,2,4,8]
+
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0,os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import acquisition_classes as AC
+from simulated_plc import SIMULATED_PLC
+
+def getarg(av1,name,default):
+    pfx = '--{0}='.format(name)
+    return type(default)(([default]
+                         +[a[len(pfx):] for a in av1 if a.startswith(pfx)]
+                         )[-1]
+                        )
+
+if "__main__" == __name__:
+    av1 = sys.argv[1:]
+    ntags = getarg(av1,'tags',200)
+    latency = getarg(av1,'latency',0.002)
+    ncycles = getarg(av1,'cycles',5)
+    sessions = [int(n) for n in getarg(av1,'sessions','1,2,4,8').split(',')]
+
+    tags = ['Tag{0}'.format(i) for i in range(ntags)]
+    make_comm = lambda : SIMULATED_PLC(Micro800=True,latency=latency)
+
+    print('{0:>8} {1:>14} {2:>12} {3:>8}'.format('sessions','requests/cycle'
+                                                 ,'ms/cycle','speedup'
+                                                 )
+         )
+    base = None
+    for nsessions in sessions:
+        reader = AC.PYLOGIX_MICRO800_READER(make_comm(),tags
+                                           ,sessions=nsessions
+                                           ,make_comm=make_comm
+                                           )
+        t0 = time.perf_counter()
+        for i in range(ncycles):
+            assert [r.TagName for r in reader()] == tags
+        ms = 1e3 * (time.perf_counter() - t0) / ncycles
+        requests = sum([c.requests for c in reader.comms]) / ncycles
+        reader.close()
+        base = base or ms
+        print('{0:>8} {1:>14.1f} {2:>12.1f} {3:>8.2f}'.format(nsessions
+                                                               ,requests,ms
+                                                               ,base/ms
+                                                               )
+             )
@@ -0,0 +1,256 @@
+"""
+bench_sinks.py
+
+Purpose:  benchmark every logger_classes sink on the same cycles, each
+          sink in a fresh Python process, logging inline (no queue), and
+          report, per sink:
+          - cycles/s and changes/s, over all cycles and .close()
+          - latency of each cycle's call, ms:  p50, p99 and max
+          - memory:  peak RSS, and its growth while logging, MiB
+
+          Cycles are made up front, by an acquisition stage reading the
+          stand-in PLC in simulated_plc.py (DINT, REAL, BOOL and STRING
+          tags), or read from a recorded log with --replay; MariaDB/MySQL
+          and Google Sheets are stood in by local fakes, FAKE_MYSQLDB and
+          FAKE_SPREADSHEETS, each with --server-latency per round trip
+
+          --save writes results as JSON; --baseline compares cycles/s
+          with saved results, and flags drops of more than --tolerance
+          percent, to catch performance regressions before deployment
+
+Usage:  python bench/bench_sinks.py [--tags=1000] [--cycles=2000]
+                                    [--change-rate=0.05]
+                                    [--replay=csv_log.csv]
+                                    [--sinks=csv,sqlite,...]
+                                    [--server-latency=0.001]
+                                    [--save=results.json]
+                                    [--baseline=results.json]
+                                    [--tolerance=10]
+
+"""
+import os
+import sys
+import json
+import time
+import types
+import resource
+import tempfile
+import subprocess
+
+sys.path.insert(0,os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import sink_registry as SR
+import metrics_classes as MC
+
+### Sinks benchmarked, in order
+SINKS = ('flat_ascii','csv','excel','parquet','sqlite','mysql'
+        ,'google_sheet'
+        ,)
+
+def getarg(av1,name,default):
+    pfx = '--{0}='.format(name)
+    return type(default)(([default]
+                         +[a[len(pfx):] for a in av1 if a.startswith(pfx)]
+                         )[-1]
+                        )
+
+########################################################################
+### Fake MariaDB/MySQL server:  a stand-in MySQLdb module, enough for
+### PYLOGIX_LOGGER_MYSQL; each statement and commit is one round trip
+
+class FAKE_CURSOR:
+    def __init__(self,connection):
+        self.connection = connection
+        self.result = list()
+    def execute(self,query,args=()):
+        self.connection.round_trip()
+        if 'SELECT tag_id' in query:
+            self.result = [(self.connection.tag_ids[name],name,)
+                           for name in args
+                          ]
+    def executemany(self,query,rows):
+        self.connection.round_trip()
+        if 'INTO tags' in query:
+            for (name,) in rows:
+                self.connection.tag_ids.setdefault(
+                  name,len(self.connection.tag_ids)+1
+                )
+        else:
+            self.connection.rows += len(rows)
+    def fetchall(self): return self.result
+
+class FAKE_CONNECTION:
+    def __init__(self,latency):
+        self.latency = latency
+        self.tag_ids = dict()
+        self.rows = self.round_trips = 0
+    def round_trip(self):
+        self.round_trips += 1
+        if self.latency > 0.0: time.sleep(self.latency)
+    def cursor(self): return FAKE_CURSOR(self)
+    def commit(self): self.round_trip()
+    def rollback(self): self.round_trip()
+    def close(self): pass
+
+def fake_mysqldb(latency):
+    """Return stand-in MySQLdb module"""
+    module = types.ModuleType('MySQLdb')
+    module.connect = lambda *args,**kwargs: FAKE_CONNECTION(latency)
+    return module
+
+########################################################################
+### Fake Google Sheets service:  the mock spreadsheets() service of
+### bench_google_sheet.py, with a round trip per request
+
+def fake_spreadsheets(latency):
+    """Return stand-in spreadsheets() service"""
+    from bench_google_sheet import MOCK_SPREADSHEETS,MOCK_REQUEST
+
+    class FAKE_REQUEST(MOCK_REQUEST):
+        def execute(self):
+            if latency > 0.0: time.sleep(latency)
+            return self.result
+
+    class FAKE_SPREADSHEETS(MOCK_SPREADSHEETS):
+        def get(self,**kwargs):
+            return FAKE_REQUEST(super().get(**kwargs).result)
+        def batchUpdate(self,spreadsheetId,body):
+            return FAKE_REQUEST(super().batchUpdate(spreadsheetId,body
+                                                   ).result)
+
+    return FAKE_SPREADSHEETS()
+
+########################################################################
+def make_sink(name,tmpdir,latency):
+    """Return sink by name, writing under tmpdir, or to a fake server"""
+    path = lambda filename: os.path.join(tmpdir,filename)
+    Sink = SR.load(name)
+    if 'mysql' == name:
+        sys.modules['MySQLdb'] = fake_mysqldb(latency)
+        return Sink(db='bench',schema='compact')
+    if 'google_sheet' == name:
+        return Sink(ssheets=fake_spreadsheets(latency)
+                   ,requests_per_minute=6000,burst=10
+                   )
+    return Sink(path(dict(flat_ascii='log.txt',csv='log.csv'
+                         ,excel='log.xlsx',parquet='log.parquet'
+                         ,sqlite='log.sqlite3'
+                         )[name]
+                    ))
+
+def make_cycles(ntags,ncycles,change_rate,replay):
+    """Return list of (changeds,now) per cycle, from the stand-in PLC,
+or from a recorded log"""
+    import acquisition_classes as AC
+    import replay_classes as RC
+    from simulated_plc import SIMULATED_PLC,tag_names
+
+    cycles = list()
+    class COLLECTOR:
+        def log_changeds(self,changeds,now,*args,**kwargs):
+            cycles.append((changeds,now,))
+
+    if replay:
+        source = RC.PYLOGIX_REPLAY(replay,pyloggers=[COLLECTOR()])
+        while not (None is source()): pass
+        return cycles[:ncycles or len(cycles)]
+
+    comm = SIMULATED_PLC(change_rate=change_rate,seed=1
+                        ,types=[('Tag*0','REAL',),('Tag*1','BOOL',)
+                               ,('Tag*2','STRING',)
+                               ]
+                        )
+    acq = AC.PYLOGIX_ACQUISITION(comm,tag_names(ntags)
+                                ,pyloggers=[COLLECTOR()]
+                                )
+    for i in range(ncycles): acq()
+    return cycles
+
+def maxrss_mib():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.
+
+def child(name,av1):
+    """Benchmark one sink; print results as JSON"""
+    cycles = make_cycles(getarg(av1,'tags',1000),getarg(av1,'cycles',2000)
+                        ,getarg(av1,'change-rate',0.05)
+                        ,getarg(av1,'replay','')
+                        )
+    latency = getarg(av1,'server-latency',0.001)
+    with tempfile.TemporaryDirectory() as tmpdir:
+        sink = make_sink(name,tmpdir,latency)
+        rss0 = maxrss_mib()
+        histogram = MC.PYLOGIX_HISTOGRAM()
+        t0 = time.perf_counter()
+        for changeds,now in cycles:
+            t1 = time.perf_counter()
+            sink.log_changeds(changeds,now)
+            histogram.observe(time.perf_counter() - t1)
+        sink.close()
+        dt = time.perf_counter() - t0
+    print(json.dumps(dict(sink=name,cycles=len(cycles)
+                         ,changes=sum([len(c) for c,now in cycles])
+                         ,seconds=dt
+                         ,p50_ms=1e3*histogram.quantile(0.5)
+                         ,p99_ms=1e3*histogram.quantile(0.99)
+                         ,max_ms=1e3*histogram.max
+                         ,rss_mib=maxrss_mib()
+                         ,rss_growth_mib=maxrss_mib() - rss0
+                         )
+                    )
+         )
+
+if "__main__" == __name__:
+    av1 = sys.argv[1:]
+
+    name = getarg(av1,'child','')
+    if name:
+        child(name,av1)
+        sys.exit(0)
+
+    sinks = [s for s in getarg(av1,'sinks',','.join(SINKS)).split(',') if s]
+    save = getarg(av1,'save','')
+    baseline = getarg(av1,'baseline','')
+    tolerance = getarg(av1,'tolerance',10.0)
+    baseline = baseline and dict([(r['sink'],r,)
+                                  for r in json.load(open(baseline))
+                                 ]) or dict()
+
+    fmt = '{0:>12} {1:>10} {2:>11} {3:>8} {4:>8} {5:>8} {6:>8} {7:>8} {8}'
+    print(fmt.format('sink','cycles/s','changes/s','p50 ms','p99 ms'
+                    ,'max ms','RSS MiB','+RSS','vs baseline'
+                    ))
+    results = list()
+    for name in sinks:
+        run = subprocess.run([sys.executable,os.path.abspath(__file__)
+                             ,'--child={0}'.format(name)
+                             ]+av1
+                            ,capture_output=True,text=True
+                            )
+        if run.returncode:
+            print(fmt.format(name,*(['-']*7+['failed:  {0}'.format(
+                    (run.stderr.strip().split('\n') or [''])[-1]
+                  )])))
+            continue
+        r = json.loads(run.stdout.strip().split('\n')[-1])
+        results.append(r)
+        rate = r['cycles'] / r['seconds']
+        note = ''
+        if name in baseline:
+            old = baseline[name]['cycles'] / baseline[name]['seconds']
+            change = 100.0 * (rate - old) / old
+            note = '{0:+.1f}%{1}'.format(change
+                                        ,change < -tolerance
+                                         and '  *** REGRESSION' or ''
+                                        )
+        print(fmt.format(name,'{0:.1f}'.format(rate)
+                        ,'{0:.0f}'.format(r['changes'] / r['seconds'])
+                        ,'{0:.3f}'.format(r['p50_ms'])
+                        ,'{0:.3f}'.format(r['p99_ms'])
+                        ,'{0:.3f}'.format(r['max_ms'])
+                        ,'{0:.1f}'.format(r['rss_mib'])
+                        ,'{0:.1f}'.format(r['rss_growth_mib'])
+                        ,note
+                        ))
+
+    if save:
+        with open(save,'w') as fOut: json.dump(results,fOut,indent=1)
@@ -0,0 +1,276 @@
+"""
+bench_spool.py
+
+Purpose:  run PYLOGIX_SPOOLED_SINK in front of the real MariaDB/MySQL
+          sink, PYLOGIX_LOGGER_MYSQL, against a local stand-in server,
+          STANDIN_MYSQL_SERVER, that speaks enough of the MySQL wire
+          protocol for the sink, and that drops every connection, and
+          refuses new ones, for the middle half of the run; assert that
+          every row produced is committed, and report replay time and
+          rates
+
+          Run twice:  backlog replayed as fast as possible, and at
+          --replay-rate rows/s, when replay must take at least backlog
+          rows / rate seconds
+
+          The server commits the rows of a transaction on COMMIT only,
+          so rows of a transaction cut off by a dropped connection are
+          lost there, and must be resent from the spool; rows may be
+          committed more than once (at least once delivery), but none
+          may be missing
+
+          Needs MySQLdb (mysqlclient) or, in its place, PyMySQL
+
+Usage:  python bench/bench_spool.py [--cycles=2000] [--tags=20]
+                                    [--replay-rate=10000]
+
+"""
+import os
+import re
+import sys
+import time
+import struct
+import socket
+import datetime
+import tempfile
+import threading
+import socketserver
+
+sys.path.insert(0,os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import logger_classes as LC
+import spool_classes as SPC
+
+### PyMySQL stands in for MySQLdb, which needs a C client library
+try:
+    import MySQLdb
+except ImportError:
+    import pymysql
+    pymysql.install_as_MySQLdb()
+
+def getarg(av1,name,default):
+    pfx = '--{0}='.format(name)
+    return type(default)(([default]
+                         +[a[len(pfx):] for a in av1 if a.startswith(pfx)]
+                         )[-1]
+                        )
+
+########################################################################
+### Stand-in MariaDB/MySQL server:  handshake, any credentials accepted;
+### COM_QUERY answered with OK, except SELECT, answered with an error;
+### rows of INSERT ... VALUES (...),... statements are held per
+### connection, and committed on COMMIT, dropped on ROLLBACK or
+### disconnect
+
+### Capabilities:  LONG_PASSWORD, FOUND_ROWS, LONG_FLAG, CONNECT_WITH_DB,
+###                PROTOCOL_41, TRANSACTIONS, SECURE_CONNECTION,
+###                MULTI_RESULTS, PLUGIN_AUTH
+CAPABILITIES = 0x1|0x2|0x4|0x8|0x200|0x2000|0x8000|0x20000|0x80000
+STATUS_AUTOCOMMIT = 0x0002
+
+### One (name,value,timestamp) tuple of literals in INSERT ... VALUES
+LITERAL = r"('(?:[^'\\]|\\.)*'|[^,()']+)"
+rgx_row = re.compile(r'\(\s*{0}\s*,\s*{0}\s*,\s*{0}\s*\)'.format(LITERAL))
+
+class STANDIN_MYSQL_HANDLER(socketserver.BaseRequestHandler):
+
+    def read_packet(self):
+        header = self.recv_exactly(4)
+        length = header[0] | header[1]<<8 | header[2]<<16
+        self.seq = (header[3] + 1) & 0xff
+        return self.recv_exactly(length)
+
+    def recv_exactly(self,n):
+        data = b''
+        while len(data) < n:
+            chunk = self.request.recv(n - len(data))
+            if not chunk: raise ConnectionError('client closed')
+            data += chunk
+        return data
+
+    def write_packet(self,payload):
+        self.request.sendall(struct.pack('<I',len(payload))[:3]
+                             + bytes([self.seq]) + payload
+                            )
+        self.seq = (self.seq + 1) & 0xff
+
+    def ok(self):
+        self.write_packet(b'\x00\x00\x00' + struct.pack('<HH',0,0))
+
+    def error(self,message):
+        self.write_packet(b'\xff' + struct.pack('<H',1064) + b'#42000'
+                          + message.encode('utf-8')
+                         )
+
+    def handle(self):
+        server = self.server
+        if not server.connect(self.request): return
+        try:
+            self.seq = 0
+            salt = b'abcdefgh' + b'ijklmnopqrst'
+            self.write_packet(b'\x0a' + b'5.7.0-standin\x00'
+                              + struct.pack('<I',server.connections)
+                              + salt[:8] + b'\x00'
+                              + struct.pack('<H',CAPABILITIES & 0xffff)
+                              + b'\x21'
+                              + struct.pack('<H',STATUS_AUTOCOMMIT)
+                              + struct.pack('<H',CAPABILITIES >> 16)
+                              + bytes([len(salt)+1]) + b'\x00'*10
+                              + salt[8:] + b'\x00'
+                              + b'mysql_native_password\x00'
+                             )
+            self.read_packet()                  ### Handshake response
+            self.ok()
+
+            pending = list()
+            while True:
+                packet = self.read_packet()
+                command,query = packet[:1],packet[1:].decode('utf-8')
+                if b'\x01' == command: return   ### COM_QUIT
+                if b'\x03' != command:
+                    self.ok()                   ### E.g. COM_PING
+                    continue
+                verb = query.strip().split(None,1)[0].upper()
+                if 'INSERT' == verb:
+                    values = re.split('VALUES',query,1,re.IGNORECASE)[-1]
+                    pending.extend(rgx_row.findall(values))
+                elif 'COMMIT' == verb:
+                    server.commit(pending)
+                    pending = list()
+                elif 'ROLLBACK' == verb:
+                    pending = list()
+                elif 'SELECT' == verb:
+                    self.error('SELECT is not supported by stand-in')
+                    continue
+                self.ok()
+        except (ConnectionError,OSError):
+            pass
+        finally:
+            server.disconnect(self.request)
+
+class STANDIN_MYSQL_SERVER(socketserver.ThreadingTCPServer):
+    """Stand-in MariaDB/MySQL server on a free local port; cf. .down()"""
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self):
+        super().__init__(('127.0.0.1',0,),STANDIN_MYSQL_HANDLER)
+        self.lock = threading.Lock()
+        self.is_down = False
+        self.sockets = set()
+        self.committed = list()
+        ### Counters:  connections accepted; connections refused or
+        ###            dropped; commits
+        self.connections = self.drops = self.commits = 0
+        threading.Thread(target=self.serve_forever,daemon=True).start()
+
+    def down(self,is_down):
+        """Drop all connections, and refuse new ones, while down"""
+        with self.lock:
+            self.is_down = is_down
+            if not is_down: return
+            for sock in self.sockets:
+                self.drops += 1
+                try: sock.shutdown(socket.SHUT_RDWR)
+                except OSError: pass
+            self.sockets = set()
+
+    def connect(self,sock):
+        with self.lock:
+            if self.is_down:
+                self.drops += 1
+                return False
+            self.connections += 1
+            self.sockets.add(sock)
+            return True
+
+    def disconnect(self,sock):
+        with self.lock: self.sockets.discard(sock)
+
+    def commit(self,rows):
+        with self.lock:
+            self.committed.extend(rows)
+            self.commits += 1
+
+########################################################################
+def run(ncycles,ntags,rate):
+    """Run spooled MariaDB/MySQL sink through an outage; return dict of
+results"""
+    server = STANDIN_MYSQL_SERVER()
+    sink = LC.PYLOGIX_LOGGER_MYSQL(db='bench',user='bench'
+                                  ,host='127.0.0.1'
+                                  ,port=server.server_address[1]
+                                  ,flush_seconds=0
+                                  )
+    produced = set()
+    with tempfile.TemporaryDirectory() as spool_dir:
+        spooled = SPC.PYLOGIX_SPOOLED_SINK(sink,spool_dir
+                                          ,replay_rows_per_second=rate
+                                          ,retry_seconds=0.05
+                                          ,max_retry_seconds=0.2
+                                          ,tick_seconds=0.05
+                                          ,fsync=False
+                                          )
+        t0 = time.perf_counter()
+        for i in range(ncycles):
+            ### Server down for the middle half of the run
+            if ncycles//4 == i: server.down(True)
+            if 3*ncycles//4 == i:
+                server.down(False)
+                t_up = time.perf_counter()
+            now = datetime.datetime.utcnow()
+            changeds = [('Tag{0}'.format(j),i,now,) for j in range(ntags)]
+            produced.update([(name,value,) for name,value,ts in changeds])
+            spooled.log_changeds(changeds,now)
+            time.sleep(0.0005)
+        t_spooled = time.perf_counter() - t0
+
+        committed = lambda: set([(name.strip("'"),int(value),)
+                                 for name,value,ts in server.committed
+                                ])
+        while len(committed()) < len(produced):
+            time.sleep(0.01)
+            if time.perf_counter() - t0 > 60: break
+        t_done = time.perf_counter()
+        spooled.close()
+
+    delivered = committed()
+    server.shutdown()
+    server.server_close()
+    return dict(replay_rate=rate
+               ,produced_rows=len(produced)
+               ,committed_rows=len(server.committed)
+               ,lost_rows=len(produced - delivered)
+               ,unexpected_rows=len(delivered - produced)
+               ,duplicate_rows=len(server.committed) - len(delivered)
+               ,connections=server.connections,drops=server.drops
+               ,reconnects=sink.reconnects,failures=spooled.failures
+               ,spool_s=round(t_spooled,3)
+               ,after_outage_s=round(t_done - t_up,3)
+               ,all_delivered_s=round(t_done - t0,3)
+               )
+
+if "__main__" == __name__:
+    av1 = sys.argv[1:]
+    ncycles = getarg(av1,'cycles',2000)
+    ntags = getarg(av1,'tags',20)
+    rate = getarg(av1,'replay-rate',10000.0)
+
+    for replay_rate in (0.0,rate,):
+        result = run(ncycles,ntags,replay_rate)
+        print(result)
+        assert not result['lost_rows'],'rows lost:  {0}'.format(result)
+        assert not result['unexpected_rows'],result
+        assert result['drops'] and result['reconnects'],(
+               'outage did not exercise reconnect:  {0}'.format(result)
+               )
+        if replay_rate:
+            ### Backlog is what was spooled during the outage
+            backlog = (3*ncycles//4 - ncycles//4) * ntags
+            assert result['after_outage_s'] >= 0.9 * backlog / replay_rate,(
+                   'replay faster than {0} rows/s:  {1}'.format(replay_rate
+                                                               ,result
+                                                               )
+                   )
+    print('OK:  every produced row committed, in both runs')
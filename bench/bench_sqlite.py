@@ -0,0 +1,131 @@
+"""
+bench_sqlite.py
+
+Purpose:  measure sustained insert throughput, rows/s, of
+          PYLOGIX_LOGGER_SQLITE into a temporary database file, for
+          several batching settings, against a naive baseline that
+          commits each row in the default (rollback journal) mode; then
+          time a one-tag time-range query with sqlite_query.read
+
+          - row:  baseline, one INSERT and COMMIT per row, DELETE
+                  journal, synchronous FULL
+          - cycle:  one transaction per cycle (--sqlite-flush-rows=1)
+          - batch:  one transaction per --flush-rows rows, WAL,
+                    synchronous NORMAL
+          - batch-full:  as batch, with synchronous FULL
+
+Usage:  python bench/bench_sqlite.py [--tags=200] [--cycles=2000]
+                                     [--change-rate=0.2]
+                                     [--flush-rows=5000]
+                                     [--row-rows=2000]
+
+          - --row-rows limits the rows written by the slow baseline
+
+"""
+import os
+import sys
+import time
+import random
+import sqlite3
+import datetime
+import tempfile
+
+sys.path.insert(0,os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import logger_classes as LC
+import sqlite_query
+
+def getarg(av1,name,default):
+    pfx = '--{0}='.format(name)
+    return type(default)(([default]
+                         +[a[len(pfx):] for a in av1 if a.startswith(pfx)]
+                         )[-1]
+                        )
+
+def make_cycles(ntags,ncycles,change_rate):
+    """Return list of (changeds,now) per cycle, 10 cycles per second,
+with DINT, REAL and BOOL tags"""
+    rnd = random.Random(1)
+    tags = ['Tag{0:05d}'.format(i) for i in range(ntags)]
+    t0 = datetime.datetime(2024,1,31,10,0,0)
+    cycles = list()
+    for k in range(ncycles):
+        now = t0 + datetime.timedelta(seconds=0.1*k)
+        changeds = list()
+        for i,tag in enumerate(tags):
+            if k and rnd.random() >= change_rate: continue
+            value = (k,k*0.5,bool(k & 1),)[i % 3]
+            changeds.append((tag,value,now,))
+        cycles.append((changeds,now,))
+    return tags,cycles
+
+def bench_row(path,cycles,max_rows):
+    """Return rows, seconds for naive per-row commits"""
+    cn = sqlite3.connect(path,isolation_level=None)
+    cn.execute('PRAGMA synchronous=FULL')
+    cn.execute('CREATE TABLE log (tag_name TEXT,tag_value,timestamp TEXT)')
+    rows = 0
+    t0 = time.perf_counter()
+    for changeds,now in cycles:
+        for tag_name,tag_value,timestamp in changeds:
+            cn.execute('BEGIN')
+            cn.execute('INSERT INTO log VALUES (?,?,?)'
+                      ,(tag_name,tag_value,timestamp.isoformat(),)
+                      )
+            cn.execute('COMMIT')
+            rows += 1
+            if rows >= max_rows: break
+        if rows >= max_rows: break
+    dt = time.perf_counter() - t0
+    cn.close()
+    return rows,dt
+
+def bench_logger(path,cycles,**kwargs):
+    """Return rows, seconds for PYLOGIX_LOGGER_SQLITE"""
+    pylogger = LC.PYLOGIX_LOGGER_SQLITE(path,flush_seconds=0,**kwargs)
+    t0 = time.perf_counter()
+    for changeds,now in cycles: pylogger.log_changeds(changeds,now)
+    pylogger.close()
+    dt = time.perf_counter() - t0
+    return pylogger.rows_written,dt
+
+if "__main__" == __name__:
+    av1 = sys.argv[1:]
+    ntags = getarg(av1,'tags',200)
+    ncycles = getarg(av1,'cycles',2000)
+    change_rate = getarg(av1,'change-rate',0.2)
+    flush_rows = getarg(av1,'flush-rows',5000)
+    row_rows = getarg(av1,'row-rows',2000)
+
+    tags,cycles = make_cycles(ntags,ncycles,change_rate)
+
+    fmt = '{0:>11} {1:>10} {2:>10} {3:>12}'
+    print(fmt.format('mode','rows','seconds','rows/s'))
+    with tempfile.TemporaryDirectory() as tmpdir:
+        for mode,kwargs in (('row',None,)
+                           ,('cycle',dict(flush_rows=1),)
+                           ,('batch',dict(flush_rows=flush_rows),)
+                           ,('batch-full',dict(flush_rows=flush_rows
+                                              ,synchronous='FULL'
+                                              ),)
+                           ):
+            path = os.path.join(tmpdir,'{0}.sqlite3'.format(mode))
+            if None is kwargs: rows,dt = bench_row(path,cycles,row_rows)
+            else             : rows,dt = bench_logger(path,cycles,**kwargs)
+            print(fmt.format(mode,rows,'{0:.3f}'.format(dt)
+                            ,'{0:.0f}'.format(rows/(dt or 1e-9))
+                            )
+                 )
+
+        ### Time-range query:  one tag, middle tenth of the run
+        t_start = cycles[ncycles*9//20][1]
+        t_end = cycles[ncycles*11//20][1]
+        t0 = time.perf_counter()
+        result = sqlite_query.read(os.path.join(tmpdir,'batch.sqlite3')
+                                  ,tags=[tags[0]],start=t_start,end=t_end
+                                  )
+        dt = time.perf_counter() - t0
+        print(dict(query_tag=tags[0],query_rows=len(result)
+                  ,query_ms=round(1e3*dt,3)
+                  )
+             )
@@ -0,0 +1,126 @@
+"""
+bench_startup.py
+
+Purpose:  measure startup cost, i.e. import and sink set-up time, and
+          peak memory (maximum RSS), of the logger, each run in a fresh
+          Python process, for
+          - csv-eager:  CSV sink only, importing every sink's libraries
+                        up front (pandas, googleapiclient, ...), as
+                        logger_classes did before sink_registry
+          - csv:  CSV sink only, loaded through sink_registry
+          - all:  every built-in sink loaded through sink_registry;
+                  sinks that need a server (Google Sheets, MariaDB/MySQL)
+                  are not connected, but their libraries are imported,
+                  as they would be on connecting
+
+          Time is the median, and RSS the maximum, over --repeat runs;
+          missing optional libraries are listed, and skipped
+
+          Asserts that, in csv mode, none of the heavy optional libraries
+          (HEAVY, below) is imported at startup
+
+Usage:  python bench/bench_startup.py [--repeat=5]
+
+"""
+import os
+import sys
+import json
+import subprocess
+
+TOP = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def getarg(av1,name,default):
+    pfx = '--{0}='.format(name)
+    return type(default)(([default]
+                         +[a[len(pfx):] for a in av1 if a.startswith(pfx)]
+                         )[-1]
+                        )
+
+### Optional libraries the logger must not import unless a sink or an
+### array tag needs them
+HEAVY = ('numpy','pandas','googleapiclient',)
+
+### Code run in each child process, formatted with top, mode and heavy
+CHILD = """
+import time
+t0 = time.perf_counter()
+import os, sys, json, resource, tempfile, importlib
+sys.path.insert(0,{top!r})
+mode = {mode!r}
+missing = list()
+def optional(module_name):
+    try: importlib.import_module(module_name)
+    except ImportError: missing.append(module_name)
+if 'csv-eager' == mode:
+    for module_name in ('pandas','credentials_plclogpoc'
+                       ,'googleapiclient.discovery'
+                       ):
+        optional(module_name)
+### Modules imported by the logger itself
+import signal, contextlib, datetime, pylogix
+import sink_registry as SR
+import scheduler_classes, worker_classes, spool_classes
+import filter_classes, controller_classes
+tmpdir = tempfile.mkdtemp()
+path = lambda name: os.path.join(tmpdir,name)
+sinks = [SR.load('csv')(path('log.csv'))]
+if 'all' == mode:
+    sinks.append(SR.load('flat_ascii')(path('log.txt')))
+    for name,args in (('excel',(path('log.xlsx'),),)
+                     ,('parquet',(path('log.parquet'),),)
+                     ,('sqlite',(path('log.sqlite3'),),)
+                     ):
+        try: sinks.append(SR.load(name)(*args))
+        except ImportError as e: missing.append(e.name)
+    SR.load('google_sheet')
+    SR.load('mysql')
+    for module_name in ('credentials_plclogpoc','googleapiclient.discovery'
+                       ,'MySQLdb'
+                       ):
+        optional(module_name)
+dt = time.perf_counter() - t0
+for sink in sinks: sink.close()
+print(json.dumps(dict(seconds=dt
+                     ,maxrss_kib=resource.getrusage(resource.RUSAGE_SELF
+                                                   ).ru_maxrss
+                     ,missing=missing
+                     ,modules=len(sys.modules)
+                     ,heavy=sorted(set([m.split('.')[0] for m in sys.modules
+                                        if m.split('.')[0] in {heavy!r}
+                                       ]))
+                     )
+                )
+     )
+"""
+
+def run(mode):
+    """Return dict of seconds, maxrss_kib, missing, modules and heavy,
+from one child process"""
+    child = CHILD.format(top=TOP,mode=mode,heavy=HEAVY)
+    out = subprocess.run([sys.executable,'-c',child]
+                        ,check=True,capture_output=True,text=True
+                        ,cwd=TOP
+                        ).stdout
+    return json.loads(out.strip().split('\n')[-1])
+
+if "__main__" == __name__:
+    av1 = sys.argv[1:]
+    repeat = getarg(av1,'repeat',5)
+
+    fmt = '{0:>10} {1:>12} {2:>13} {3:>8}'
+    print(fmt.format('mode','startup ms','max RSS MiB','modules'))
+    for mode in ('csv-eager','csv','all',):
+        results = [run(mode) for i in range(repeat)]
+        seconds = sorted([r['seconds'] for r in results])[repeat//2]
+        maxrss = max([r['maxrss_kib'] for r in results])
+        print(fmt.format(mode,'{0:.1f}'.format(1e3*seconds)
+                        ,'{0:.1f}'.format(maxrss/1024.)
+                        ,results[-1]['modules']
+                        )
+             )
+        if results[-1]['missing']:
+            print('{0:>10} missing:  {1}'.format('',results[-1]['missing']))
+        if 'csv' == mode:
+            assert not results[-1]['heavy'],(
+                   'csv startup imported {0}'.format(results[-1]['heavy'])
+                   )
@@ -0,0 +1,450 @@
+"""
+controller_classes.py
+
+Purpose:  log many PLCs from one process, into one shared set of sinks:
+          each controller is polled by its own worker, a thread or a
+          process, with its own acquisition stages and scheduler, so a
+          slow or disconnected PLC does not delay the others; all
+          workers feed one queue, drained by one dispatcher thread into
+          the sinks, which see a single producer as in one-PLC mode
+
+"""
+import time
+import queue
+import signal
+import pylogix
+import threading
+import traceback
+import acquisition_classes as AC
+import scheduler_classes as SC
+import filter_classes as FC
+import metrics_classes as MC
+
+########################################################################
+def make_acquisitions(comm,ipaddr,scan_classes,*args
+                     ,plc=None
+                     ,micro8xx=False
+                     ,micro8xx_sessions=1
+                     ,sessions=1
+                     ,connection_size=None
+                     ,filter_rules=None
+                     ,controller_id=None
+                     ,metrics=None
+                     ,debug=False
+                     ,**kwargs
+                     ):
+    """
+Return list of PYLOGIX_ACQUISITION, one per scan class, all on one PLC
+
+             comm:  open pylogix.PLC instance
+           ipaddr:  IP address of PLC, for any extra sessions
+     scan_classes:  sorted list of (interval,tags) pairs; tags may
+                    include array specs, cf. PYLOGIX_ARRAY_TAG
+              plc:  class or function returning pylogix.PLC-like
+                    instance for an IP address; default pylogix.PLC
+         micro8xx:  True if PLC is Micro8xx
+micro8xx_sessions:  Micro8xx:  parallel sessions, one tag per request
+         sessions:  Logix:  parallel sessions for packet-sized groups
+  connection_size:  Logix:  connection size, bytes; None => negotiated
+     filter_rules:  list of filter_classes.PYLOGIX_FILTER_RULE, or None
+    controller_id:  name of PLC, prefixed to tag names in records
+          metrics:  metrics_classes.PYLOGIX_METRICS shared by all
+                    stages, or None
+            debug:  Set to True to send debugging info to stdout
+
+"""
+    plc = plc or pylogix.PLC
+    comm.Micro800 = micro8xx
+
+    def make_reader(tags):
+
+        ### Micro8xx cannot read sequence of tags; read one tag per
+        ### request, over micro8xx_sessions sessions
+        if micro8xx:
+            return AC.PYLOGIX_MICRO800_READER(
+                     comm,tags
+                    ,sessions=micro8xx_sessions
+                    ,make_comm=lambda : plc(ipaddr,Micro800=True)
+                    )
+
+        ### Logix:  packet-sized groups, over sessions sessions
+        if sessions > 1 or connection_size:
+            return AC.PYLOGIX_CHUNKED_READER(
+                     comm,tags
+                    ,sessions=sessions
+                    ,make_comm=lambda : plc(ipaddr)
+                    ,connection_size=connection_size
+                    )
+        return AC.PYLOGIX_LOGIX_READER(comm,tags)
+
+    ### Array specs e.g. Arr[0]:500 are read as blocks, one request each
+    acqs = list()
+    for scan_interval,scan_tags in scan_classes:
+        scalar_tags,arrays = AC.split_tags(scan_tags)
+        acqs.append(AC.PYLOGIX_ACQUISITION(comm,scalar_tags
+                                          ,micro8xx=micro8xx
+                                          ,reader=make_reader(scalar_tags)
+                                          ,change_filter=filter_rules and
+                                             FC.PYLOGIX_CHANGE_FILTER(
+                                               scalar_tags,filter_rules
+                                             ) or None
+                                          ,controller_id=controller_id
+                                          ,arrays=arrays
+                                          ,metrics=metrics
+                                          ,debug=debug
+                                          )
+                   )
+    return acqs
+
+########################################################################
+def logged_tag_names(scan_classes,controller_ids=None):
+    """
+Return tag names as acquisition stages pass them to sinks:  scalar tags,
+and array elements, e.g. Arr[0]:3 => Arr[0], Arr[1], Arr[2], of all scan
+classes; with controller IDs, as 'controller_id/TagName' for each
+
+  scan_classes:  sorted list of (interval,tags) pairs, as for
+                 make_acquisitions()
+controller_ids:  names of PLCs, with --plc; None => one unnamed PLC
+
+"""
+    names = list()
+    for scan_interval,scan_tags in scan_classes:
+        scalar_tags,arrays = AC.split_tags(scan_tags)
+        names.extend(scalar_tags)
+        for array in arrays: names.extend(array.names)
+    prefixes = ['{0}/'.format(controller_id)
+                for controller_id in (controller_ids or list())
+               ] or ['']
+    return [prefix+name for prefix in prefixes for name in names]
+
+########################################################################
+########################################################################
+
+class PYLOGIX_QUEUE_SINK:
+    """Stand-in sink, in a controller worker, that puts each cycle's
+changes on the controller pool's queue"""
+
+    ################################
+    def __init__(self,controller_id,queue,*args,**kwargs):
+        self.controller_id = controller_id
+        self.queue = queue
+
+    ################################
+    def log_changeds(self,changeds,now,*args,**kwargs):
+        """Queue (controller_id,changeds,now); cycles without changes
+are not queued"""
+        if changeds: self.queue.put((self.controller_id,changeds,now,))
+
+########################################################################
+########################################################################
+
+class PYLOGIX_CONTROLLER_WORKER:
+    """Poll one PLC:  acquisition stages and scheduler, on a thread or
+in a process of its own"""
+
+    ################################
+    def __init__(self,controller_id,ipaddr,scan_classes,queue,stop,*args
+                ,overrun='skip'
+                ,retry_seconds=5.0
+                ,acquisition_kwargs=None
+                ,process=False
+                ,metrics=None
+                ,debug=False
+                ,**kwargs
+                ):
+        """
+     controller_id:  name of PLC, prefixed to tag names in records
+            ipaddr:  IP address of PLC
+      scan_classes:  sorted list of (interval,tags) pairs
+             queue:  queue shared by all workers, drained by dispatcher
+              stop:  threading.Event, or multiprocessing.Event, set to
+                     stop worker
+           overrun:  scheduler overrun policy, 'skip' or 'catch-up'
+     retry_seconds:  wait, s, after a failed cycle e.g. PLC unreachable
+acquisition_kwargs:  keyword arguments for make_acquisitions()
+           process:  True if worker runs in a process of its own
+           metrics:  metrics_classes.PYLOGIX_METRICS, for stage timings
+                     and counters; None with process=True
+             debug:  Set to True to send debugging info to stdout
+
+All state is built in .run(), so the worker can be started in a new
+process
+
+"""
+        self.controller_id = controller_id
+        self.ipaddr = ipaddr
+        self.scan_classes = scan_classes
+        self.queue = queue
+        self.stop = stop
+        self.overrun = overrun
+        self.retry_seconds = float(retry_seconds)
+        self.acquisition_kwargs = dict(acquisition_kwargs or dict())
+        self.process = process
+        self.metrics = metrics
+        self.debug = debug
+
+        ### Counters:  failed cycles; cycles that succeeded after a
+        ###            failure, i.e. PLC connection re-established
+        self.errors = self.reconnects = 0
+        if metrics:
+            metrics.add_counters(self,dict(errors='errors'
+                                          ,reconnects='reconnects'
+                                          )
+                                ,source='controller'
+                                ,controller=controller_id
+                                )
+
+    ################################
+    def sleep(self,seconds):
+        """Scheduler sleep; raise KeyboardInterrupt once stop is set"""
+        if self.stop.wait(seconds): raise KeyboardInterrupt
+
+    ################################
+    def run(self):
+        """
+Read PLC, per scan class schedule, until stop is set; put changes on
+queue; last, put (controller_id,None,stats) on queue
+
+- A failed cycle, e.g. PLC timeout, is reported and retried after
+  retry_seconds; it does not stop the worker
+
+"""
+        ### In a process, leave CONTROL+C to parent, which sets stop
+        if self.process: signal.signal(signal.SIGINT,signal.SIG_IGN)
+
+        plc = self.acquisition_kwargs.get('plc') or pylogix.PLC
+        failed = False
+        with plc(self.ipaddr) as comm:
+            acqs = make_acquisitions(comm,self.ipaddr,self.scan_classes
+                                    ,controller_id=self.controller_id
+                                    ,metrics=self.metrics
+                                    ,debug=self.debug
+                                    ,**self.acquisition_kwargs
+                                    )
+            sink = PYLOGIX_QUEUE_SINK(self.controller_id,self.queue)
+            for acq in acqs: acq.add(sink)
+            sched = SC.MULTI_RATE_SCHEDULER([i for i,ts in self.scan_classes]
+                                           ,policy=self.overrun
+                                           ,sleep=self.sleep
+                                           ,metrics=self.metrics
+                                           ,controller_id=self.controller_id
+                                           ,debug=self.debug
+                                           )
+            ### Check stop each pass:  a PLC slower than its scan
+            ### classes overruns every deadline, so never sleeps
+            while not self.stop.is_set():
+                try:
+                    for i in sched.wait():
+                        acqs[i]()
+                        if failed: self.reconnects += 1
+                        failed = False
+                except KeyboardInterrupt:
+                    break
+                except Exception as e:
+                    self.errors += 1
+                    failed = True
+                    print(dict(controller=self.controller_id,error=repr(e)))
+                    if self.debug: traceback.print_exc()
+                    if self.stop.wait(self.retry_seconds): break
+
+            for acq in acqs: acq.close()
+
+        self.queue.put((self.controller_id,None
+                       ,dict(controller=self.controller_id
+                            ,ip=self.ipaddr
+                            ,cycles=sum([acq.cycles for acq in acqs])
+                            ,changes=sum([acq.changes for acq in acqs])
+                            ,errors=self.errors
+                            ,reconnects=self.reconnects
+                            ,filters=[acq.change_filter.stats()
+                                      for acq in acqs if acq.change_filter
+                                     ]
+                            ,schedule=sched.summary()
+                            )
+                       ,))
+
+########################################################################
+########################################################################
+
+class PYLOGIX_CONTROLLER_POOL:
+    """One worker per PLC, plus one dispatcher thread feeding all
+workers' changes to the shared sinks"""
+
+    ### Worker kinds
+    POOLS = ('thread','process',)
+
+    ################################
+    def __init__(self,controllers,scan_classes,*args
+                ,pool='thread'
+                ,maxsize=1000
+                ,overrun='skip'
+                ,acquisition_kwargs=None
+                ,metrics=None
+                ,debug=False
+                ,**kwargs
+                ):
+        """
+       controllers:  list of (controller_id,ipaddr) pairs
+      scan_classes:  sorted list of (interval,tags) pairs, the same for
+                     every controller
+              pool:  'thread' or 'process':
+                     - thread:  PLC reads wait on the network without
+                                holding the GIL, so threads suit PLCs
+                                that are slow to reply
+                     - process:  change detection of each controller
+                                 runs on its own core; changes are
+                                 pickled to the dispatcher
+           maxsize:  maximum number of change batches queued for the
+                     dispatcher; workers wait when it is full
+           overrun:  scheduler overrun policy, 'skip' or 'catch-up'
+acquisition_kwargs:  keyword arguments for make_acquisitions()
+           metrics:  metrics_classes.PYLOGIX_METRICS, to time each sink
+                     call of the dispatcher; with pool='thread', workers
+                     also record their stage timings and counters
+                     *** N.B. with pool='process', they do not:  each
+                              process would record into its own copy
+             debug:  Set to True to send debugging info to stdout
+
+"""
+        assert pool in self.POOLS,('Invalid controller pool [{0}]; must'
+                                   ' be one of {1}'.format(pool,self.POOLS)
+                                  )
+        ids = [controller_id for controller_id,ipaddr in controllers]
+        assert len(set(ids)) == len(ids),('Duplicate controller ID in'
+                                          ' {0}'.format(ids)
+                                         )
+        self.controllers = list(controllers)
+        self.pool = pool
+        self.debug = debug
+        self.pyloggers = list()
+        self.now = None
+        self.metrics = metrics or MC.PYLOGIX_METRICS()
+        self.h_sinks = list()
+
+        if 'process' == pool:
+            import multiprocessing
+            self.queue = multiprocessing.Queue(maxsize)
+            self.stop = multiprocessing.Event()
+            Worker = multiprocessing.Process
+        else:
+            self.queue = queue.Queue(maxsize)
+            self.stop = threading.Event()
+            Worker = threading.Thread
+
+        self.workers = [Worker(target=PYLOGIX_CONTROLLER_WORKER(
+                                        controller_id,ipaddr,scan_classes
+                                       ,self.queue,self.stop
+                                       ,overrun=overrun
+                                       ,acquisition_kwargs=acquisition_kwargs
+                                       ,process='process' == pool
+                                       ,metrics=(None if 'process' == pool
+                                                 else metrics
+                                                )
+                                       ,debug=debug
+                                       ).run
+                              ,name='plc-{0}'.format(controller_id)
+                              ,daemon=True
+                              )
+                        for controller_id,ipaddr in self.controllers
+                       ]
+        self.dispatcher = threading.Thread(target=self.dispatch
+                                          ,name='plc-dispatcher'
+                                          ,daemon=True
+                                          )
+
+        ### Per controller:  final statistics from worker
+        self.controller_stats = dict()
+
+        ### Counters:  change batches, and records, dispatched to sinks
+        self.batches = self.records = 0
+
+    ################################
+    def start(self):
+        """
+Start workers; changes are queued until .add_sinks()
+
+*** N.B. with pool='process', start workers before opening sinks, so
+         worker processes do not inherit sink files and connections
+
+"""
+        for worker in self.workers: worker.start()
+
+    ################################
+    def add_sinks(self,pyloggers):
+        """Set shared sinks, and start dispatcher thread"""
+        self.pyloggers = list(pyloggers)
+        self.h_sinks = [self.metrics.histogram('sink_submit'
+                                              ,sink=MC.sink_name(pylogger)
+                                              )
+                        for pylogger in self.pyloggers
+                       ]
+        self.dispatcher.start()
+
+    ################################
+    def dispatch(self):
+        """
+Dispatcher thread:  pass each queued batch of changes to every sink; on
+idle, pass an empty cycle, so sinks logging inline (--queue-size=0) can
+flush per their time-based policies
+
+"""
+        while True:
+            try:
+                item = self.queue.get(timeout=1.0)
+            except queue.Empty:
+                item = (None,list(),self.now,)
+            if None is item: break
+
+            controller_id,changeds,now = item
+            if None is changeds:
+                self.controller_stats[controller_id] = now   ### Stats
+                continue
+            if None is now: continue          ### Idle before first batch
+
+            self.now = now
+            if changeds:
+                self.batches += 1
+                self.records += len(changeds)
+
+            ### One sink's error must not stop the others
+            for pylogger,h_sink in zip(self.pyloggers,self.h_sinks):
+                t0 = time.perf_counter()
+                try:
+                    pylogger.log_changeds(changeds,now)
+                except:
+                    traceback.print_exc()
+                h_sink.observe(time.perf_counter() - t0)
+
+    ################################
+    def close(self):
+        """Stop workers, and wait for them to close their readers and
+queue held-back changes; then drain queue to sinks, and stop dispatcher"""
+        self.stop.set()
+        for worker in self.workers: worker.join()
+        self.queue.put(None)
+        if self.dispatcher.is_alive(): self.dispatcher.join()
+
+    ################################
+    def summary(self):
+        """Return multi-line summary:  per controller statistics, then
+totals dispatched"""
+        lines = list()
+        for controller_id,ipaddr in self.controllers:
+            stats = dict(self.controller_stats.get(controller_id
+                                                  ,dict(controller=
+                                                          controller_id
+                                                       ,ip=ipaddr
+                                                       )
+                                                  )
+                        )
+            schedule = stats.pop('schedule','')
+            lines.append(str(stats))
+            if schedule:
+                lines.extend(['  '+line for line in schedule.split('\n')])
+        lines.append(str(dict(pool=self.pool,controllers=len(self.workers)
+                             ,batches=self.batches,records=self.records
+                             )
+                         )
+                    )
+        return '\n'.join(lines)
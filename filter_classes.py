@@ -0,0 +1,315 @@
+"""
+filter_classes.py
+
+Purpose:  per-tag filtering of detected changes, so noisy analog values
+          do not flood the sinks:  absolute and percent deadbands, a
+          minimum time between logged samples, and a maximum time after
+          which an unchanged value is logged anyway (heartbeat); or
+          historian-style swinging-door compression, which logs only
+          the points needed to rebuild each trend, by linear
+          interpolation, within a set deviation
+
+"""
+import time
+import fnmatch
+
+########################################################################
+########################################################################
+
+class PYLOGIX_FILTER_RULE:
+    """Filter settings for tags matching one glob pattern"""
+
+    ### Option keys accepted by .parse(), and attribute names
+    KEYS = dict(abs='deadband',pct='percent',min='min_seconds'
+               ,max='max_seconds',sdc='deviation'
+               )
+
+    ################################
+    def __init__(self,pattern,*args
+                ,deadband=0.0
+                ,percent=0.0
+                ,min_seconds=0.0
+                ,max_seconds=0.0
+                ,deviation=0.0
+                ,**kwargs
+                ):
+        """
+    pattern:  glob pattern (fnmatch) of tag names e.g. 'Program:*.AI_*'
+   deadband:  absolute change below which a new value is not logged
+    percent:  change, percent of last logged value, below which a new
+              value is not logged
+min_seconds:  minimum time, s, between logged samples of a tag
+max_seconds:  log value after this time, s, even if unchanged; 0 =>
+              never
+  deviation:  swinging-door compression deviation; 0 => no compression;
+              if non-zero, deadband, percent and min_seconds are ignored
+
+Deadbands and compression only apply to numeric values; other values are
+logged when they differ from the last logged value
+
+"""
+        self.pattern = pattern
+        self.deadband = float(deadband)
+        self.percent = float(percent)
+        self.min_seconds = float(min_seconds)
+        self.max_seconds = float(max_seconds)
+        self.deviation = float(deviation)
+
+    ################################
+    @classmethod
+    def parse(cls,arg):
+        """
+Return rule from PATTERN:KEY=VALUE[,KEY=VALUE...], e.g.
+
+  AI_*:abs=0.5,pct=1,min=1.0,max=60
+
+"""
+        pattern,settings = (arg.rsplit(':',1)+[''])[:2]
+        kwargs = dict()
+        for setting in [s for s in settings.split(',') if s]:
+            key,value = setting.split('=',1)
+            assert key in cls.KEYS,('Invalid filter key [{0}] in [{1}];'
+                                    ' must be one of {2}'
+                                    .format(key,arg,tuple(cls.KEYS))
+                                   )
+            kwargs[cls.KEYS[key]] = float(value)
+        return cls(pattern,**kwargs)
+
+    ################################
+    def suppress(self,new,old):
+        """Return True if change from old to new is inside deadband"""
+        if isinstance(new,bool): return False
+        try:
+            delta = abs(new - old)
+        except TypeError:
+            return False
+        if delta < self.deadband: return True
+        return delta * 100.0 < self.percent * abs(old)
+
+########################################################################
+########################################################################
+
+class PYLOGIX_SWINGING_DOOR:
+    """
+Swinging-door compression of one tag's samples:  the door is the range
+of slopes, from the last archived point (pivot), of lines that pass
+within deviation of every sample since; a sample is held back while the
+line to it lies inside the door, so every sample skipped is within
+deviation of the line between archived points; otherwise the held sample
+is archived, and becomes the new pivot
+
+"""
+
+    ################################
+    def __init__(self,deviation,*args,**kwargs):
+        """
+deviation:  largest allowed difference between any sample and the line
+            between the archived points either side of it
+
+"""
+        self.deviation = float(deviation)
+        self.pivot = None           ### (t,value) of last archived point
+        self.held = None            ### (t,value,stamp) of held sample
+        self.lower = self.upper = None   ### Slopes of door edges
+
+    ################################
+    def add(self,t,value,stamp):
+        """
+Return list of (value,stamp) points to archive, after adding one sample
+
+    t:  sample time, s, on any clock that does not go backwards
+value:  sample value, numeric
+stamp:  timestamp to log with value, if value is archived
+
+"""
+        if None is self.pivot:
+            self.pivot = (t,value,)
+            return [(value,stamp,)]
+
+        t_pivot,v_pivot = self.pivot
+        if not (None is self.held): t_last = self.held[0]
+        else                      : t_last = t_pivot
+        if t <= t_last: return list()    ### No time has passed; ignore
+
+        deviation = self.deviation
+        upper = (value + deviation - v_pivot) / (t - t_pivot)
+        lower = (value - deviation - v_pivot) / (t - t_pivot)
+
+        if None is self.held:
+            self.upper,self.lower = upper,lower
+            self.held = (t,value,stamp,)
+            return list()
+
+        slope = (value - v_pivot) / (t - t_pivot)
+        if self.lower <= slope <= self.upper:
+            ### Line to this sample is inside door:  hold this sample
+            ### instead, and narrow door
+            self.upper = min([self.upper,upper])
+            self.lower = max([self.lower,lower])
+            self.held = (t,value,stamp,)
+            return list()
+
+        ### Door closed:  archive held sample, and swing from there
+        t_held,v_held,stamp_held = self.held
+        self.pivot = (t_held,v_held,)
+        self.upper = (value + deviation - v_held) / (t - t_held)
+        self.lower = (value - deviation - v_held) / (t - t_held)
+        self.held = (t,value,stamp,)
+        return [(v_held,stamp_held,)]
+
+    ################################
+    def flush(self):
+        """Return list of held sample, if any, to archive e.g. on
+shutdown; the held sample becomes the pivot"""
+        if None is self.held: return list()
+        t_held,v_held,stamp_held = self.held
+        self.pivot = (t_held,v_held,)
+        self.held = None
+        return [(v_held,stamp_held,)]
+
+########################################################################
+########################################################################
+
+class PYLOGIX_CHANGE_FILTER:
+    """
+Change detection with per-tag filter rules, for one PYLOGIX_ACQUISITION;
+tags that match no rule are logged whenever their value changes
+
+"""
+
+    ################################
+    def __init__(self,tags,rules,*args
+                ,clock=time.monotonic
+                ,**kwargs
+                ):
+        """
+ tags:  sequence of PLC tag names, in reader order
+rules:  sequence of PYLOGIX_FILTER_RULE; the last rule that matches a
+        tag name applies to that tag
+clock:  monotonic clock function; default time.monotonic
+
+"""
+        self.tags = list(tags)
+        self.clock = clock
+        self.rules = [None] * len(self.tags)
+        for i,tag in enumerate(self.tags):
+            for rule in rules:
+                if fnmatch.fnmatchcase(tag,rule.pattern): self.rules[i] = rule
+
+        ### Swinging-door compressor for each tag with a deviation
+        self.doors = [rule and rule.deviation
+                      and PYLOGIX_SWINGING_DOOR(rule.deviation) or None
+                      for rule in self.rules
+                     ]
+
+        ### Per tag:  last value read; time, s, of last logged value
+        self.lasts = [None] * len(self.tags)
+        self.t_loggeds = [None] * len(self.tags)
+
+        ### Counters:  values evaluated; raw changes (value differs from
+        ###            previous read); changes logged; values, that
+        ###            differ from last logged value, held back by
+        ###            deadband and by minimum time; unchanged values
+        ###            logged as heartbeats; samples held back by
+        ###            swinging-door compression
+        self.evaluated = self.raw_changes = self.logged = 0
+        self.deadbanded = self.throttled = self.heartbeats = 0
+        self.compressed = 0
+
+    ################################
+    def detect(self,news,olds,now):
+        """
+Return list of (TagName,Value,now) triplets to log, and update olds,
+the last logged value of each tag
+
+news:  pylogix element list, each with .TagName and .Value attributes
+olds:  list of last logged values, one per tag; None => not yet logged
+ now:  timestamp to put in each triplet
+
+"""
+        t = self.clock()
+        changeds = list()
+        rules,lasts,t_loggeds = self.rules,self.lasts,self.t_loggeds
+        doors = self.doors
+
+        for i,new in enumerate(news):
+            value = new.Value
+            if lasts[i] != value: self.raw_changes += 1
+            lasts[i] = value
+
+            old,rule = olds[i],rules[i]
+
+            ### Swinging door logs held-back samples, with their own
+            ### timestamps, so it appends to changeds itself
+            if (doors[i] and isinstance(value,(int,float,))
+                and not isinstance(value,bool)
+               ):
+                points = doors[i].add(t,value,now)
+                if (not points and rule.max_seconds
+                    and t - t_loggeds[i] >= rule.max_seconds
+                   ):
+                    points = doors[i].flush()
+                    self.heartbeats += 1
+                if not points: self.compressed += 1
+                for v,stamp in points:
+                    changeds.append((new.TagName,v,stamp,))
+                    olds[i] = v
+                    t_loggeds[i] = t
+                continue
+
+            if None is old:
+                log = True
+            elif None is rule:
+                log = old != value
+            else:
+                age = t - t_loggeds[i]
+                if rule.max_seconds and age >= rule.max_seconds:
+                    log = True
+                    if old == value: self.heartbeats += 1
+                elif old == value:
+                    log = False
+                elif rule.min_seconds and age < rule.min_seconds:
+                    log = False
+                    self.throttled += 1
+                elif rule.suppress(value,old):
+                    log = False
+                    self.deadbanded += 1
+                else:
+                    log = True
+
+            if log:
+                changeds.append((new.TagName,value,now,))
+                olds[i] = value
+                t_loggeds[i] = t
+
+        self.evaluated += len(news)
+        self.logged += len(changeds)
+        return changeds
+
+    ################################
+    def flush(self):
+        """
+Return list of (TagName,Value,Timestamp) triplets of samples held back
+by swinging-door compression, e.g. on shutdown, so the end of each
+trend is logged
+
+"""
+        changeds = list()
+        for i,door in enumerate(self.doors):
+            if None is door: continue
+            for v,stamp in door.flush():
+                changeds.append((self.tags[i],v,stamp,))
+        self.logged += len(changeds)
+        return changeds
+
+    ################################
+    def stats(self):
+        """Return dict of filter statistics, including volume removed"""
+        removed = self.raw_changes + self.heartbeats - self.logged
+        return dict(evaluated=self.evaluated,raw_changes=self.raw_changes
+                   ,logged=self.logged,heartbeats=self.heartbeats
+                   ,deadbanded=self.deadbanded,throttled=self.throttled
+                   ,compressed=self.compressed
+                   ,removed=removed
+                   ,removed_pct=100.0*removed/(self.raw_changes or 1)
+                   )
@@ -0,0 +1,238 @@
+"""
+flat_query.py
+
+Purpose:  read values of selected tags, over a time range, from a flat
+          ASCII or CSV log, and its rotated segments, written with
+          --flat-index-seconds=N, reading only the byte ranges that the
+          sidecar indexes (<segment>.idx) list for those tags and times:
+          - uncompressed segments are read through mmap
+          - gzip and zstd segments are read with forward seeks
+          - segments without an index, and records past the indexed
+            offset of a segment, are scanned
+
+Usage:  python flat_query.py --log=csv_log.csv \\
+                             [--tag=TAG0[ --tag=TAG1[ ...]]] \\
+                             [--start=2024-01-31T10:00] \\
+                             [--end=2024-01-31T10:05] \\
+                             [--stats]
+
+          - --log is the path given to --flat-csv or --flat-ascii
+          - Prints 'TagName,Value,Timestamp' rows, as CSV, to stdout
+          - --start is inclusive; --end is exclusive; both are UTC
+          - --stats prints bytes read (decompressed), and bytes of segment
+            files, to stderr
+
+From Python:
+
+  import flat_query
+  rows = flat_query.read('csv_log.csv',tags=['TAG0'],start=...,end=...)
+
+"""
+import os
+import re
+import sys
+import gzip
+import json
+import mmap
+import datetime
+
+EPOCH = datetime.datetime(1970,1,1)
+
+### Compressed segment suffixes, as written by --flat-compress
+SUFFIXES = ('.gz','.zst',)
+
+########################################################################
+def parse_time(s):
+    """Return UTC datetime from ISO string, or None"""
+    if None is s or isinstance(s,datetime.datetime): return s
+    return datetime.datetime.fromisoformat(s)
+
+########################################################################
+def split_line(line,separator=None):
+    """
+Return (TagName,Value,Timestamp string) of one logged line, and field
+separator; separator None => detect, ' - ' (flat ASCII) or ',' (CSV);
+raise ValueError for a blank or partial line
+
+"""
+    if None is separator: separator = ' - ' if ' - ' in line else ','
+    name,rest = line.split(separator,1)
+    value,stamp = rest.rsplit(separator,1)
+    return (name,value,stamp.strip(),),separator
+
+########################################################################
+def segments(log_name):
+    """
+Return list of (segment path,index path) of closed segments, oldest
+first, then of current log file; index path is None if there is no index
+
+"""
+    base,ext = os.path.splitext(os.path.basename(log_name))
+    rgx = re.compile('^{0}_\\d{{8}}T\\d{{6}}(_\\d+)?{1}(\\.gz|\\.zst)?$'
+                     .format(re.escape(base),re.escape(ext))
+                    )
+    dirname = os.path.dirname(log_name) or '.'
+    paths = [os.path.join(dirname,name)
+             for name in sorted(os.listdir(dirname)) if rgx.match(name)
+            ]
+    if os.path.isfile(log_name): paths.append(log_name)
+
+    rtn = list()
+    for path in paths:
+        idx_path = path
+        for suffix in SUFFIXES:
+            if path.endswith(suffix): idx_path = path[:-len(suffix)]
+        idx_path += '.idx'
+        rtn.append((path,os.path.isfile(idx_path) and idx_path or None,))
+    return rtn
+
+########################################################################
+def load_index(idx_path):
+    """
+Return bucket width, s; field separator; covered byte offset; and list
+of (bucket,first,end,TagName) entries, from one index file
+
+"""
+    entries = list()
+    covered = 0
+    with open(idx_path) as fIn:
+        header,bucket_seconds,separator = fIn.readline().rstrip('\n'
+                                                       ).split('\t')
+        assert '#pylogix-index' == header,('Not an index file [{0}]'
+                                            .format(idx_path)
+                                           )
+        for line in fIn:
+            if not line.endswith('\n'): break      ### Partial last line
+            fields = line[:-1].split('\t',3)
+            if '#covered' == fields[0]:
+                covered = int(fields[1])
+                continue
+            bucket,first,end = [int(f) for f in fields[:3]]
+            entries.append((bucket,first,end,fields[3],))
+    return int(bucket_seconds),json.loads(separator),covered,entries
+
+########################################################################
+def ranges(entries,tags,bucket_first,bucket_last):
+    """Return sorted, merged list of [first,end] byte ranges of entries
+for tags (None => all) in buckets bucket_first through bucket_last"""
+    rtn = list()
+    for first,end in sorted([(first,end,)
+                             for bucket,first,end,name in entries
+                             if bucket_first <= bucket <= bucket_last
+                             and (None is tags or name in tags)
+                            ]):
+        if rtn and first <= rtn[-1][1]: rtn[-1][1] = max([rtn[-1][1],end])
+        else                          : rtn.append([first,end])
+    return rtn
+
+########################################################################
+def open_segment(path):
+    """Return binary file object of segment, decompressed if needed"""
+    if path.endswith('.gz'): return gzip.open(path,'rb')
+    if path.endswith('.zst'):
+        import zstandard
+        return zstandard.ZstdDecompressor().stream_reader(open(path,'rb')
+                                                         ,closefd=True
+                                                         )
+    return open(path,'rb')
+
+########################################################################
+def read_ranges(path,byte_ranges,stats):
+    """Return list of bytes blocks of segment path, one per [first,end]
+range; end None => to end of segment"""
+    blocks = list()
+    with open_segment(path) as fIn:
+        if not (path.endswith(SUFFIXES)):
+            size = os.fstat(fIn.fileno()).st_size
+            stats['bytes_total'] += size
+            if not size: return blocks
+            with mmap.mmap(fIn.fileno(),0,access=mmap.ACCESS_READ) as mm:
+                for first,end in byte_ranges:
+                    blocks.append(mm[first:end])
+        else:
+            stats['bytes_total'] += os.path.getsize(path)
+            offset = 0
+            for first,end in byte_ranges:
+                if first > offset: fIn.seek(first - offset,os.SEEK_CUR)
+                block = fIn.read(-1 if None is end else end - first)
+                blocks.append(block)
+                offset = first + len(block)
+    stats['bytes_read'] += sum([len(block) for block in blocks])
+    return blocks
+
+########################################################################
+def read(log_name,tags=None,start=None,end=None,stats=None):
+    """
+Return list of (TagName,Value,Timestamp) triplets for tags in
+[start,end), sorted by timestamp; Value and Timestamp are strings, as
+logged
+
+log_name:  path of flat ASCII or CSV log, as given to --flat-csv or
+           --flat-ascii
+    tags:  sequence of tag names; None => all tags
+   start:  UTC datetime or ISO string, inclusive; None => no limit
+     end:  UTC datetime or ISO string, exclusive; None => no limit
+   stats:  dict to which bytes_read and bytes_total are added, or None
+
+"""
+    start,end = parse_time(start),parse_time(end)
+    tags = tags and set(tags) or None
+    stats = stats if not (None is stats) else dict()
+    stats.setdefault('bytes_read',0)
+    stats.setdefault('bytes_total',0)
+
+    rows = list()
+    for path,idx_path in segments(log_name):
+        separator = None
+        if None is idx_path:
+            byte_ranges = [[0,None]]
+        else:
+            bucket_seconds,separator,covered,entries = load_index(idx_path)
+            seconds = lambda t: (t - EPOCH).total_seconds()
+            bucket_first = start and int(seconds(start)//bucket_seconds)
+            bucket_last = end and int(-(-seconds(end)//bucket_seconds)) - 1
+            byte_ranges = ranges(entries,tags
+                                ,-(1<<62) if None is start else bucket_first
+                                ,1<<62 if None is end else bucket_last
+                                )
+            ### Records past indexed offset, e.g. of current segment
+            byte_ranges.append([covered,None])
+
+        for block in read_ranges(path,byte_ranges,stats):
+            for line in block.decode('utf-8').splitlines():
+                try:
+                    (name,value,stamp,),separator = split_line(line
+                                                              ,separator
+                                                              )
+                    timestamp = parse_time(stamp)
+                except ValueError:
+                    continue         ### Blank or partial line
+                if tags and name not in tags: continue
+                if start and timestamp < start: continue
+                if end and timestamp >= end: continue
+                rows.append((timestamp,name,value,stamp,))
+
+    rows.sort(key=lambda row: row[:2])
+    return [(name,value,stamp,) for timestamp,name,value,stamp in rows]
+
+if "__main__" == __name__:
+
+    av1 = sys.argv[1:]
+
+    ### 1) Flat ASCII or CSV log:  --log=csv_log.csv
+
+    log_name = ([None]+[a[6:] for a in av1 if a[:6]=='--log='])[-1]
+    assert log_name,__doc__
+
+    ### 2) Tags, and UTC time range [start,end)
+
+    tags = [a[6:] for a in av1 if a[:6]=='--tag='] or None
+    start = ([None]+[a[8:] for a in av1 if a[:8]=='--start='])[-1]
+    end = ([None]+[a[6:] for a in av1 if a[:6]=='--end='])[-1]
+
+    stats = dict()
+    for tag,value,timestamp in read(log_name,tags=tags,start=start,end=end
+                                   ,stats=stats
+                                   ):
+        sys.stdout.write('{0},{1},{2}\n'.format(tag,value,timestamp))
+    if '--stats' in av1: sys.stderr.write('{0}\n'.format(stats))
@@ -4,16 +4,25 @@ logger_classes.py
 Purpose:  log data, as [item.TagName,item.Value,Timestamp] triplets, to
           various types of media
 
+          Timestamps are UTC datetime.datetime instances; each logger
+          formats them, lazily, to its own native type:  ISO string for
+          flat ASCII and Google Sheets; datetime for eXcel and for
+          MariaDB/MySQL DATETIME(6); timestamp[us] for Parquet; integer
+          microseconds since epoch for SQLite
+
 """
 import re
 import os
+import gzip
+import json
+import time
+import queue
+import shutil
 import datetime
+import numbers
+import tempfile
+import threading
 import traceback
-import pandas as pd
-from credentials_plclogpoc import get_creds
-from googleapiclient.discovery import build
-
-rgx_ur = re.compile(':C(\d+)$')
 
 ########################################################################
 ########################################################################
@@ -21,10 +30,16 @@ rgx_ur = re.compile(':C(\d+)$')
 class PYLOGIX_LOGGER:
     """Base class for logging name/value/timestamp triplets"""
 
+    ### Counters exposed as metrics:  metric name => attribute name; cf.
+    ### metrics_classes.PYLOGIX_METRICS.add_counters
+    COUNTERS = dict()
+
     ################################
-    def __init__(self,olds,*args,debug=False,**kwargs):
+    def __init__(self,olds=None,*args,debug=False,**kwargs):
         """
  olds:  pylogix element list, each with .TagName and .Value attributes
+        - Only needed for .log_news; not needed when changes are
+          supplied by acquisition_classes.PYLOGIX_ACQUISITION
 debug:  Set to True to send debugging info to stdout
 
 """
@@ -34,8 +49,13 @@ debug:  Set to True to send debugging info to stdout
                                            ' by itself'
                                           )
         self.debug = debug
-        self.olds = olds
+        self.olds = olds or list()
         for old in self.olds: old.Value = None
+        self.changeds = list()
+        self.now = None
+
+        ### Last timestamp formatted by .iso(), and its ISO string
+        self.iso_timestamp = self.iso_string = None
 
     ################################
     def log_news(self,news,*args,**kwargs):
@@ -52,45 +72,560 @@ Log changes in tracked values:
 news:  pylogix element list, each with .TagName and .Value attributes
 
 """
-        self.now = datetime.datetime.utcnow().isoformat()[:19]
-        self.changeds = list()
+        now = datetime.datetime.utcnow()
+        changeds = list()
 
         for old,new in zip(self.olds,news):
             if old.Value != new.Value:
-                self.changeds.append((new.TagName,new.Value,self.now,))
+                changeds.append((new.TagName,new.Value,now,))
                 old.Value = new.Value
 
+        self.log_changeds(changeds,now,*args,**kwargs)
+
+    ################################
+    def log_changeds(self,changeds,now,*args,**kwargs):
+        """
+Log changes already detected elsewhere e.g. by a shared acquisition
+stage (cf. acquisition_classes.PYLOGIX_ACQUISITION)
+
+changeds:  list of (TagName,Value,Timestamp) triplets
+     now:  timestamp of this cycle, UTC datetime.datetime
+
+"""
+        self.now = now
+        self.changeds = changeds
+
         ### Sub-class must have method .__call__(...)
         self(*args,**kwargs)
 
+    ################################
+    def iso(self,timestamp):
+        """
+Return timestamp as ISO string, with microseconds; the triplets of one
+cycle share one timestamp, which is formatted once
+
+- Strings, e.g. from a spool written by an older version, are returned
+  as they are
+
+"""
+        if not (timestamp is self.iso_timestamp):
+            self.iso_timestamp = timestamp
+            if isinstance(timestamp,datetime.datetime):
+                self.iso_string = timestamp.isoformat(timespec='microseconds')
+            else:
+                self.iso_string = str(timestamp)
+        return self.iso_string
+
+    ################################
+    def tick(self):
+        """Periodic call, with or without changes, for time-based
+flushing; override as needed"""
+        pass
+
+    ################################
+    def flush(self):
+        """Write buffered data now; override as needed"""
+        pass
+
+    ################################
+    def discard(self):
+        """Drop buffered data not yet written, e.g. after an error when
+the caller will send the same data again; override as needed"""
+        pass
+
+    ################################
+    def close(self):
+        """Flush buffered data and release resources; override as needed"""
+        pass
+
+########################################################################
+########################################################################
+
+class PYLOGIX_SEGMENT_COMPRESSOR:
+    """Compress closed log segments, and remove old segments, on a
+background thread"""
+
+    ### Compression methods, and filename suffixes
+    METHODS = {None:'','gzip':'.gz','zstd':'.zst'}
+
+    ################################
+    def __init__(self,method=None,keep=0,debug=False):
+        """
+method:  None, 'gzip' or 'zstd' (requires zstandard module)
+  keep:  number of most recent closed segments to keep; 0 => all
+ debug:  Set to True to send debugging info to stdout
+
+"""
+        assert method in self.METHODS,('Invalid compression method [{0}];'
+                                       ' must be one of {1}'
+                                       .format(method,list(self.METHODS))
+                                      )
+        self.method = method
+        self.keep = int(keep or 0)
+        self.debug = debug
+        self.queue = queue.Queue()
+        self.thread = threading.Thread(target=self.run
+                                      ,name='segment-compressor'
+                                      ,daemon=True
+                                      )
+        self.thread.start()
+
+    ################################
+    def submit(self,path,pattern):
+        """
+Queue closed segment for compression, then removal of older segments
+
+   path:  path to closed segment
+pattern:  compiled regex matching names of all closed segments in the
+          directory of path
+
+"""
+        self.queue.put((path,pattern,))
+
+    ################################
+    def run(self):
+        """Background thread:  compress and prune, in order of submission"""
+        while True:
+            item = self.queue.get()
+            if None is item: break
+            try:
+                path,pattern = item
+                if self.method: self.compress(path)
+                if self.keep: self.prune(os.path.dirname(path),pattern)
+            except:
+                traceback.print_exc()
+
+    ################################
+    def compress(self,path):
+        """Compress path to path.gz or path.zst, then remove path
+
+- Skip path if already removed as an old segment by .prune()
+
+"""
+        if not os.path.exists(path): return
+        zpath = path + self.METHODS[self.method]
+        with open(path,'rb') as fIn:
+            if 'zstd' == self.method:
+                import zstandard
+                with open(zpath,'wb') as fOut:
+                    zstandard.ZstdCompressor().copy_stream(fIn,fOut)
+            else:
+                with gzip.open(zpath,'wb') as fOut:
+                    shutil.copyfileobj(fIn,fOut)
+        os.remove(path)
+        if self.debug: print(dict(compressed=zpath))
+
+    ################################
+    def prune(self,dirname,pattern):
+        """Remove all but the newest self.keep closed segments, and
+their sidecar indexes"""
+        names = sorted([name for name in os.listdir(dirname or '.')
+                        if pattern.match(name)
+                       ])
+        for name in names[:-self.keep]:
+            os.remove(os.path.join(dirname,name))
+            if self.debug: print(dict(removed=name))
+
+            ### Sidecar index, if any, of uncompressed segment name
+            idx_path = os.path.join(dirname,re.sub('(\\.gz|\\.zst)$',''
+                                                  ,name
+                                                  )+'.idx'
+                                   )
+            if os.path.exists(idx_path): os.remove(idx_path)
+
+    ################################
+    def close(self):
+        """Finish queued work, and stop background thread"""
+        self.queue.put(None)
+        self.thread.join()
+
+########################################################################
+########################################################################
+
+class PYLOGIX_FLAT_INDEX:
+    """
+Sidecar time index of one flat ASCII or CSV log segment, in file
+<log_name>.idx:  for each time bucket, and each tag with records with
+timestamps in that bucket, the byte range, [first,end), of the segment
+that holds those records (cf. flat_query.py)
+
+"""
+
+    ### First line of index file; marks covered byte offset of segment
+    HEADER = '#pylogix-index'
+    COVERED = '#covered'
+
+    EPOCH = datetime.datetime(1970,1,1)
+
+    ################################
+    def __init__(self,log_name,bucket_seconds,fmtstr,debug=False):
+        """
+      log_name:  path to flat ASCII or CSV log file
+bucket_seconds:  width of time buckets, s, integer
+        fmtstr:  format string of log records, with separator between
+                 fields e.g. '{0},{1},{2}\n'
+         debug:  Set to True to send debugging info to stdout
+
+Entries are written, appended, when the cycle timestamp moves to a new
+bucket, and on rotation and close, each time followed by the byte offset
+up to which the segment is indexed; on open, any records after that
+offset, e.g. after a crash, are scanned and indexed, so the index stays
+correct across restarts
+
+"""
+        self.log_name = log_name
+        self.idx_name = log_name + '.idx'
+        self.bucket_seconds = max([1,int(float(bucket_seconds))])
+        self.bucket_delta = datetime.timedelta(seconds=self.bucket_seconds)
+        self.separator = fmtstr.format('\0','\0','\0').split('\0')[1]
+        self.header = '{0}\t{1}\t{2}\n'.format(self.HEADER
+                                              ,self.bucket_seconds
+                                              ,json.dumps(self.separator)
+                                              )
+        self.debug = debug
+        self.fIdx = None
+
+        ### (bucket,TagName) => [first,end] byte range, not yet written
+        self.pending = dict()
+        self.bucket = None
+
+        ### Last timestamp converted by .bucket_of(), and its bucket
+        self.bucket_timestamp = self.bucket_value = None
+
+    ################################
+    def bucket_of(self,timestamp):
+        """Return bucket number of timestamp; the triplets of one cycle
+share one timestamp, which is converted once"""
+        if not (timestamp is self.bucket_timestamp):
+            self.bucket_timestamp = timestamp
+            if not isinstance(timestamp,datetime.datetime):
+                timestamp = datetime.datetime.fromisoformat(str(timestamp))
+            self.bucket_value = (timestamp - self.EPOCH) // self.bucket_delta
+        return self.bucket_value
+
+    ################################
+    def open(self):
+        """
+Open index file of log segment for append, and set .offset, the byte
+offset of the end of the segment
+
+- Start a new index file if log file is new or empty, if index file is
+  missing or was written with other settings, or if it covers more than
+  the log file holds e.g. after buffered data were lost
+- Scan, and index, records past the covered offset
+
+"""
+        size = os.path.isfile(self.log_name) and os.path.getsize(
+                                                   self.log_name
+                                                 ) or 0
+        covered = None
+        if size and os.path.isfile(self.idx_name):
+            with open(self.idx_name) as fIn:
+                if fIn.readline() == self.header:
+                    covered = 0
+                    for line in fIn:
+                        if line.startswith(self.COVERED):
+                            covered = int(line.split('\t')[1])
+
+        if None is covered or covered > size:
+            covered = 0
+            self.fIdx = open(self.idx_name,'w')
+            self.fIdx.write(self.header)
+        else:
+            self.fIdx = open(self.idx_name,'a')
+
+        self.pending = dict()
+        self.bucket = None
+        self.offset = covered
+        if size > covered: self.scan(covered,size)
+        if self.debug: print(dict(index=self.idx_name,covered=covered
+                                 ,scanned=size-covered
+                                 ))
+
+    ################################
+    def scan(self,start,size):
+        """Index records of log file from byte offset start to size, and
+write index entries"""
+        separator = self.separator.encode('utf-8')
+        with open(self.log_name,'rb') as fIn:
+            fIn.seek(start)
+            offset = start
+            for line in fIn:
+                if offset >= size: break
+                end = offset + len(line)
+                try:
+                    name = line.split(separator,1)[0].decode('utf-8')
+                    bucket = self.bucket_of(line.rstrip(b'\r\n').rsplit(
+                                              separator,1
+                                            )[1].decode('utf-8')
+                                           )
+                except (ValueError,IndexError,):
+                    offset = end
+                    continue         ### E.g. partial line after crash
+                self.put(bucket,name,offset,end)
+                offset = end
+        self.offset = size
+        self.write()
+
+    ################################
+    def put(self,bucket,name,first,end):
+        """Extend byte range of tag name in bucket"""
+        entry = self.pending.get((bucket,name,))
+        if None is entry: self.pending[(bucket,name,)] = [first,end]
+        else            : entry[1] = end
+
+    ################################
+    def due(self,now):
+        """Return True if cycle timestamp now is in a new bucket, and
+there are entries to write"""
+        bucket,self.bucket = self.bucket,self.bucket_of(now)
+        return bool(self.pending) and bucket != self.bucket
+
+    ################################
+    def add(self,changeds,lines,isascii):
+        """
+Index records about to be appended to log file
+
+changeds:  list of (TagName,Value,Timestamp) triplets
+   lines:  formatted records, one per triplet
+ isascii:  True if all lines are ASCII, so characters are bytes
+
+"""
+        offset,put,bucket_of = self.offset,self.put,self.bucket_of
+        for (name,value,timestamp),line in zip(changeds,lines):
+            end = offset + (isascii and len(line)
+                            or len(line.encode('utf-8'))
+                           )
+            put(bucket_of(timestamp),name,offset,end)
+            offset = end
+        self.offset = offset
+
+    ################################
+    def write(self):
+        """Append pending entries, and covered offset, to index file
+
+*** N.B. caller must first flush log records up to .offset to the OS"""
+        self.fIdx.write(''.join(['{0}\t{1}\t{2}\t{3}\n'.format(bucket,first
+                                                              ,end,name
+                                                              )
+                                 for (bucket,name),(first,end)
+                                 in sorted(self.pending.items())
+                                ])
+                        + '{0}\t{1}\n'.format(self.COVERED,self.offset)
+                       )
+        self.fIdx.flush()
+        self.pending = dict()
+
+    ################################
+    def close(self):
+        """Write pending entries, and close index file"""
+        if None is self.fIdx or self.fIdx.closed: return
+        self.write()
+        self.fIdx.close()
+
 ########################################################################
 ########################################################################
 
 class PYLOGIX_LOGGER_FLAT_ASCII(PYLOGIX_LOGGER):
     """Log data to flat ASCII file"""
 
+    ### Length of ISO timestamp prefix 'YYYY-MM-DDTHH:MM' that is the
+    ### same throughout each wall-clock rotation period
+    ROTATE_WHENS = dict(minute=16,hour=13,day=10)
+
     ################################
     def __init__(self,log_name,*args
                      ,fmtstr="{0} - {1} - {2}\n"
+                     ,buffer_size=65536
+                     ,flush_records=0
+                     ,flush_seconds=0
+                     ,fsync_seconds=0
+                     ,rotate_bytes=0
+                     ,rotate_when=None
+                     ,compress=None
+                     ,keep=0
+                     ,index_seconds=0
                      ,**kwargs
                 ):
         """
-log_name:  path to flat ASCII file
-  fmtstr:  format string for Tagname,Value,Timestamp
-           - Default string is 'TagName - Value - Timestamp\n'
+     log_name:  path to flat ASCII file
+       fmtstr:  format string for Tagname,Value,Timestamp
+                - Default string is 'TagName - Value - Timestamp\n'
+  buffer_size:  size of write buffer, bytes
+flush_records:  flush buffer after this many records; 0 => disabled
+flush_seconds:  flush buffer after this many seconds; 0 => disabled
+fsync_seconds:  flush buffer, and fsync file, after this many seconds;
+                0 => disabled
+ rotate_bytes:  close segment when it reaches this size; 0 => disabled
+  rotate_when:  close segment at each UTC 'minute', 'hour' or 'day'
+                boundary; None => disabled
+     compress:  compress closed segments with None, 'gzip' or 'zstd'
+         keep:  number of closed segments to keep; 0 => all
+index_seconds:  time bucket width, s, of sidecar index <log_name>.idx,
+                which maps buckets and tags to byte ranges of the log,
+                cf. PYLOGIX_FLAT_INDEX and flat_query.py; 0 => no index
+
+*** N.B. if flush_records and flush_seconds are both 0, the buffer is
+         flushed after every cycle with changes
+
+The file is opened once, in append mode, and kept open until .close()
+
+A closed segment is renamed from e.g. log.txt to log_<start>.txt, where
+<start> is the UTC timestamp of its first record, YYYYmmddTHHMMSS;
+compression and removal of old segments run on a background thread; its
+index, if any, is renamed to log_<start>.txt.idx, and is removed with it
 
 """
         self.log_name = log_name
         self.format = fmtstr.format
+        self.buffer_size = int(buffer_size)
+        self.flush_records = int(flush_records or 0)
+        self.flush_seconds = float(flush_seconds or 0)
+        self.fsync_seconds = float(fsync_seconds or 0)
+        self.flush_each = not (self.flush_records or self.flush_seconds)
         super().__init__(*args,**kwargs)
 
+        assert rotate_when in [None]+list(self.ROTATE_WHENS),(
+               'Invalid rotate_when [{0}]; must be one of {1}'
+               .format(rotate_when,list(self.ROTATE_WHENS))
+               )
+        self.rotate_bytes = int(rotate_bytes or 0)
+        self.rotate_len = rotate_when and self.ROTATE_WHENS[rotate_when]
+        self.compressor = None
+        if self.rotate_bytes or self.rotate_len:
+            self.compressor = PYLOGIX_SEGMENT_COMPRESSOR(method=compress
+                                                        ,keep=keep
+                                                        ,debug=self.debug
+                                                        )
+            base,ext = os.path.splitext(os.path.basename(self.log_name))
+            self.segment_pattern = re.compile(
+                r'^{0}_\d{{8}}T\d{{6}}(_\d+)?{1}(\.gz|\.zst)?$'
+                .format(re.escape(base),re.escape(ext))
+            )
+
+        self.index = None
+        if float(index_seconds or 0):
+            self.index = PYLOGIX_FLAT_INDEX(self.log_name,index_seconds
+                                           ,fmtstr,debug=self.debug
+                                           )
+
+        self.unflushed = 0
+        self.t_flush = self.t_fsync = time.monotonic()
+        self.fOut = self.open()
+
+    ################################
+    def open(self):
+        """
+Open log file for append, with write buffer; track size and start time
+of current segment
+
+- Start time of existing non-empty file is taken from its modification
+  time
+- Index, if any, is opened, and brought up to date, first
+
+"""
+        self.segment_start = None
+        self.segment_bytes = 0
+        if os.path.isfile(self.log_name):
+            self.segment_bytes = os.path.getsize(self.log_name)
+            if self.segment_bytes:
+                self.segment_start = datetime.datetime.utcfromtimestamp(
+                                       os.path.getmtime(self.log_name)
+                                     ).isoformat()[:19]
+        if self.index: self.index.open()
+        return open(self.log_name, "a", buffering=self.buffer_size)
+
     ################################
     def __call__(self,*args,**kwargs):
-        """Append changed data to flat ASCII file"""
+        """Append changed data to flat ASCII file, with one write"""
         if self.changeds:                  ### Do nothing for no changes
-            with open(self.log_name, "a") as fOut:
-                for changed in self.changeds:
-                    fOut.write(self.format(*changed))
+            now,iso = self.iso(self.now),self.iso
+            if self.rotate_len and not (None is self.segment_start) and (
+               self.segment_start[:self.rotate_len] != now[:self.rotate_len]
+               ):
+                self.rotate()
+            if None is self.segment_start: self.segment_start = now
+
+            lines = [self.format(name,value,iso(timestamp))
+                     for name,value,timestamp in self.changeds
+                    ]
+            text = ''.join(lines)
+            if self.index:
+                ### Write entries of past bucket, after its records
+                if self.index.due(self.now):
+                    self.flush()
+                    self.index.write()
+                self.index.add(self.changeds,lines,text.isascii())
+            self.fOut.write(text)
+            self.segment_bytes += (text.isascii() and len(text)
+                                   or len(text.encode('utf-8'))
+                                  )
+            self.unflushed += len(self.changeds)
+            if self.flush_each or (self.flush_records
+                                   and self.unflushed >= self.flush_records
+                                  ):
+                self.flush()
+
+            if self.rotate_bytes and self.segment_bytes >= self.rotate_bytes:
+                self.rotate()
+        self.tick()
+
+    ################################
+    def rotate(self):
+        """Close current segment, rename it with its start time, queue it
+for compression, and open new segment"""
+        if not self.segment_bytes: return
+        self.fOut.close()
+        self.unflushed = 0
+        if self.index: self.index.close()
+
+        base,ext = os.path.splitext(self.log_name)
+        stamp = self.segment_start[:19].replace('-','').replace(':','')
+        new_name,n = '{0}_{1}{2}'.format(base,stamp,ext),0
+        while [p for p in (new_name,new_name+'.gz',new_name+'.zst',)
+               if os.path.exists(p)
+              ]:
+            n += 1
+            new_name = '{0}_{1}_{2}{3}'.format(base,stamp,n,ext)
+        os.rename(self.log_name,new_name)
+        if self.index: os.rename(self.index.idx_name,new_name+'.idx')
+        if self.debug: print(dict(rotated=new_name))
+
+        self.compressor.submit(new_name,self.segment_pattern)
+        self.fOut = self.open()
+
+    ################################
+    def tick(self):
+        """Flush and fsync, per time-based policies"""
+        if not (self.flush_seconds or self.fsync_seconds): return
+        now = time.monotonic()
+        if self.fsync_seconds and (now - self.t_fsync) >= self.fsync_seconds:
+            self.flush(fsync=True)
+        elif (self.flush_seconds and self.unflushed
+              and (now - self.t_flush) >= self.flush_seconds
+             ):
+            self.flush()
+
+    ################################
+    def flush(self,fsync=False):
+        """Flush write buffer to OS; optionally fsync file to disk"""
+        self.fOut.flush()
+        self.unflushed = 0
+        self.t_flush = now = time.monotonic()
+        if fsync:
+            self.t_fsync = now
+            try: os.fsync(self.fOut.fileno())
+            except OSError: pass           ### E.g. /dev/stdout
+
+    ################################
+    def close(self):
+        """Flush and fsync buffered data, close file, and finish any
+compression of closed segments"""
+        if self.fOut.closed: return
+        self.flush(fsync=True)
+        self.fOut.close()
+        if self.index: self.index.close()
+        if self.compressor: self.compressor.close()
 
 ########################################################################
 ########################################################################
@@ -111,46 +646,327 @@ csv_name:  path to CSV file; cf. log_name in PYLOGIX_LOGGER_FLAT_ASCII
 ########################################################################
 ########################################################################
 
+class PYLOGIX_LOGGER_PARQUET(PYLOGIX_LOGGER):
+    """Log 'TagName,Value,Timestamp' to Parquet files, in row groups"""
+
+    ### Typed value columns; each row fills the one for its value's type
+    VALUE_COLUMNS = ('value_double','value_int','value_bool','value_text',)
+
+    COUNTERS = dict(parquet_row_groups='row_groups',parquet_files='files')
+
+    ################################
+    def __init__(self,parquet_name,*args
+                ,row_group_rows=65536
+                ,flush_seconds=60.0
+                ,rotate_bytes=0
+                ,rotate_seconds=3600.0
+                ,compression='zstd'
+                ,**kwargs
+                ):
+        """
+  parquet_name:  base path of Parquet files e.g. log.parquet
+row_group_rows:  write a row group when this many rows are buffered
+ flush_seconds:  write a row group when oldest buffered row is this
+                 old, s; 0 => only on row_group_rows
+  rotate_bytes:  close file when it reaches this size; 0 => disabled
+rotate_seconds:  close file when it is this old, s; 0 => disabled
+   compression:  Parquet compression codec e.g. 'zstd', 'snappy', None
+
+Each file is written as <base>_<start>.parquet.tmp, then renamed, when
+closed, to <base>_<start>_<end>.parquet, where <start> and <end> are the
+UTC timestamps, YYYYmmddTHHMMSS, of its first and last rows, so readers
+can select files by time without opening them (cf. parquet_query.py)
+
+Columns:  tag (dictionary-encoded string); timestamp (UTC, us); and
+value_double, value_int, value_bool, value_text, one of which is set in
+each row; rows of each row group are sorted by tag, then timestamp, so
+row group statistics let readers skip row groups by tag and time
+
+*** N.B. a Parquet file is only readable once closed; a .tmp file left
+         by a crash holds no readable data
+
+"""
+        ### Optional dependency, only needed for this logger
+        import pyarrow
+        import pyarrow.compute
+        import pyarrow.parquet
+        self.pa,self.pq = pyarrow,pyarrow.parquet
+        self.pc = pyarrow.compute
+
+        super().__init__(*args,**kwargs)
+
+        self.parquet_name = parquet_name
+        self.row_group_rows = max([1,int(row_group_rows)])
+        self.flush_seconds = float(flush_seconds or 0)
+        self.rotate_bytes = int(rotate_bytes or 0)
+        self.rotate_seconds = float(rotate_seconds or 0)
+        self.compression = compression
+
+        pa = self.pa
+        self.schema = pa.schema([('tag',pa.dictionary(pa.int32(),pa.string()))
+                                ,('timestamp',pa.timestamp('us',tz='UTC'))
+                                ,('value_double',pa.float64())
+                                ,('value_int',pa.int64())
+                                ,('value_bool',pa.bool_())
+                                ,('value_text',pa.string())
+                                ])
+
+        self.rows = list()
+        self.writer = None
+        self.tmp_name = None
+        self.segment_start = self.segment_end = None
+        self.t_segment = self.t_flush = time.monotonic()
+
+        ### Counters:  row groups written; files closed
+        self.row_groups = self.files = 0
+
+    ################################
+    def __call__(self,*args,**kwargs):
+        """Buffer changes; write row group when enough are buffered"""
+        if self.changeds:
+            if not self.rows: self.t_flush = time.monotonic()
+            self.rows.extend(self.changeds)
+            if len(self.rows) >= self.row_group_rows: self.flush()
+        self.tick()
+
+    ################################
+    def tick(self):
+        """Write row group, and close file, per time-based policies"""
+        now = time.monotonic()
+        if (self.rows and self.flush_seconds
+            and (now - self.t_flush) >= self.flush_seconds
+           ):
+            self.flush()
+        if (self.writer and self.rotate_seconds
+            and (now - self.t_segment) >= self.rotate_seconds
+           ):
+            self.flush()
+            self.rotate()
+
+    ################################
+    def table(self,rows):
+        """Return pyarrow Table of rows, sorted by tag, then timestamp"""
+        rows = sorted(rows,key=lambda row:(row[0],row[2],))
+        columns = dict([(name,[None]*len(rows),)
+                        for name in self.VALUE_COLUMNS
+                       ])
+        doubles,ints = columns['value_double'],columns['value_int']
+        bools,texts = columns['value_bool'],columns['value_text']
+        for i,(tag_name,value,timestamp) in enumerate(rows):
+            if isinstance(value,bool): bools[i] = value
+            elif isinstance(value,int): ints[i] = value
+            elif isinstance(value,float): doubles[i] = value
+            else: texts[i] = str(value)
+        pa = self.pa
+        return pa.table([pa.array([row[0] for row in rows]
+                                 ).dictionary_encode()
+                                  .cast(self.schema.field('tag').type)
+                        ,pa.array([row[2] for row in rows]
+                                 ,type=self.schema.field('timestamp').type
+                                 )
+                        ]
+                       +[pa.array(columns[name]
+                                 ,type=self.schema.field(name).type
+                                 )
+                         for name in self.VALUE_COLUMNS
+                        ]
+                       ,schema=self.schema
+                       )
+
+    ################################
+    def flush(self):
+        """Write buffered rows as one row group; close file if it has
+reached rotate_bytes"""
+        if not self.rows: return
+        table = self.table(self.rows)
+        self.rows = list()
+        self.t_flush = time.monotonic()
+
+        ### Rows are sorted by tag, so find time range of row group
+        first_last = self.pc.min_max(table.column('timestamp'))
+        first,last = first_last['min'].as_py(),first_last['max'].as_py()
+
+        if None is self.writer: self.open(first)
+        self.writer.write_table(table,row_group_size=len(table))
+        self.row_groups += 1
+        self.segment_start = min([self.segment_start,first])
+        self.segment_end = max([self.segment_end or last,last])
+
+        if self.rotate_bytes and (os.path.getsize(self.tmp_name)
+                                  >= self.rotate_bytes
+                                 ):
+            self.rotate()
+
+    ################################
+    @staticmethod
+    def stamp(timestamp):
+        """Return YYYYmmddTHHMMSS of timestamp"""
+        return timestamp.strftime('%Y%m%dT%H%M%S')
+
+    ################################
+    def open(self,first):
+        """Open new file, named for timestamp of its first row"""
+        self.segment_start = first
+        self.segment_end = None
+        base,ext = os.path.splitext(self.parquet_name)
+        self.tmp_name = '{0}_{1}{2}.tmp'.format(base
+                                               ,self.stamp(self.segment_start)
+                                               ,ext
+                                               )
+        self.writer = self.pq.ParquetWriter(self.tmp_name,self.schema
+                                           ,compression=self.compression
+                                           )
+        self.t_segment = time.monotonic()
+
+    ################################
+    def rotate(self):
+        """Close current file, and rename it with its time range"""
+        if None is self.writer: return
+        self.writer.close()
+        self.writer = None
+
+        base,ext = os.path.splitext(self.parquet_name)
+        stamps = '{0}_{1}'.format(self.stamp(self.segment_start)
+                                 ,self.stamp(self.segment_end)
+                                 )
+        new_name,n = '{0}_{1}{2}'.format(base,stamps,ext),0
+        while os.path.exists(new_name):
+            n += 1
+            new_name = '{0}_{1}_{2}{3}'.format(base,stamps,n,ext)
+        os.rename(self.tmp_name,new_name)
+        self.files += 1
+        if self.debug: print(dict(parquet_closed=new_name))
+
+    ################################
+    def discard(self):
+        """Drop buffered rows"""
+        self.rows = list()
+
+    ################################
+    def close(self):
+        """Write buffered rows, and close current file"""
+        self.flush()
+        self.rotate()
+
+########################################################################
+########################################################################
+
 class PYLOGIX_LOGGER_EXCEL(PYLOGIX_LOGGER):
     """Log 'TagName,Value,Timestamp' to eXcel workbook"""
 
+    ### Rows per worksheet allowed by eXcel, less one for header
+    XL_MAX_ROWS = 1048575
+
+    ### Default limit for rows per workbook:  each write of a workbook
+    ### rewrites all of its rows, so this bounds write time and memory
+    DEFAULT_MAX_ROWS = 10000
+
     ################################
-    def __init__(self,xl_name,*args,max_rows=0,**kwargs):
+    def __init__(self,xl_name,*args
+                ,max_rows=None
+                ,max_seconds=0
+                ,flush_seconds=5.0
+                ,**kwargs
+                ):
         """
- xl_name:  path to eXcel workbook
-max_rows:  approximate limit for number of rows in worksheet
-           *** N.B. 0 => no limit
+      xl_name:  path to eXcel workbook
+     max_rows:  limit for number of rows in workbook; when reached, the
+                workbook is renamed with a UTC timestamp suffix, and a
+                new workbook is started; None => DEFAULT_MAX_ROWS
+                *** N.B. 0 => no limit, other than eXcel's own limit
+  max_seconds:  same as max_rows, for age of workbook, s; 0 => no limit
+flush_seconds:  minimum time, s, between writes of workbook to disk
+                *** N.B. 0 => write on every cycle with changes
+
+Rows of the current workbook are kept in memory, so the workbook is
+written without ever being read back.  Each write rewrites every row of
+the current workbook, so its time and memory grow with max_rows.  Any
+existing workbook at xl_name is renamed at startup.
 
 """
+        ### Optional dependency, only needed for this logger
+        import pandas
+        self.pd = pandas
+
         super().__init__(*args,**kwargs)
 
         self.xl_name = xl_name
-        ### Left-most index of rows to keep
-        self.left_index = (max_rows and int(max_rows) > 0
-                          ) and -int(max_rows) or 0
+        if None is max_rows: max_rows = self.DEFAULT_MAX_ROWS
+        self.max_rows = min([int(max_rows) > 0 and int(max_rows)
+                             or self.XL_MAX_ROWS
+                            ,self.XL_MAX_ROWS
+                            ])
+        self.max_seconds = float(max_seconds or 0)
+        self.flush_seconds = float(flush_seconds or 0)
+
+        self.rows = list()
+        self.dirty = False
+        self.t_segment = self.t_flush = time.monotonic()
+
+        if os.path.exists(self.xl_name): self.rename()
 
     ################################
     def __call__(self,*args,**kwargs):
-        """Append changes to eXcel worksheet"""
-        if self.changeds:                  ### Do nothing for no changes
+        """Append changes to in-memory rows; write workbook per cadence"""
+        if self.changeds:
+            for changed in self.changeds:
+                if len(self.rows) >= self.max_rows: self.roll()
+                self.rows.append(changed)
+                self.dirty = True
+        self.tick()
 
-            ### Put new data into Pandas DataFrame
-            dfnew = pd.DataFrame(self.changeds
-                                ,columns='Item Value Timestamp'.split()
-                                )
-            try:
-                ### Read old data from worksheet into Pandas Dataframe
-                ### Use same column names for new data
-                dfold = pd.read_excel(self.xl_name)
-                dfnew.columns = dfold.columns
-            except:
-                ### On any error reading old data, assume no old data
-                dfold = pd.DataFrame([],columns=dfnew.columns)
+    ################################
+    def tick(self):
+        """Start new workbook, or write workbook, per time-based
+policies, with or without changes"""
+        now = time.monotonic()
+        if self.max_seconds and (now - self.t_segment) >= self.max_seconds:
+            self.roll()
+        elif self.dirty and (now - self.t_flush) >= self.flush_seconds:
+            self.flush()
+
+    ################################
+    def flush(self):
+        """Write in-memory rows to temporary workbook, then replace
+workbook with it, so xl_name is always a complete workbook"""
+        if not self.dirty: return
+
+        base,ext = os.path.splitext(self.xl_name)
+        tmp_name = '{0}.tmp{1}'.format(base,ext)
+        with self.pd.ExcelWriter(tmp_name, mode="w") as writer:
+            self.pd.DataFrame(self.rows
+                        ,columns='Item Value Timestamp'.split()
+                        ).to_excel(writer,index=False)
+        os.replace(tmp_name,self.xl_name)
+
+        self.dirty = False
+        self.t_flush = time.monotonic()
+
+    ################################
+    def rename(self):
+        """Rename workbook at xl_name, adding a UTC timestamp suffix"""
+        base,ext = os.path.splitext(self.xl_name)
+        stamp = datetime.datetime.utcnow().strftime('%Y%m%dT%H%M%S')
+        new_name,n = '{0}_{1}{2}'.format(base,stamp,ext),0
+        while os.path.exists(new_name):
+            n += 1
+            new_name = '{0}_{1}_{2}{3}'.format(base,stamp,n,ext)
+        os.rename(self.xl_name,new_name)
+        if self.debug: print(dict(excel_rolled=new_name))
 
-            ### Append new data to old data, and overwrite eXcel file
-            with pd.ExcelWriter(self.xl_name, mode="w") as writer:
-                dfold.append(dfnew
-                ).iloc[self.left_index:].to_excel(writer,index=False)
+    ################################
+    def roll(self):
+        """Finish current workbook, and start new one"""
+        if self.rows:
+            self.flush()
+            self.rename()
+        self.rows = list()
+        self.t_segment = time.monotonic()
+
+    ################################
+    def close(self):
+        """Write any rows not yet written"""
+        self.flush()
 
 ########################################################################
 ########################################################################
@@ -158,13 +974,35 @@ max_rows:  approximate limit for number of rows in worksheet
 class PYLOGIX_LOGGER_MYSQL(PYLOGIX_LOGGER):
     """Log 'TagName,Value,Timestamp' to MariaDB/MySQL database table"""
 
+    ### Schemas:  'log' => TABLE log (tag_name,...)
+    ###           'compact' => TABLE tags (tag_id,tag_name)
+    ###                        + TABLE tag_log (tag_id,...)
+    ###           Cf. pymariadb/config_mariadb_log.py
+    SCHEMAS = ('log','compact',)
+
+    COUNTERS = dict(reconnects='reconnects',mysql_rows_dropped='dropped')
+
     ################################
     def __init__(self
                 ,*args
                 ,debug=False
+                ,schema='log'
+                ,tags=None
+                ,flush_rows=1000
+                ,flush_seconds=1.0
+                ,load_data_rows=0
                 ,**mysql_kwargs
                 ):
         """
+        schema:  'log' or 'compact'; cf. pymariadb/config_mariadb_log.py
+          tags:  tag names to resolve to tag IDs at startup, for schema
+                 'compact'; any other names are resolved when first seen
+    flush_rows:  write pending rows when there are this many
+ flush_seconds:  write pending rows when oldest has waited this long, s
+                 *** N.B. 0 => write every cycle with changes
+load_data_rows:  use LOAD DATA LOCAL INFILE instead of INSERT for
+                 backlogs of at least this many rows; 0 => never
+
 Keys in mysql_kwargs:
       db:  DATABASE name on MariaDB/MySQL database (DB) server; required
     host:  Hostname or IP address where DB server is running
@@ -172,34 +1010,464 @@ Keys in mysql_kwargs:
 password:  Password for user on DB server
 read_default_group:  group to use from e.g. ~/.my.cnf
 
+Pending rows are written in one transaction, as multi-row INSERTs
+(MySQLdb's executemany packs INSERT ... VALUES rows into as few
+statements as fit its maximum statement length)
+
+Column tag_value is DOUBLE NOT NULL:  values that are None, non-numeric
+(e.g. STRING tags) or not finite are dropped before they are queued
+
 """
         super().__init__(*args,debug=debug,**mysql_kwargs)
 
+        assert schema in self.SCHEMAS,('Invalid schema [{0}]; must be one'
+                                       ' of {1}'.format(schema,self.SCHEMAS)
+                                      )
         self.db = mysql_kwargs['db']
+        self.schema = schema
+        self.tag_ids = dict()
+        self.flush_rows = max([1,int(flush_rows)])
+        self.flush_seconds = float(flush_seconds or 0)
+        self.load_data_rows = int(load_data_rows or 0)
+        if self.load_data_rows: mysql_kwargs.setdefault('local_infile',1)
+
+        self.pending = list()
+        self.t_pending = None
 
-        ### Use MySQLdb module to open connection with autocommit:
+        self.mysql_kwargs = mysql_kwargs
+        self.connect()
+
+        ### Counters:  connections re-opened after a failed flush; rows
+        ###            dropped, as not numeric or refused by DB server
+        self.reconnects = self.dropped = 0
+
+        ### Table and key column; replace rows with duplicate keys in the
+        ### compact table, which is keyed on (tag_id,timestamp)
+        if 'compact' == self.schema:
+            self.table,self.key_column = 'tag_log','tag_id'
+            self.duplicate = (' ON DUPLICATE KEY UPDATE'
+                              ' tag_value=VALUES(tag_value)'
+                             )
+            self.load_replace = ' REPLACE'
+            self.resolve_tags(tags or list())
+        else:
+            self.table,self.key_column = 'log','tag_name'
+            self.duplicate = self.load_replace = ''
+
+        self.insert_query = """
+INSERT INTO {0} ({1},tag_value,timestamp)
+VALUES (%s,%s,%s){2}
+""".format(self.table,self.key_column,self.duplicate)
+
+    ################################
+    def connect(self):
+        """Open connection to DB server; cf. .flush() for reconnect"""
+
+        ### Use MySQLdb module to open connection without autocommit:
+        ### each flush of pending rows is one transaction
         import MySQLdb
-        self.cursor = MySQLdb.connect(autocommit=True
-                                     ,**mysql_kwargs
+        self.MySQLdb = MySQLdb
+        self.cursor = MySQLdb.connect(autocommit=False
+                                     ,**self.mysql_kwargs
                                      ).cursor()
-        if debug:
+        if self.debug:
           cn = self.cursor.connection
           print(cn)
           print(cn.get_host_info())
           print(cn.get_proto_info())
           print(cn.get_server_info())
 
+    ################################
+    def resolve_tags(self,tag_names):
+        """
+Add any tag names not yet cached to TABLE tags, and cache their tag IDs
+
+- Committed separately from data, so cached IDs always exist in DB
+
+"""
+        missing = sorted(set([tag_name for tag_name in tag_names
+                              if tag_name not in self.tag_ids
+                             ])
+                        )
+        if not missing: return
+        self.cursor.executemany("""
+INSERT IGNORE INTO tags (tag_name) VALUES (%s)
+""",[(tag_name,) for tag_name in missing])
+        self.cursor.execute("""
+SELECT tag_id,tag_name FROM tags WHERE tag_name IN ({0})
+""".format(','.join(['%s'] * len(missing))),missing)
+        for tag_id,tag_name in self.cursor.fetchall():
+            self.tag_ids[tag_name] = tag_id
+        self.cursor.connection.commit()
+
     ################################
     def __call__(self,*args,**kwargs):
-        """Append changes to eXcel worksheet"""
-        if self.changeds:                  ### Do nothing for no changes
+        """Add changes to pending rows; write per row count or latency"""
+        changeds = [row for row in self.changeds if self.is_storable(row[1])]
+        self.dropped += len(self.changeds) - len(changeds)
+        if changeds:
+            if not self.pending: self.t_pending = time.monotonic()
+            self.pending.extend(changeds)
+            if len(self.pending) >= self.flush_rows:
+                self.flush()
+                return
+        self.tick()
+
+    ################################
+    @staticmethod
+    def is_storable(value):
+        """Return True if value fits column tag_value DOUBLE NOT NULL"""
+        if isinstance(value,bool): return True
+        if not isinstance(value,numbers.Real): return False
+        return value == value and abs(value) != float('inf')
+
+    ################################
+    def tick(self):
+        """Write pending rows if oldest has waited long enough"""
+        if self.pending and (time.monotonic() - self.t_pending
+                            ) >= self.flush_seconds:
+            self.flush()
+
+    ################################
+    def flush(self):
+        """
+Write pending rows to MariaDB/MySQL TABLE in one transaction
+
+- On a connection error (OperationalError, InterfaceError), or on
+  interrupt, roll back, close connection, and keep rows pending, to be
+  retried, after reconnecting, on next flush
+- On any other error, e.g. a row the DB server refuses, roll back, then
+  write rows one at a time, in one transaction, and drop those refused,
+  so one bad row cannot hold up every row after it
+
+"""
+        if not self.pending: return
+        if None is self.cursor:
+            self.connect()
+            self.reconnects += 1
+        cn = self.cursor.connection
+        connection_errors = (self.MySQLdb.OperationalError
+                            ,self.MySQLdb.InterfaceError
+                            ,)
+
+        try:
+            try:
+                self.write(self.pending)
+            except connection_errors:
+                raise
+            except Exception:
+                traceback.print_exc()
+                cn.rollback()
+                for row in self.pending:
+                    try:
+                        self.write([row])
+                    except connection_errors:
+                        raise
+                    except Exception:
+                        ### Server rolls back the failed statement only
+                        self.dropped += 1
+                        print(dict(mysql_row_dropped=row))
+            cn.commit()
+        except:
+            try: cn.rollback()
+            except: pass
+            try: cn.close()
+            except: pass
+            self.cursor = None
+            raise
+
+        if self.debug: print(dict(mysql_rows=len(self.pending)))
+        self.pending = list()
+
+    ################################
+    def write(self,rows):
+        """Write rows to TABLE, within the current transaction"""
+
+        ### For compact schema, replace tag names with cached tag IDs
+        if 'compact' == self.schema:
+            tag_ids = self.tag_ids
+            if [row for row in rows if row[0] not in tag_ids]:
+                self.resolve_tags([row[0] for row in rows])
+            rows = [(tag_ids[tag_name],tag_value,timestamp,)
+                    for tag_name,tag_value,timestamp in rows
+                   ]
+
+        if self.load_data_rows and len(rows) >= self.load_data_rows:
+            self.load_data(rows)
+        else:
+            ### INSERT new data into MariaDB/MySQL TABLE
+            self.cursor.executemany(self.insert_query,rows)
+
+    ################################
+    def discard(self):
+        """Drop pending rows"""
+        self.pending = list()
+
+    ################################
+    def load_data(self,rows):
+        """Write rows to temporary CSV file, and load that into TABLE"""
+        with tempfile.NamedTemporaryFile('w',suffix='.csv') as fTmp:
+            for tag_key,tag_value,timestamp in rows:
+                if isinstance(tag_value,bool): tag_value = int(tag_value)
+                fTmp.write('{0},{1},{2}\n'.format(tag_key,tag_value
+                                                  ,self.iso(timestamp)
+                                                  )
+                          )
+            fTmp.flush()
+            self.cursor.execute("""
+LOAD DATA LOCAL INFILE %s{0} INTO TABLE {1}
+FIELDS TERMINATED BY ','
+LINES TERMINATED BY '\\n'
+({2},tag_value,timestamp)
+""".format(self.load_replace,self.table,self.key_column),(fTmp.name,))
+
+    ################################
+    def close(self):
+        """Write pending rows, and close connection"""
+        try:
+            self.flush()
+        finally:
+            if not (None is self.cursor): self.cursor.connection.close()
+
+########################################################################
+########################################################################
 
-            ### INSERT new data into MariaDB/MySQL TABLE 'log'
-            self.cursor.executemany("""
-INSERT INTO log (tag_name,tag_value,timestamp)
-VALUES (%s,%s,%s)
-""",self.changeds)
+class PYLOGIX_LOGGER_SQLITE(PYLOGIX_LOGGER):
+    """Log 'TagName,Value,Timestamp' to local SQLite database file"""
 
+    ### Compact schema, as with PYLOGIX_LOGGER_MYSQL(schema='compact'):
+    ### - tags:  tag dictionary, tag_name <=> small integer tag_id
+    ### - tag_log:  WITHOUT ROWID table clustered on (tag_id,timestamp),
+    ###             so the rows of one tag over a time range are
+    ###             contiguous; timestamp is integer microseconds since
+    ###             1970-01-01T00:00:00 UTC
+    CREATE_QUERIES = """
+CREATE TABLE IF NOT EXISTS tags
+( tag_id INTEGER PRIMARY KEY
+, tag_name TEXT NOT NULL UNIQUE
+);
+
+CREATE TABLE IF NOT EXISTS tag_log
+( tag_id INTEGER NOT NULL
+, timestamp INTEGER NOT NULL
+, tag_value
+, PRIMARY KEY (tag_id,timestamp)
+) WITHOUT ROWID;
+"""
+
+    EPOCH = datetime.datetime(1970,1,1)
+    MICROSECOND = datetime.timedelta(microseconds=1)
+
+    COUNTERS = dict(sqlite_commits='commits',rows_written='rows_written')
+
+    ################################
+    def __init__(self,sqlite_name,*args
+                ,flush_rows=1000
+                ,flush_seconds=1.0
+                ,synchronous='NORMAL'
+                ,cache_kib=16384
+                ,**kwargs
+                ):
+        """
+  sqlite_name:  path of SQLite database file e.g. log.sqlite3; created,
+                with its tables, if it does not exist
+   flush_rows:  write pending rows when there are this many
+flush_seconds:  write pending rows when oldest has waited this long, s
+                *** N.B. 0 => write every cycle with changes
+  synchronous:  PRAGMA synchronous; NORMAL, with WAL, does not fsync on
+                each commit, and loses at most the last commits, never
+                database integrity, on power loss; FULL fsyncs each
+                commit
+    cache_kib:  page cache size, KiB
+
+Pending rows are written in one transaction; the database is in WAL
+mode, so readers e.g. sqlite_query.py do not block the logger, and the
+logger does not block readers
+
+Values are stored with their own types (SQLite columns are dynamically
+typed):  BOOLs and integers as INTEGER, REALs as REAL, STRINGs as TEXT
+
+"""
+        super().__init__(*args,**kwargs)
+
+        self.sqlite_name = sqlite_name
+        self.flush_rows = max([1,int(flush_rows)])
+        self.flush_seconds = float(flush_seconds or 0)
+
+        self.pending = list()
+        self.t_pending = None
+        self.tag_ids = dict()
+
+        ### Last timestamp converted by .micros(), and its microseconds
+        self.micros_timestamp = self.micros_value = None
+
+        ### Counters:  transactions committed; rows written
+        self.commits = self.rows_written = 0
+
+        ### Autocommit mode (isolation_level=None):  transactions are
+        ### begun explicitly in .flush(); the connection is made here,
+        ### but used on a worker thread with --queue-size
+        import sqlite3
+        self.cn = sqlite3.connect(sqlite_name,isolation_level=None
+                                 ,check_same_thread=False
+                                 )
+        for pragma in ('journal_mode=WAL'
+                      ,'synchronous={0}'.format(synchronous)
+                      ,'cache_size=-{0}'.format(int(cache_kib))
+                      ,'temp_store=MEMORY'
+                      ,'busy_timeout=5000'
+                      ):
+            self.cn.execute('PRAGMA {0}'.format(pragma))
+        self.cn.executescript(self.CREATE_QUERIES)
+        self.tag_ids.update([(tag_name,tag_id,) for tag_id,tag_name
+                             in self.cn.execute('SELECT tag_id,tag_name'
+                                                ' FROM tags'
+                                               )
+                            ])
+
+        if self.debug:
+            print(dict(sqlite=sqlite_name,sqlite_version=sqlite3.sqlite_version
+                      ,journal_mode=self.cn.execute('PRAGMA journal_mode'
+                                                   ).fetchone()[0]
+                      ))
+
+    ################################
+    def micros(self,timestamp):
+        """Return timestamp as integer microseconds since epoch; the
+triplets of one cycle share one timestamp, which is converted once"""
+        if not (timestamp is self.micros_timestamp):
+            self.micros_timestamp = timestamp
+            if not isinstance(timestamp,datetime.datetime):
+                timestamp = datetime.datetime.fromisoformat(str(timestamp))
+            self.micros_value = (timestamp - self.EPOCH) // self.MICROSECOND
+        return self.micros_value
+
+    ################################
+    def resolve_tags(self,tag_names):
+        """Add any tag names not yet cached to TABLE tags, in the current
+transaction, and cache their tag IDs"""
+        for tag_name in sorted(set([tag_name for tag_name in tag_names
+                                    if tag_name not in self.tag_ids
+                                   ])
+                              ):
+            self.cn.execute('INSERT OR IGNORE INTO tags (tag_name)'
+                            ' VALUES (?)',(tag_name,)
+                           )
+            self.tag_ids[tag_name] = self.cn.execute(
+                'SELECT tag_id FROM tags WHERE tag_name=?',(tag_name,)
+              ).fetchone()[0]
+
+    ################################
+    def __call__(self,*args,**kwargs):
+        """Add changes to pending rows; write per row count or latency"""
+        if self.changeds:
+            if not self.pending: self.t_pending = time.monotonic()
+            self.pending.extend(self.changeds)
+            if len(self.pending) >= self.flush_rows:
+                self.flush()
+                return
+        self.tick()
+
+    ################################
+    def tick(self):
+        """Write pending rows if oldest has waited long enough"""
+        if self.pending and (time.monotonic() - self.t_pending
+                            ) >= self.flush_seconds:
+            self.flush()
+
+    ################################
+    def flush(self):
+        """
+Write pending rows to TABLE tag_log in one transaction
+
+- Rows with the same (tag_id,timestamp) as a row already written
+  replace it
+- On error, roll back, and keep rows pending, to be retried on next
+  flush
+
+"""
+        if not self.pending: return
+        tag_ids,micros = self.tag_ids,self.micros
+        cn = self.cn
+        tag_ids_before = dict(tag_ids)
+        try:
+            cn.execute('BEGIN')
+            if [row for row in self.pending if row[0] not in tag_ids]:
+                self.resolve_tags([row[0] for row in self.pending])
+            cn.executemany('INSERT OR REPLACE INTO tag_log'
+                           ' (tag_id,timestamp,tag_value) VALUES (?,?,?)'
+                          ,[(tag_ids[tag_name],micros(timestamp),tag_value,)
+                            for tag_name,tag_value,timestamp in self.pending
+                           ]
+                          )
+            cn.execute('COMMIT')
+        except:
+            try: cn.execute('ROLLBACK')
+            except: pass
+            ### Tag IDs added in rolled-back transaction do not exist
+            self.tag_ids = tag_ids_before
+            raise
+
+        self.commits += 1
+        self.rows_written += len(self.pending)
+        if self.debug: print(dict(sqlite_rows=len(self.pending)))
+        self.pending = list()
+
+    ################################
+    def discard(self):
+        """Drop pending rows"""
+        self.pending = list()
+
+    ################################
+    def close(self):
+        """Write pending rows, checkpoint WAL, and close database"""
+        try:
+            self.flush()
+            self.cn.execute('PRAGMA wal_checkpoint(TRUNCATE)')
+        finally:
+            self.cn.close()
+
+########################################################################
+########################################################################
+
+class PYLOGIX_TOKEN_BUCKET:
+    """Token-bucket rate limiter e.g. for API request quotas"""
+
+    ################################
+    def __init__(self,rate,burst=1,clock=time.monotonic):
+        """
+ rate:  tokens added per second
+burst:  maximum tokens held; bucket starts full
+clock:  monotonic clock function; default time.monotonic
+
+"""
+        self.rate = float(rate)
+        self.burst = max([1.0,float(burst)])
+        self.clock = clock
+        self.tokens = self.burst
+        self.t_last = clock()
+
+    ################################
+    def refill(self):
+        now = self.clock()
+        self.tokens = min([self.burst
+                          ,self.tokens + (now - self.t_last) * self.rate
+                          ])
+        self.t_last = now
+
+    ################################
+    def take(self):
+        """Take a token if one is available; return True if taken"""
+        self.refill()
+        if self.tokens < 1.0: return False
+        self.tokens -= 1.0
+        return True
+
+    ################################
+    def wait(self):
+        """Wait until a token is available, and take it"""
+        while not self.take():
+            time.sleep((1.0 - self.tokens) / self.rate)
 
 ########################################################################
 ########################################################################
@@ -207,6 +1475,27 @@ VALUES (%s,%s,%s)
 class PYLOGIX_LOGGER_GOOGLE_SHEET(PYLOGIX_LOGGER):
     """Log 'TagName,Value,Timestamp' to Google Sheet"""
 
+    COUNTERS = dict(gapi_requests='requests',rows_sent='rows_sent')
+
+    ### Formula for column D, converts ISO timestamp in column C, with or
+    ### without fraction of seconds, to time
+    TIME_FORMULA = ('=if(C3=""'
+                       ',""'
+                       ',date(left(C3,4)'
+                            ',mid(C3,6,2)'
+                            ',mid(C3,9,2)'
+                            ')'
+                       '+time(mid(C3,12,2)'
+                            ',mid(C3,15,2)'
+                            ',mid(C3,18,2)'
+                            ')'
+                       '+if(len(C3)>20'
+                          ',value("0"&mid(C3,20,7))/86400'
+                          ',0'
+                          ')'
+                       ')'
+                   )
+
     ################################
     def __init__(self
                 ,*args
@@ -215,17 +1504,31 @@ class PYLOGIX_LOGGER_GOOGLE_SHEET(PYLOGIX_LOGGER):
                 ,TOKEN_FILE='token.pickle'
                 ,CREDENTIAL_FILE='credentials.json'
                 ,max_rows=200
+                ,requests_per_minute=60
+                ,burst=1
+                ,flush_seconds=0
+                ,ssheets=None
                 ,**kwargs
                 ):
         """
           *args:  Initial list of values to log, passed to parent class
           SS_ID:  spreadsheet ID i.e. replace <SS_ID> in URL
                     https://docs.google.com/spreadsheets/d/<SS_ID>
-     SHEET_NAME:  sheet in Google Sheet SS_ID.
-                    N.B. must be first sheet (0) for .batchUpdate
+     SHEET_NAME:  sheet in Google Sheet SS_ID
      TOKEN_FILE:  Pickle file with credentials to write to SS_ID
 CREDENTIAL_FILE:  JSON file with credentials to write to SS_ID
-       max_rows:  Approx. row count when leading rows will be removed
+       max_rows:  Row count above which leading data rows are removed
+requests_per_minute:  write request quota; cycles are coalesced into
+                      one batchUpdate request while waiting for quota
+          burst:  number of requests that may be sent back-to-back
+  flush_seconds:  minimum time, s, between requests
+        ssheets:  spreadsheets() service to use instead of building one
+                  from credentials e.g. a mock for testing
+
+Each request is a single batchUpdate that appends all rows coalesced
+since the previous request, deletes exactly the number of leading data
+rows over max_rows, refreshes the column D time formula, and updates
+the Last-update timestamps on row 2
 
 """
 
@@ -244,119 +1547,176 @@ CREDENTIAL_FILE:  JSON file with credentials to write to SS_ID
                                                          )
                  )
 
+        self.limiter = PYLOGIX_TOKEN_BUCKET(float(requests_per_minute) / 60.0
+                                           ,burst=burst
+                                           )
+        self.flush_seconds = float(flush_seconds or 0)
+        self.t_flush = time.monotonic() - self.flush_seconds
+
+        ### Rows waiting to be sent; rows older than max_rows would be
+        ### deleted as soon as they were sent, so are not kept
+        self.pending = list()
+        self.last_now = None
+
         ### Convert credentials to Spreadsheets object
-        self.creds = get_creds(TOKEN_FILE=self.token_file
-                              ,CREDENTIAL_FILE=self.creds_file
-                              )
-        self.ssheets = build('sheets', 'v4', credentials=self.creds).spreadsheets()
+        ### - Optional dependencies, only needed for this logger, and
+        ###   only when no Spreadsheets object is supplied
+        if None is ssheets:
+            from credentials_plclogpoc import get_creds
+            from googleapiclient.discovery import build
+            self.creds = get_creds(TOKEN_FILE=self.token_file
+                                  ,CREDENTIAL_FILE=self.creds_file
+                                  )
+            ssheets = build('sheets', 'v4', credentials=self.creds
+                           ).spreadsheets()
+        self.ssheets = ssheets
+
+        ### Look up sheet ID of SHEET_NAME, and count of rows in use
+        result = self.ssheets.get(spreadsheetId=self.ss_id
+                                 ,fields='sheets.properties'
+                                 ).execute()
+        self.sheet_id = [sheet['properties']['sheetId']
+                         for sheet in result['sheets']
+                         if sheet['properties']['title'] == self.name
+                        ][0]
+        result = self.ssheets.values().get(spreadsheetId=self.ss_id
+                                          ,range=f"'{self.name}'!A:A"
+                                          ).execute()
+        self.nrows = max([2,len(result.get('values',list()))])
+
+        ### Counters:  requests sent; rows sent
+        self.requests = self.rows_sent = 0
 
     ################################
     def __call__(self,*args,**kwargs):
-        """Append changes to Google Sheet"""
+        """Add changes to pending rows; send if quota allows"""
+        if self.changeds:
+            self.pending.extend(self.changeds)
+            self.last_now = self.now
+            excess = len(self.pending) - (self.max_rows - 2)
+            if excess > 0: del self.pending[:excess]
+        self.tick()
+
+    ################################
+    def tick(self):
+        """Send pending rows if flush interval has passed, and quota
+allows"""
+        if (self.pending
+            and (time.monotonic() - self.t_flush) >= self.flush_seconds
+            and self.limiter.take()
+           ):
+            self.send()
+
+    ################################
+    def flush(self):
+        """Send pending rows, waiting for quota if needed"""
+        if self.pending:
+            self.limiter.wait()
+            self.send()
 
-        if not self.changeds: return       ### Do nothing for no changes
+    ################################
+    @staticmethod
+    def cell(value):
+        """Return Sheets API CellData for one value"""
+        if isinstance(value,bool): key = 'boolValue'
+        elif isinstance(value,(int,float,)): key = 'numberValue'
+        else: key,value = 'stringValue',str(value)
+        return {'userEnteredValue':{key:value}}
 
-        ### Get Google spreadsheets functions
-        append = self.ssheets.values().append
-        update = self.ssheets.values().update
+    ################################
+    def send(self):
+        """Send pending rows, trimming and Last-update as one batchUpdate"""
 
-        ### Append rows of changed data to Google sheet
+        ### Layout of rows of Google sheet
         ###
         ###                Columns
-        ##            A            B        C
+        ##            A            B        C          D
         ###   Row
         ###   1       Item         Value    Timestamp  <= Header
         ###   2       Last-update  <time>   <time>     <= Last update
         ###   3       <name>       <value>  <time>     <= Data
         ###   4       <name>       <value>  <time>     <= Data
         ###   ...                                      ...
-        ###
-        result = append(spreadsheetId=self.ss_id
-                       ,range=f"'{self.name}'!A3"
-                       ,body=dict(values=self.changeds)
-                       ,valueInputOption="RAW"
-                       ,insertDataOption="INSERT_ROWS"
-                       ).execute()
 
-        if self.debug: print(dict(append_result=result))
+        rows = self.pending
+        nrows = self.nrows + len(rows)
+        excess = max([0,nrows - self.max_rows])
 
-        ### The [result] from the append(...) call above looks like this:
-        ###
-        ###   {...'updates':{...'updatedRange':'PLCLOGPOC!A41:C46'...}}
-        ###
-        ### where the ':C46' is the last cell written to, so 46 is the
-        ### last of row; compare that to the maximum number of rows
-        ### allowed
+        requests = [
+          ### Append rows of changed data
+          {'appendCells':
+            {'sheetId':self.sheet_id
+            ,'rows':[{'values':[self.cell(name),self.cell(value)
+                               ,self.cell(self.iso(timestamp))
+                               ]
+                     }
+                     for name,value,timestamp in rows
+                    ]
+            ,'fields':'userEnteredValue'
+            }
+          }
+        ]
 
-        updatedRange = result.get('updates',dict()).get('updatedRange','')
-        match = rgx_ur.search(updatedRange)
-        if not (None is match):
-            try:
-                last_row_appended = int(match.groups()[-1])
-                ### Cheap exception if last row does not exceed limit
-                assert self.max_rows < last_row_appended 
-                ### Limit number of rows by deleting five at a time,
-                ### but first copy a formula to all rows in column D
-                batchUpdate = self.ssheets.batchUpdate
-                r = batchUpdate(spreadsheetId=self.ss_id
-                               ,body={'requests':
-                                       [
-                                         ### Formula converts timestamp
-                                         ### to time
-                                         {'repeatCell':
-                                           {'range':
-                                             {'sheetId':0
-                                             ,'startRowIndex':2
-                                             ,'endRowIndex':last_row_appended
-                                             ,'startColumnIndex':3
-                                             ,'endColumnIndex':4
-                                             }
-                                           ,'cell':
-                                             {'userEnteredValue':
-                                               {'formulaValue':
-                                                     '=if(C3=""'
-                                                        ',""'
-                                                        ',date(left(C3,4)'
-                                                             ',right(left(C3,7),2)'
-                                                             ',right(left(C3,10),2)'
-                                                             ')'
-                                                        '+time(left(right(C3,8),2)'
-                                                             ',left(right(C3,5),2)'
-                                                             ',right(C3,2)'
-                                                             ')'
-                                                        ')'
-                                               }
-                                             }
-                                           ,'fields': 'userEnteredValue'
-                                           }
-                                         }
-                                         ### Delete rows 3 to 7 (one-based)
-                                         ### = rows 2 to 6 (zero-based)
-                                       , {'deleteDimension':
-                                           {'range':
-                                             {'sheetId':0
-                                             ,'dimension':'ROWS'
-                                             ,'startIndex':2
-                                             ,'endIndex':7
-                                             }
-                                           }
-                                         }
-                                       ]
-                                     }
-                               ).execute()
-
-            except AssertionError as e:
-                if self.debug: traceback.print_exc()
-            
-            except:
-                traceback.print_exc()
+        if excess:
+            ### Delete exactly the rows over the limit, starting at row 3
+            ### (one-based) = row 2 (zero-based)
+            requests.append(
+              {'deleteDimension':
+                {'range':
+                  {'sheetId':self.sheet_id
+                  ,'dimension':'ROWS'
+                  ,'startIndex':2
+                  ,'endIndex':2+excess
+                  }
+                }
+              }
+            )
+            nrows -= excess
+
+        requests.extend([
+          ### Formula in column D converts timestamp to time
+          {'repeatCell':
+            {'range':
+              {'sheetId':self.sheet_id
+              ,'startRowIndex':2
+              ,'endRowIndex':nrows
+              ,'startColumnIndex':3
+              ,'endColumnIndex':4
+              }
+            ,'cell':{'userEnteredValue':{'formulaValue':self.TIME_FORMULA}}
+            ,'fields':'userEnteredValue'
+            }
+          }
+          ### Update Last-update timestamps on row 2
+        , {'updateCells':
+            {'start':{'sheetId':self.sheet_id,'rowIndex':1,'columnIndex':1}
+            ,'rows':[{'values':[self.cell(self.iso(self.last_now))
+                               ,self.cell(self.iso(self.last_now))
+                               ]
+                     }]
+            ,'fields':'userEnteredValue'
+            }
+          }
+        ])
 
-        ### Update Last-update timestamps on row 2
-        update_time = dict(values=[[self.now,self.now]])
-        result = update(spreadsheetId=self.ss_id
-                       ,range=f"'{self.name}'!B2:C2"
-                       ,body=update_time
-                       ,valueInputOption="RAW"
-                       ).execute()
+        result = self.ssheets.batchUpdate(spreadsheetId=self.ss_id
+                                         ,body={'requests':requests}
+                                         ).execute()
 
-        if self.debug: print(dict(update_result=result))
+        if self.debug: print(dict(batchUpdate_result=result))
+
+        self.nrows = nrows
+        self.requests += 1
+        self.rows_sent += len(rows)
+        self.pending = list()
+        self.t_flush = time.monotonic()
+
+    ################################
+    def discard(self):
+        """Drop pending rows"""
+        self.pending = list()
+
+    ################################
+    def close(self):
+        """Send pending rows"""
+        self.flush()
@@ -0,0 +1,302 @@
+"""
+metrics_classes.py
+
+Purpose:  time each stage of the hot path, i.e. PLC read, change
+          detection, each sink call, queue wait and scheduler sleep, in
+          fixed-bucket histograms, and collect counters (tags read,
+          changes, errors, reconnects) from the objects that already
+          keep them; expose both as Prometheus text over a local HTTP
+          endpoint, and as a periodic one-line summary
+
+          - Recording one duration is one bisect into a short tuple of
+            bucket bounds, plus two additions, so timing a cycle costs
+            a few microseconds whatever the number of tags
+          - Counters are read from their owners' attributes only when
+            scraped, so they add nothing to the hot path
+          - Each histogram is written by one thread only, and read
+            without locks; a scrape may see one observation counted in
+            a bucket but not yet in the sum
+
+"""
+import bisect
+import threading
+
+########################################################################
+def sink_name(pylogger):
+    """Return name of sink, for labels:  .name of a sink worker or
+spool, else class name"""
+    return getattr(pylogger,'name',None) or type(pylogger).__name__
+
+########################################################################
+########################################################################
+
+class PYLOGIX_HISTOGRAM:
+    """Fixed-bucket histogram of durations, s"""
+
+    ### Bucket upper bounds, s:  1, 2 and 5 per decade, 1us to 100s
+    BOUNDS = tuple([float('{0}e{1}'.format(m,e))
+                    for e in range(-6,2) for m in (1,2,5,)
+                   ] + [100.0]
+                  )
+
+    ################################
+    def __init__(self,bounds=None):
+        """
+bounds:  sorted sequence of bucket upper bounds, s; default BOUNDS; one
+         more bucket, +Inf, holds anything longer
+
+"""
+        self.bounds = tuple(bounds or self.BOUNDS)
+        self.counts = [0] * (len(self.bounds) + 1)
+        self.sum = self.max = 0.0
+
+    ################################
+    def observe(self,seconds):
+        """Record one duration, s"""
+        self.counts[bisect.bisect_left(self.bounds,seconds)] += 1
+        self.sum += seconds
+        if seconds > self.max: self.max = seconds
+
+    ################################
+    def count(self):
+        """Return number of durations recorded"""
+        return sum(self.counts)
+
+    ################################
+    def quantile(self,q):
+        """Return estimate, s, of quantile q (0 to 1), interpolated
+linearly within its bucket, as Prometheus histogram_quantile() does, and
+limited to the longest duration seen; None if empty"""
+        counts = list(self.counts)
+        rank = q * sum(counts)
+        if not rank: return None
+        total,lower = 0,0.0
+        for bound,count in zip(self.bounds+(self.max,),counts):
+            if count and total + count >= rank:
+                upper = min([bound,self.max])
+                lower = min([lower,upper])
+                return lower + (upper - lower) * (rank - total) / count
+            total += count
+            lower = bound
+        return self.max
+
+########################################################################
+########################################################################
+
+class PYLOGIX_METRICS:
+    """
+Named stage histograms and counters, shared by acquisition stages,
+schedulers, sink workers and controller pool; cf. .histogram() and
+.add_counters()
+
+"""
+
+    ### Prometheus text exposition format
+    CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+    ################################
+    def __init__(self,*args,prefix='pylogix_',debug=False,**kwargs):
+        """
+prefix:  prefix of metric names
+ debug:  Set to True to send debugging info to stdout
+
+"""
+        self.prefix = prefix
+        self.debug = debug
+        self.lock = threading.Lock()
+
+        ### (stage,labels) => PYLOGIX_HISTOGRAM; labels is a sorted
+        ### tuple of (name,value) pairs
+        self.histograms = dict()
+
+        ### List of (owner,metric => attribute,labels)
+        self.counter_sources = list()
+
+        self.server = None
+        self.stop = threading.Event()
+
+    ################################
+    @staticmethod
+    def labels_key(labels):
+        """Return sorted tuple of (name,value) pairs, dropping None"""
+        return tuple(sorted([(name,str(value),)
+                             for name,value in labels.items()
+                             if not (None is value)
+                            ]))
+
+    ################################
+    def histogram(self,stage,**labels):
+        """Return histogram for stage and labels, e.g. sink=..., making
+it on first call; call once per stage at set-up, not per cycle"""
+        key = (stage,self.labels_key(labels),)
+        with self.lock:
+            if key not in self.histograms:
+                self.histograms[key] = PYLOGIX_HISTOGRAM()
+            return self.histograms[key]
+
+    ################################
+    def add_counters(self,owner,attributes,**labels):
+        """
+Read counters from owner when scraped
+
+    owner:  object holding counters as attributes
+attributes:  dict, metric name => attribute name of owner, e.g.
+             dict(changes='changes'); metric names get the prefix and
+             a _total suffix
+   labels:  labels of all these counters, e.g. controller=...
+
+"""
+        with self.lock:
+            self.counter_sources.append((owner,dict(attributes)
+                                        ,self.labels_key(labels)
+                                        ,))
+
+    ################################
+    def counters(self):
+        """Return dict, (metric,labels) => value, summed over owners"""
+        rtn = dict()
+        with self.lock: sources = list(self.counter_sources)
+        for owner,attributes,labels in sources:
+            for metric,attribute in attributes.items():
+                key = (metric,labels,)
+                rtn[key] = rtn.get(key,0) + getattr(owner,attribute)
+        return rtn
+
+    ################################
+    @staticmethod
+    def format_labels(labels,*extra):
+        """Return '{name="value",...}', or '' for no labels"""
+        pairs = list(labels) + list(extra)
+        if not pairs: return ''
+        escape = lambda s: (s.replace('\\','\\\\').replace('"','\\"')
+                             .replace('\n','\\n')
+                           )
+        return '{{{0}}}'.format(','.join(['{0}="{1}"'.format(name
+                                                            ,escape(value)
+                                                            )
+                                          for name,value in pairs
+                                         ]))
+
+    ################################
+    def exposition(self):
+        """Return all metrics in Prometheus text format"""
+        lines = list()
+        name = '{0}stage_seconds'.format(self.prefix)
+        lines.append('# HELP {0} Time spent per stage, s'.format(name))
+        lines.append('# TYPE {0} histogram'.format(name))
+        with self.lock: histograms = sorted(self.histograms.items())
+        for (stage,labels),histogram in histograms:
+            labels = (('stage',stage,),) + labels
+            counts = list(histogram.counts)
+            total = 0
+            for bound,count in zip(histogram.bounds+('+Inf',),counts):
+                total += count
+                lines.append('{0}_bucket{1} {2}'.format(
+                               name
+                              ,self.format_labels(labels,('le',str(bound),))
+                              ,total
+                              ))
+            lines.append('{0}_sum{1} {2!r}'.format(name
+                                                  ,self.format_labels(labels)
+                                                  ,histogram.sum
+                                                  ))
+            lines.append('{0}_count{1} {2}'.format(name
+                                                  ,self.format_labels(labels)
+                                                  ,total
+                                                  ))
+
+        last = None
+        for (metric,labels),value in sorted(self.counters().items()):
+            name = '{0}{1}_total'.format(self.prefix,metric)
+            if name != last: lines.append('# TYPE {0} counter'.format(name))
+            last = name
+            lines.append('{0}{1} {2}'.format(name,self.format_labels(labels)
+                                            ,value
+                                            ))
+        return '\n'.join(lines) + '\n'
+
+    ################################
+    def summary(self):
+        """
+Return one-line summary:  counters summed over labels, then p50, p99
+and max, ms, per stage, with histograms of the same stage and sink
+merged, e.g. over controllers
+
+"""
+        totals = dict()
+        for (metric,labels),value in self.counters().items():
+            totals[metric] = totals.get(metric,0) + value
+        fields = ['{0}={1}'.format(metric,value)
+                  for metric,value in sorted(totals.items())
+                 ]
+
+        merged = dict()
+        with self.lock: histograms = list(self.histograms.items())
+        for (stage,labels),histogram in histograms:
+            sink = dict(labels).get('sink')
+            key = sink and '{0}[{1}]'.format(stage,sink) or stage
+            counts,vmax = merged.get(key,([0]*len(histogram.counts),0.0,))
+            merged[key] = ([a+b for a,b in zip(counts,histogram.counts)]
+                          ,max([vmax,histogram.max])
+                          )
+        ms = lambda s: None is s and '-' or '{0:.3f}'.format(1e3*s)
+        for key,(counts,vmax) in sorted(merged.items()):
+            if not sum(counts): continue
+            histogram = PYLOGIX_HISTOGRAM()
+            histogram.counts,histogram.max = counts,vmax
+            fields.append('{0}={1}/{2}/{3}ms'.format(
+                            key
+                           ,ms(histogram.quantile(0.5))
+                           ,ms(histogram.quantile(0.99))
+                           ,ms(vmax)
+                           ))
+        return 'metrics {0}'.format(' '.join(fields))
+
+    ################################
+    def serve(self,port,host='127.0.0.1'):
+        """Serve .exposition() at http://host:port/metrics, on a daemon
+thread; port 0 picks a free port; return (host,port)"""
+        import http.server
+
+        metrics = self
+        class Handler(http.server.BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split('?')[0] not in ('/metrics','/',):
+                    self.send_error(404)
+                    return
+                body = metrics.exposition().encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type',metrics.CONTENT_TYPE)
+                self.send_header('Content-Length',str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+            def log_message(self,*args):
+                if metrics.debug: super().log_message(*args)
+
+        self.server = http.server.ThreadingHTTPServer((host,int(port),)
+                                                     ,Handler
+                                                     )
+        self.server.daemon_threads = True
+        threading.Thread(target=self.server.serve_forever
+                        ,name='metrics-http'
+                        ,daemon=True
+                        ).start()
+        return self.server.server_address[:2]
+
+    ################################
+    def start_summary(self,seconds,write=print):
+        """Write .summary() every seconds, s, on a daemon thread, until
+.close()"""
+        def run():
+            while not self.stop.wait(seconds): write(self.summary())
+        threading.Thread(target=run,name='metrics-summary',daemon=True
+                        ).start()
+
+    ################################
+    def close(self):
+        """Stop summary thread, and HTTP server"""
+        self.stop.set()
+        if not (None is self.server):
+            self.server.shutdown()
+            self.server.server_close()
+            self.server = None
@@ -0,0 +1,126 @@
+"""
+parquet_query.py
+
+Purpose:  read values of selected tags, over a time range, from the
+          Parquet files written by PYLOGIX_LOGGER_PARQUET (--parquet=),
+          without scanning every file:
+          - files are selected by the time range in their names
+          - row groups are skipped using their tag and time statistics
+
+Usage:  python parquet_query.py --parquet=log.parquet \\
+                                [--tag=TAG0[ --tag=TAG1[ ...]]] \\
+                                [--start=2024-01-31T10:00] \\
+                                [--end=2024-01-31T10:05]
+
+          - Prints 'TagName,Value,Timestamp' rows, as CSV, to stdout
+          - --start is inclusive; --end is exclusive; both are UTC
+
+From Python:
+
+  import parquet_query
+  df = parquet_query.read('log.parquet',tags=['TAG0'],start=...,end=...)
+
+"""
+import os
+import re
+import sys
+import datetime
+
+########################################################################
+def parse_time(s):
+    """Return UTC datetime from ISO string, or None"""
+    if None is s or isinstance(s,datetime.datetime): return s
+    return datetime.datetime.fromisoformat(s)
+
+########################################################################
+def files(parquet_name,start=None,end=None):
+    """
+Return sorted list of closed Parquet files for base path parquet_name
+that may hold rows in [start,end)
+
+- File names carry <start>_<end> stamps, to the second, of their rows
+
+"""
+    base,ext = os.path.splitext(parquet_name)
+    rgx = re.compile('^{0}_(\\d{{8}}T\\d{{6}})_(\\d{{8}}T\\d{{6}})(_\\d+)?{1}$'
+                     .format(re.escape(os.path.basename(base))
+                            ,re.escape(ext)
+                            )
+                    )
+    dirname = os.path.dirname(parquet_name) or '.'
+    start,end = parse_time(start),parse_time(end)
+
+    rtn = list()
+    for name in sorted(os.listdir(dirname)):
+        match = rgx.match(name)
+        if not match: continue
+        first,last = [datetime.datetime.strptime(g,'%Y%m%dT%H%M%S')
+                      for g in match.groups()[:2]
+                     ]
+        if end and first >= end: continue
+        if start and last + datetime.timedelta(seconds=1) <= start: continue
+        rtn.append(os.path.join(dirname,name))
+    return rtn
+
+########################################################################
+def read(parquet_name,tags=None,start=None,end=None):
+    """
+Return pandas DataFrame of rows for tags in [start,end), with columns
+tag, timestamp, and value, from whichever typed value column is set
+
+parquet_name:  base path of Parquet files, as given to
+               PYLOGIX_LOGGER_PARQUET
+        tags:  sequence of tag names; None => all tags
+       start:  UTC datetime or ISO string, inclusive; None => no limit
+         end:  UTC datetime or ISO string, exclusive; None => no limit
+
+"""
+    import pyarrow.parquet
+    import pandas as pd
+
+    start,end = parse_time(start),parse_time(end)
+    paths = files(parquet_name,start,end)
+    value_columns = ['value_double','value_int','value_bool','value_text']
+    if not paths:
+        return pd.DataFrame(columns=['tag','timestamp','value'])
+
+    filters = list()
+    if tags: filters.append(('tag','in',list(tags)))
+    utc = datetime.timezone.utc
+    if start: filters.append(('timestamp','>=',start.replace(tzinfo=utc)))
+    if end: filters.append(('timestamp','<',end.replace(tzinfo=utc)))
+
+    table = pyarrow.parquet.read_table(paths,filters=filters or None)
+    df = table.to_pandas(integer_object_nulls=True)
+    df['tag'] = df['tag'].astype(str)
+    value = df[value_columns[-1]].astype(object)
+    for name in value_columns[-2::-1]:
+        value = df[name].astype(object).where(df[name].notna(),value)
+    df['value'] = value
+    return df[['tag','timestamp','value']].sort_values(['timestamp','tag']
+                                                     ,kind='stable'
+                                                     ).reset_index(drop=True)
+
+if "__main__" == __name__:
+
+    av1 = sys.argv[1:]
+
+    ### 1) Base path of Parquet files:  --parquet=log.parquet
+
+    parquet_name = ([None]+[a[10:] for a in av1 if a[:10]=='--parquet='])[-1]
+    assert parquet_name,__doc__
+
+    ### 2) Tags, and UTC time range [start,end)
+
+    tags = [a[6:] for a in av1 if a[:6]=='--tag='] or None
+    start = ([None]+[a[8:] for a in av1 if a[:8]=='--start='])[-1]
+    end = ([None]+[a[6:] for a in av1 if a[:6]=='--end='])[-1]
+
+    df = read(parquet_name,tags=tags,start=start,end=end)
+    for tag,value,timestamp in zip(df['tag'],df['value'],df['timestamp']):
+        sys.stdout.write('{0},{1},{2}\n'.format(
+                           tag,value
+                          ,timestamp.tz_convert(None).isoformat(
+                             timespec='microseconds'
+                           )
+                         ))
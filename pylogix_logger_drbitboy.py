@@ -2,12 +2,24 @@
 simple read list in loop, interval = 0.5 seconds (default)
 Read a list of tags, log value changes
 """
+import os
 import re
 import sys
 import time
+import signal
+import functools
+import contextlib
 import pylogix
 import datetime
-import logger_classes as LC
+import sink_registry as SR
+import scheduler_classes as SC
+import worker_classes as WC
+import spool_classes as SPC
+import filter_classes as FC
+import controller_classes as CC
+import metrics_classes as MC
+import replay_classes as RC
+import simulated_plc as SIM
 
 if "__main__" == __name__:
 
@@ -19,28 +31,118 @@ if "__main__" == __name__:
     av1 = sys.argv[1:]
 
     ### 1.1) PLC tags to read:  --tag=Tag0=[ --tag=Tag1[...]]
+    ###
+    ###   - NAME[FIRST]:COUNT reads COUNT array elements, logged as
+    ###     NAME[i], with one request per cycle, e.g. --tag=Arr[0]:500;
+    ###     NAME:1 reads a whole UDT, logged as hex of its bytes; also
+    ###     in --scan lists
 
     tags = [a[6:] for a in av1 if a[:6]=='--tag=']
 
-    ### 1.1.1) Ensure at least one tag was specified
+    ### 1.1.0) Scan classes:  tags read at their own interval, seconds;
+    ###        --tag tags are read at --interval
+    ###
+    ###   --scan=0.1:FastTag0,FastTag1 --scan=60:Setpoint0[ ...]
+
+    scans = list()
+    for a in av1:
+        if a[:7]!='--scan=': continue
+        scan_interval,scan_tags = a[7:].split(':',1)
+        scans.append((float(scan_interval)
+                     ,[t for t in scan_tags.split(',') if t]
+                     ,)
+                    )
+
+    ### 1.1.0.1) Per-tag change filters:  absolute (abs) and percent
+    ###          (pct) deadbands; minimum (min) and maximum (max, i.e.
+    ###          heartbeat) time, seconds, between logged samples; or
+    ###          swinging-door compression deviation (sdc), which holds
+    ###          back samples, logged later with their own timestamps
+    ###
+    ###   --filter=AI_*:abs=0.5,min=1.0,max=60[ --filter=...]
+    ###   --filter=TT_*:sdc=0.5
+
+    filter_rules = [FC.PYLOGIX_FILTER_RULE.parse(a[9:])
+                    for a in av1 if a[:9]=='--filter='
+                   ]
+
+    ### 1.1.0.2) With --simulate (cf. 1.2.4), add N simulated tags,
+    ###          Tag00000 ... Tag{N-1}:  --simulate-tags=N
+
+    tags.extend(SIM.tag_names(([0]
+                               +[a[16:] for a in av1
+                                 if a[:16]=='--simulate-tags='
+                                ]
+                              )[-1]
+                             ))
+
+    ### 1.1.0.3) Replay a recorded flat ASCII or CSV log through the
+    ###          loggers, instead of reading a PLC; stop at end of log
+    ###
+    ###   --replay=csv_log.csv    ### As written by --flat-csv
+    ###   --replay-speed=0        ### Multiple of real time; 0 => no wait
+
+    replay = ([False]+[a[9:] for a in av1 if a[:9]=='--replay='])[-1]
+
+    replay_speed = float(([0]
+                          +[a[15:] for a in av1 if a[:15]=='--replay-speed=']
+                         )[-1]
+                        )
 
-    assert tags,"""
+    ### 1.1.1) Ensure at least one tag, or a replay log, was specified
+
+    assert tags or [t for i,ts in scans for t in ts] or replay,"""
 Usage:
 
 python pylogix_logger_drbitboy             \\
                                            \\
-       Tag names to log (one required):    \\
+       Tag names to log (one required,     \\
+       unless --scan, --simulate-tags or   \\
+       --replay is given):                 \\
                                            \\
          --tag=TAG0[ --tag=TAG2[ ...]]     \\
                                            \\
+         *** N.B. --tag=ARR[0]:500 reads   \\
+                  500 array elements with  \\
+                  one request; UDT:1 reads \\
+                  a whole UDT              \\
+                                           \\
+       Tags read at their own interval, s: \\
+                                           \\
+         [--scan=0.1:TAG3[,TAG4[,...]]]    \\
+         [--scan=60:TAG5[ --scan=...]]     \\
+                                           \\
+       Per-tag filtering of changes:       \\
+                                           \\
+         [--filter=PATTERN:abs=0.5,pct=1,  \\
+                   min=1.0,max=60]         \\
+         [--filter=PATTERN:sdc=0.5]        \\
+                                           \\
+         *** N.B. PATTERN is a glob e.g. AI_*\\
+         *** N.B. last matching --filter   \\
+                  applies                  \\
+                                           \\
        PLC connection information:         \\
                                            \\
          [--ip=192.168.1.10]               \\
          [--micro8xx]                      \\
+         [--micro8xx-sessions=1]           \\
+         [--sessions=1]                    \\
+         [--connection-size=4002|504]      \\
+                                           \\
+       Several PLCs, one worker each:      \\
+                                           \\
+         [--plc=ID0=IP0[ --plc=ID1=IP1...]]\\
+         [--plc-pool=thread|process]       \\
+                                           \\
+         *** N.B. --ip is then ignored;    \\
+                  tags are logged as       \\
+                  ID/TAG                   \\
                                            \\
        Logging inter-sample interval, s:   \\
                                            \\
          [--interval=0.5]                  \\
+         [--overrun=skip|catch-up]         \\
                                            \\
        Flat ASCII log:                     \\
                                            \\
@@ -50,12 +152,45 @@ python pylogix_logger_drbitboy             \\
                                            \\
          [--flat-csv=path.csv]             \\
                                            \\
+       Flat ASCII and CSV buffering:       \\
+                                           \\
+         [--flat-buffer=65536]             \\
+         [--flat-flush-records=0]          \\
+         [--flat-flush-seconds=0]          \\
+         [--flat-fsync-seconds=0]          \\
+                                           \\
+         [--flat-rotate-bytes=0]           \\
+         [--flat-rotate-when=hour]         \\
+         [--flat-compress=gzip]            \\
+         [--flat-keep=0]                   \\
+         [--flat-index-seconds=0]          \\
+                                           \\
+         *** N.B. 0 => disabled; flush     \\
+                  records and seconds both \\
+                  0 => flush every cycle   \\
+         *** N.B. rotate-when is one of    \\
+                  minute, hour, day        \\
+         *** N.B. compress is one of       \\
+                  gzip, zstd               \\
+                                           \\
        eXcel log:                          \\
                                            \\
          [--excel=path.xlsx]               \\
-         [--excel-max-rows=0]              \\
+         [--excel-max-rows=10000]          \\
+         [--excel-max-seconds=0]           \\
+         [--excel-flush-seconds=5]         \\
                                            \\
-         *** N.B. 0 => no limit on rows    \\
+         *** N.B. 0 => eXcel's row limit   \\
+                                           \\
+       Parquet log:                        \\
+                                           \\
+         [--parquet=path.parquet]          \\
+         [--parquet-row-group-rows=65536]  \\
+         [--parquet-flush-seconds=60]      \\
+         [--parquet-rotate-bytes=0]        \\
+         [--parquet-rotate-seconds=3600]   \\
+                                           \\
+         *** N.B. 0 => disabled            \\
                                            \\
        Google Sheets log:                  \\
                                            \\
@@ -64,6 +199,7 @@ python pylogix_logger_drbitboy             \\
          [--gapi-creds=credentials.json]   \\
          [--gapi-pickle=token.pickle]      \\
          [--gapi-max-rows=20]              \\
+         [--gapi-requests-per-minute=60]   \\
                                            \\
        MariaDB/MySQL log:                  \\
                                            \\
@@ -76,6 +212,74 @@ python pylogix_logger_drbitboy             \\
           [--mysql-password='']            \\
           [--mysql-read_default_group='']  \\
                                            \\
+       -> Batching of MariaDB/MySQL rows:  \\
+                                           \\
+          [--mysql-flush-rows=1000]        \\
+          [--mysql-flush-seconds=1.0]      \\
+          [--mysql-load-data-rows=0]       \\
+          [--mysql-compact]                \\
+                                           \\
+       SQLite log (local file, no server): \\
+                                           \\
+         [--sqlite=path.sqlite3]           \\
+         [--sqlite-flush-rows=1000]        \\
+         [--sqlite-flush-seconds=1.0]      \\
+         [--sqlite-synchronous=NORMAL]     \\
+                                           \\
+       Any sink by name, e.g. a plugin:    \\
+                                           \\
+         [--sink=NAME[:key=val[,...]]]     \\
+                                           \\
+       Per-sink queues and worker threads: \\
+                                           \\
+         [--queue-size=1000]               \\
+         [--queue-overflow=block]          \\
+         [--queue-spill-dir=/tmp]          \\
+                                           \\
+         *** N.B. 0 => no queue; log inline\\
+         *** N.B. overflow is one of       \\
+                  block, drop-oldest, spill\\
+                                           \\
+       Durable spool for network sinks:    \\
+       (Google Sheets, MariaDB/MySQL)      \\
+                                           \\
+         [--spool-dir=path/]               \\
+         [--spool-batch-rows=10000]        \\
+         [--spool-replay-rate=0]           \\
+                                           \\
+         *** N.B. replay rate is rows/s;   \\
+                  0 => no limit            \\
+                                           \\
+       Stage timings and counters:         \\
+                                           \\
+         [--metrics-port=0]                \\
+         [--metrics-host=127.0.0.1]        \\
+         [--metrics-summary-seconds=0]     \\
+                                           \\
+         *** N.B. port serves /metrics, in \\
+                  Prometheus text format;  \\
+                  0 => no endpoint         \\
+                                           \\
+       Simulated PLC, instead of --ip:     \\
+                                           \\
+         [--simulate]                      \\
+         [--simulate-tags=0]               \\
+         [--simulate-type=TT_*=REAL]       \\
+         [--simulate-change-rate=0.1]      \\
+         [--simulate-latency=0.0]          \\
+         [--simulate-jitter=0.0]           \\
+         [--simulate-error-rate=0.0]       \\
+         [--simulate-seed=...]             \\
+                                           \\
+       Replay a recorded log, instead of   \\
+       reading a PLC:                      \\
+                                           \\
+         [--replay=csv_log.csv]            \\
+         [--replay-speed=0]                \\
+                                           \\
+         *** N.B. speed is a multiple of   \\
+                  real time; 0 => no wait  \\
+                                           \\
        Debugging:                          \\
                                            \\
          [--debug]
@@ -90,7 +294,82 @@ python pylogix_logger_drbitboy             \\
              +[a[5:] for a in av1 if a[:5]=='--ip=']
              )[-1]
 
-    micro8xx = ['--micro8' in [a[:8].lower() for a in av1]]
+    micro8xx = '--micro8' in [a[:8].lower() for a in av1]
+
+    ### 1.2.1) Micro8xx reads one tag per request; use parallel sessions
+    ###        to keep several requests in flight
+    ###
+    ###   --micro8xx-sessions=1
+
+    micro8xx_sessions = int(([1]
+                            +[a[20:] for a in av1
+                              if a[:20]=='--micro8xx-sessions='
+                             ]
+                            )[-1]
+                           )
+
+    ### 1.2.2) Logix:  split tag list into groups that each fit one
+    ###        request and one reply, and read groups over parallel
+    ###        sessions; default connection size is negotiated by pylogix
+    ###        (Large Forward Open, 4002 bytes, else 504)
+    ###
+    ###   --sessions=1
+    ###   --connection-size=4002
+
+    sessions = int(([1]+[a[11:] for a in av1 if a[:11]=='--sessions='])[-1])
+
+    connection_size = ([None]
+                      +[int(a[18:]) for a in av1
+                        if a[:18]=='--connection-size='
+                       ]
+                      )[-1]
+
+    ### 1.2.3) Several PLCs, each polled by its own worker, feeding one
+    ###        set of sinks; every PLC is read for the same tags and scan
+    ###        classes; records carry tag names as ID/TagName; --ip is
+    ###        ignored
+    ###
+    ###   --plc=line1=192.168.1.10 --plc=line2=192.168.1.11[ ...]
+    ###   --plc-pool=thread    ### or process, one process per PLC
+
+    controllers = [tuple(a[6:].split('=',1)) for a in av1 if a[:6]=='--plc=']
+
+    plc_pool = (['thread']
+               +[a[11:] for a in av1 if a[:11]=='--plc-pool=']
+               )[-1]
+
+    assert not (replay and controllers),('--replay reads no PLC; it cannot'
+                                         ' be combined with --plc'
+                                        )
+
+    ### 1.2.4) Simulated PLC, simulated_plc.SIMULATED_PLC, instead of
+    ###        pylogix.PLC at --ip:  tags of given types, changing at
+    ###        random, behind a simulated round trip; cf. 1.1.0.2
+    ###
+    ###   --simulate
+    ###   --simulate-type=TT_*=REAL[ ...]  ### DINT, REAL, BOOL, STRING
+    ###   --simulate-change-rate=0.1       ### Per tag, per read
+    ###   --simulate-latency=0.0           ### Round trip, s
+    ###   --simulate-jitter=0.0            ### Fraction of latency
+    ###   --simulate-error-rate=0.0        ### Failed requests fraction
+    ###   --simulate-seed=...              ### For repeatable runs
+
+    plc = pylogix.PLC
+    if '--simulate' in av1:
+        simulate_kwargs = dict(types=[tuple(a[16:].rsplit('=',1))
+                                      for a in av1
+                                      if a[:16]=='--simulate-type='
+                                     ]
+                              )
+        for key,pfx in (('change_rate' ,'--simulate-change-rate=',)
+                       ,('latency'     ,'--simulate-latency=',)
+                       ,('jitter'      ,'--simulate-jitter=',)
+                       ,('error_rate'  ,'--simulate-error-rate=',)
+                       ,('seed'        ,'--simulate-seed=',)
+                       ):
+            for a in av1:
+                if a.startswith(pfx): simulate_kwargs[key] = a[len(pfx):]
+        plc = functools.partial(SIM.SIMULATED_PLC,**simulate_kwargs)
 
     ### 1.3) Inter-sample interval, seconds:  --interval=0.5
 
@@ -99,6 +378,15 @@ python pylogix_logger_drbitboy             \\
                    )[-1]
                   )
 
+    ### 1.3.1) Policy when a cycle overruns the next deadline:
+    ###
+    ###   --overrun=skip       ### Skip passed deadlines (default)
+    ###   --overrun=catch-up   ### Fire passed deadlines back-to-back
+    ###
+    overrun = (['skip']
+              +[a[10:] for a in av1 if a[:10]=='--overrun=']
+              )[-1]
+
     ### 1.4) Filename for flat ASCII log:  --flat-ascii=ascii_log.txt
 
     flatxt = ([False]
@@ -111,17 +399,87 @@ python pylogix_logger_drbitboy             \\
           +[a[11:] for a in av1 if a[:11]=='--flat-csv=']
           )[-1]
 
+    ### 1.5.1) Buffering and flush policy for flat ASCII and CSV logs:
+    ###
+    ###   --flat-buffer=65536      ### Write buffer size, bytes
+    ###   --flat-flush-records=0   ### Flush after N records
+    ###   --flat-flush-seconds=0   ### Flush after T seconds
+    ###   --flat-fsync-seconds=0   ### Flush and fsync after T seconds
+    ###
+    ###   --flat-rotate-bytes=0    ### Start new segment at size
+    ###   --flat-rotate-when=hour  ### or at UTC minute/hour/day
+    ###   --flat-compress=gzip     ### Compress closed segments (zstd)
+    ###   --flat-keep=0            ### Closed segments to keep
+    ###   --flat-index-seconds=0   ### Time bucket of sidecar index, s;
+    ###                            ### cf. flat_query.py
+    ###
+    ###   - 0 => disabled; with both flush options 0, flush every cycle
+
+    flat_kwargs = dict()
+    for key,pfx in (('buffer_size'  ,'--flat-buffer=',)
+                   ,('flush_records','--flat-flush-records=',)
+                   ,('flush_seconds','--flat-flush-seconds=',)
+                   ,('fsync_seconds','--flat-fsync-seconds=',)
+                   ,('rotate_bytes' ,'--flat-rotate-bytes=',)
+                   ,('rotate_when'  ,'--flat-rotate-when=',)
+                   ,('compress'     ,'--flat-compress=',)
+                   ,('keep'         ,'--flat-keep=',)
+                   ,('index_seconds','--flat-index-seconds=',)
+                   ):
+        for a in av1:
+            if a.startswith(pfx): flat_kwargs[key] = a[len(pfx):]
+
     ### 1.6) Filename for eXcel log:  --excel=xl_log.xlsx
-    ###                               --excel-max-rows=0
+    ###                               --excel-max-rows=10000
+    ###                               --excel-max-seconds=0
+    ###                               --excel-flush-seconds=5
+    ###
+    ###   - Workbook is renamed with UTC timestamp suffix, and a new
+    ###     one started, when it reaches max rows or max seconds; each
+    ###     write rewrites all rows of the workbook, so max rows bounds
+    ###     write time; 0 => eXcel's own limit
 
     xl = ([False]
           +[a[8:] for a in av1 if a[:8]=='--excel=']
           )[-1]
 
-    xl_max_rows = ([False]
+    xl_max_rows = ([None]
                   +[a[17:] for a in av1 if a[:17]=='--excel-max-rows=']
                   )[-1]
 
+    xl_max_seconds = ([0]
+                     +[a[20:] for a in av1 if a[:20]=='--excel-max-seconds=']
+                     )[-1]
+
+    xl_flush_seconds = ([5.0]
+                       +[a[22:] for a in av1
+                         if a[:22]=='--excel-flush-seconds='
+                        ]
+                       )[-1]
+
+    ### 1.6.1) Base path for Parquet log:  --parquet=log.parquet
+    ###
+    ###   --parquet-row-group-rows=65536  ### Rows per row group
+    ###   --parquet-flush-seconds=60      ### or oldest row age, s
+    ###   --parquet-rotate-bytes=0        ### Close file at size
+    ###   --parquet-rotate-seconds=3600   ### or at age, s
+    ###
+    ###   - 0 => disabled; closed files are named with the UTC time
+    ###     range of their rows, cf. parquet_query.py
+
+    parquet = ([False]
+               +[a[10:] for a in av1 if a[:10]=='--parquet=']
+              )[-1]
+
+    parquet_kwargs = dict()
+    for key,pfx in (('row_group_rows','--parquet-row-group-rows=',)
+                   ,('flush_seconds' ,'--parquet-flush-seconds=',)
+                   ,('rotate_bytes'  ,'--parquet-rotate-bytes=',)
+                   ,('rotate_seconds','--parquet-rotate-seconds=',)
+                   ):
+        for a in av1:
+            if a.startswith(pfx): parquet_kwargs[key] = a[len(pfx):]
+
     ### 1.7) Google sheet API - only used if spreadsheet ID is not False
     ###
     ###   --gapi-ssheet-id=...              ### Spreadsheet identifier
@@ -149,6 +507,15 @@ python pylogix_logger_drbitboy             \\
                     +[a[16:] for a in av1 if a[:16]=='--gapi-max-rows=']
                     )[-1]
 
+    ### 1.7.1) Google Sheets write quota; cycles are coalesced into one
+    ###        request while waiting for quota
+    ###
+    ###   --gapi-requests-per-minute=60
+
+    gapi_rpm = ([60]
+               +[a[27:] for a in av1 if a[:27]=='--gapi-requests-per-minute=']
+               )[-1]
+
     ### 1.8) MariaDB/MySQL database log:
     ###   --mysql-db=...     ### MariaDB/MySQL server database name
     ###   --mysql-KEY=VALUE  ### MySQLdb.connect keyword arg KEY=VAL
@@ -162,6 +529,22 @@ python pylogix_logger_drbitboy             \\
                +[a[11:] for a in av1 if a[:11]=='--mysql-db=']
                )[-1]
 
+    ### 1.8.1) MariaDB/MySQL batching; hyphens in these option names
+    ###        keep them out of the MySQLdb.connect keyword args
+    ###   --mysql-flush-rows=1000     ### Write at this many rows
+    ###   --mysql-flush-seconds=1.0   ### Write at this latency, s
+    ###   --mysql-load-data-rows=0    ### LOAD DATA for this many rows
+    ###   --mysql-compact             ### Use tags + tag_log TABLEs
+
+    mysql_batch_kwargs = dict()
+    for key,pfx in (('flush_rows'    ,'--mysql-flush-rows=',)
+                   ,('flush_seconds' ,'--mysql-flush-seconds=',)
+                   ,('load_data_rows','--mysql-load-data-rows=',)
+                   ):
+        for a in av1:
+            if a.startswith(pfx): mysql_batch_kwargs[key] = a[len(pfx):]
+    if '--mysql-compact' in av1: mysql_batch_kwargs.update(schema='compact')
+
     rgx_mysql = re.compile('^--mysql-([A-Za-z0-9_]+)=(.*)$')
 
     mysql_kwargs = dict()
@@ -172,75 +555,362 @@ python pylogix_logger_drbitboy             \\
       key,val = match.groups()
       mysql_kwargs[key] = val
 
-    ### 1.9) PYLOGIX_LOGGER debugging
+    ### 1.8.2) SQLite database log, in WAL mode:  --sqlite=log.sqlite3
+    ###   --sqlite-flush-rows=1000     ### Commit at this many rows
+    ###   --sqlite-flush-seconds=1.0   ### Commit at this latency, s
+    ###   --sqlite-synchronous=NORMAL  ### or FULL to fsync each commit
 
-    debug = '--debug' in av1
+    sqlite = ([False]
+              +[a[9:] for a in av1 if a[:9]=='--sqlite=']
+             )[-1]
 
-    ### 2) Open pylogix communications
+    sqlite_kwargs = dict()
+    for key,pfx in (('flush_rows'    ,'--sqlite-flush-rows=',)
+                   ,('flush_seconds' ,'--sqlite-flush-seconds=',)
+                   ,('synchronous'   ,'--sqlite-synchronous=',)
+                   ):
+        for a in av1:
+            if a.startswith(pfx): sqlite_kwargs[key] = a[len(pfx):]
+
+    ### 1.8.3) Any registered sink, by name, e.g. a third-party sink
+    ###        installed under entry-point group pylogix_logger.sinks;
+    ###        cf. sink_registry.py
+    ###
+    ###   --sink=NAME[:key=value[,key=value...]][ --sink=...]
+    ###   --sink=csv:csv_name=log.csv   ### Same as --flat-csv=log.csv
+
+    sinks = [SR.parse(a[7:]) for a in av1 if a[:7]=='--sink=']
+
+    ### 1.9) Per-sink bounded queues, each drained by a worker thread
+    ###
+    ###   --queue-size=1000              ### Batches; 0 => log inline
+    ###   --queue-overflow=block         ### or drop-oldest, or spill
+    ###   --queue-spill-dir=/tmp         ### Directory for spill files
+
+    queue_size = int(([1000]
+                     +[a[13:] for a in av1 if a[:13]=='--queue-size=']
+                     )[-1]
+                    )
 
-    with pylogix.PLC(ipaddr) as comm:
+    queue_overflow = (['block']
+                     +[a[17:] for a in av1 if a[:17]=='--queue-overflow=']
+                     )[-1]
+
+    queue_spill_dir = ([None]
+                      +[a[18:] for a in av1 if a[:18]=='--queue-spill-dir=']
+                      )[-1]
+
+    ### 1.10) Durable spool in front of network sinks (Google Sheets,
+    ###       MariaDB/MySQL); no spool unless --spool-dir is given
+    ###
+    ###   --spool-dir=path/           ### One sub-directory per sink
+    ###   --spool-batch-rows=10000    ### Maximum rows per sink call
+    ###   --spool-replay-rate=0       ### Backlog replay limit, rows/s
+
+    spool_dir = ([False]
+                +[a[12:] for a in av1 if a[:12]=='--spool-dir=']
+                )[-1]
+
+    spool_batch_rows = int(([10000]
+                           +[a[19:] for a in av1
+                             if a[:19]=='--spool-batch-rows='
+                            ]
+                           )[-1]
+                          )
+
+    spool_replay_rate = float(([0]
+                              +[a[20:] for a in av1
+                                if a[:20]=='--spool-replay-rate='
+                               ]
+                              )[-1]
+                             )
+
+    ### 1.10.1) Stage timings and counters, always recorded; exposed
+    ###         as Prometheus text, and as a periodic summary line
+    ###
+    ###   --metrics-port=9108             ### HTTP /metrics; 0 => none
+    ###   --metrics-host=127.0.0.1        ### Interface to listen on
+    ###   --metrics-summary-seconds=60    ### Summary line; 0 => none
 
-        ### 2.1) Set up pylogix Read options as lambda function
-        ### 2.1.1) Micro8xx cannot read sequence of tags; accomplish
-        ###        same via list comprehension
-        comm.Micro800 = micro8xx
-        if micro8xx: R = lambda : [comm.Read(tag) for tag in tags]
-        else       : R = lambda : comm.Read(tags).Value
+    metrics_port = int(([0]
+                        +[a[15:] for a in av1 if a[:15]=='--metrics-port=']
+                       )[-1]
+                      )
 
-        ### 2.2) Build list of loggers, from logger_classes module
+    metrics_host = (['127.0.0.1']
+                    +[a[15:] for a in av1 if a[:15]=='--metrics-host=']
+                   )[-1]
+
+    metrics_summary_seconds = float(([0]
+                                     +[a[26:] for a in av1
+                                       if a[:26]=='--metrics-summary-seconds='
+                                      ]
+                                    )[-1]
+                                   )
+
+    ### 1.11) PYLOGIX_LOGGER debugging
+
+    debug = '--debug' in av1
+
+    ### 1.12) Group tags into scan classes, one per distinct interval:
+    ###       --tag tags at --interval; --scan tags at their own
+    ###
+    ###   - A tag given for more than one interval is read, and logged,
+    ###     in the fastest class only, i.e. at the shortest interval
+
+    scan_classes = dict()
+    assigned = dict()
+    for scan_interval,scan_tags in sorted([(intrvl,tags,)] + scans
+                                         ,key=lambda scan: scan[0]
+                                         ):
+        scan_class = scan_classes.setdefault(scan_interval,list())
+        for t in scan_tags:
+            if t in assigned:
+                if assigned[t] != scan_interval:
+                    print('Tag {0} read at {1}s only, not also at {2}s'
+                          .format(t,assigned[t],scan_interval)
+                         )
+                continue
+            assigned[t] = scan_interval
+            scan_class.append(t)
+    scan_classes = sorted([(i,ts,) for i,ts in scan_classes.items() if ts])
+
+    ### 1.12.1) Compact MariaDB/MySQL schema:  add tag names, as logged,
+    ###         to TABLE tags at startup; others, e.g. replayed, are
+    ###         added when first seen
+    if 'compact' == mysql_batch_kwargs.get('schema'):
+        mysql_batch_kwargs.update(tags=CC.logged_tag_names(
+                                         scan_classes
+                                        ,[i for i,ip in controllers]
+                                       ))
+
+    ### 2) Open pylogix communications
+
+    acquisition_kwargs = dict(plc=plc
+                             ,micro8xx=micro8xx
+                             ,micro8xx_sessions=micro8xx_sessions
+                             ,sessions=sessions
+                             ,connection_size=connection_size
+                             ,filter_rules=filter_rules
+                             )
+
+    ### 2.0) Stage timings and counters, shared by all stages
+    metrics = MC.PYLOGIX_METRICS(debug=debug)
+
+    ### 2.0.1) With --plc, start one worker per PLC, each with its own
+    ###        communications, before sinks are opened; their changes
+    ###        are queued until sinks are added
+    pool = None
+    if controllers:
+        pool = CC.PYLOGIX_CONTROLLER_POOL(controllers,scan_classes
+                                         ,pool=plc_pool
+                                         ,overrun=overrun
+                                         ,acquisition_kwargs=acquisition_kwargs
+                                         ,metrics=metrics
+                                         ,debug=debug
+                                         )
+        pool.start()
+
+    with (contextlib.nullcontext() if pool or replay else plc(ipaddr)
+         ) as comm:
+
+        ### 2.1) Set up one acquisition stage per scan class:  one PLC
+        ###      read and one change detection per due cycle, shared by
+        ###      all loggers; all classes use the same PLC connection
+        ###      - Micro8xx:  one tag per request, over
+        ###        --micro8xx-sessions sessions
+        ###      - Logix:  packet-sized groups, over --sessions sessions
+        ###      - With --plc, workers have their own acquisition stages
+        ###      - With --replay, the replay source stands in for them
+        acqs = list()
+        if replay:
+            acqs = [RC.PYLOGIX_REPLAY(replay,speed=replay_speed
+                                     ,metrics=metrics
+                                     ,debug=debug
+                                     )
+                   ]
+        elif not pool:
+            acqs = CC.make_acquisitions(comm,ipaddr,scan_classes
+                                       ,metrics=metrics
+                                       ,debug=debug
+                                       ,**acquisition_kwargs
+                                       )
         pyloggers = list()
-        app = pyloggers.append
+
+        ### 2.2) Build list of loggers, from sink_registry:  each sink's
+        ###      module, and its libraries, are imported only here, and
+        ###      only if its option was given
+        ###      - With --spool-dir, put each network logger behind its
+        ###        own durable spool and drainer thread
+        ###      - Else, unless --queue-size=0, put each logger behind its
+        ###        own bounded queue and worker thread
+        def app(pylogger,spool_name=None):
+            metrics.add_counters(pylogger,getattr(pylogger,'COUNTERS',dict())
+                                ,sink=MC.sink_name(pylogger)
+                                )
+            if spool_dir and spool_name:
+                pylogger = SPC.PYLOGIX_SPOOLED_SINK(
+                             pylogger
+                            ,os.path.join(spool_dir,spool_name)
+                            ,batch_rows=spool_batch_rows
+                            ,replay_rows_per_second=spool_replay_rate
+                            ,metrics=metrics
+                            ,debug=debug
+                            )
+            elif queue_size > 0:
+                pylogger = WC.PYLOGIX_SINK_WORKER(pylogger
+                                                 ,maxsize=queue_size
+                                                 ,policy=queue_overflow
+                                                 ,spill_dir=queue_spill_dir
+                                                 ,metrics=metrics
+                                                 ,debug=debug
+                                                 )
+            for acq in acqs: acq.add(pylogger)
+            pyloggers.append(pylogger)
+            return pylogger
 
         ### 2.2.1) Flat ASCII log "Name - Value - Timestamp"
         if flatxt:
-            app(LC.PYLOGIX_LOGGER_FLAT_ASCII(flatxt,R(),debug=debug))
+            app(SR.load('flat_ascii')(flatxt,debug=debug
+                                     ,**flat_kwargs
+                                     )
+               )
 
         ### 2.2.2) CSV log "Name,Value,Timestamp"
         if csv:
-            app(LC.PYLOGIX_LOGGER_CSV(csv,R(),debug=debug))
+            app(SR.load('csv')(csv,debug=debug,**flat_kwargs))
 
         ### 2.2.3) eXcel workbook log
         if xl:
-            app(LC.PYLOGIX_LOGGER_EXCEL(xl
-                                       ,R()
-                                       ,max_rows=xl_max_rows
-                                       ,debug=debug
-                                       )
+            app(SR.load('excel')(xl
+                                ,max_rows=xl_max_rows
+                                ,max_seconds=xl_max_seconds
+                                ,flush_seconds=xl_flush_seconds
+                                ,debug=debug
+                                )
+               )
+
+        ### 2.2.3.1) Parquet log
+        if parquet:
+            app(SR.load('parquet')(parquet,debug=debug
+                                  ,**parquet_kwargs
+                                  )
                )
 
         ### 2.2.4) Google Sheet API log
         if ssheet_id:
-            app(LC.PYLOGIX_LOGGER_GOOGLE_SHEET(R()
-                                              ,SS_ID=ssheet_id
-                                              ,SHEET_NAME=sheet_name
-                                              ,TOKEN_FILE=pickle_file
-                                              ,CREDENTIAL_FILE=creds_file
-                                              ,max_rows=gapi_max_rows
-                                              ,debug=debug
-                                              )
+            app(SR.load('google_sheet')(SS_ID=ssheet_id
+                                       ,SHEET_NAME=sheet_name
+                                       ,TOKEN_FILE=pickle_file
+                                       ,CREDENTIAL_FILE=creds_file
+                                       ,max_rows=gapi_max_rows
+                                       ,requests_per_minute=gapi_rpm
+                                       ,debug=debug
+                                       )
+               ,spool_name='google_sheet'
                )
 
         ### 2.2.5) MariaDB/MySQL log
         if mysql_db:
-            app(LC.PYLOGIX_LOGGER_MYSQL(R()
+            app(SR.load('mysql')(debug=debug
+                                ,**mysql_batch_kwargs
+                                ,**mysql_kwargs
+                                )
+               ,spool_name='mysql'
+               )
+
+        ### 2.2.6) SQLite log
+        if sqlite:
+            app(SR.load('sqlite')(sqlite,debug=debug,**sqlite_kwargs))
+
+        ### 2.2.6.1) Sinks by name, e.g. third-party sinks
+        for sink_name,sink_kwargs in sinks:
+            app(SR.load(sink_name)(debug=debug,**sink_kwargs))
+
+        ### 2.2.7) With --plc, feed workers' changes to sinks
+        if pool: pool.add_sinks(pyloggers)
+
+        ### 2.3) Fixed-rate scheduler on absolute deadlines, one
+        ###      timeline per scan class; with --plc, each worker has
+        ###      its own
+        sched = SC.MULTI_RATE_SCHEDULER([i for i,ts in scan_classes]
+                                       ,policy=overrun
+                                       ,metrics=metrics
                                        ,debug=debug
-                                       ,**mysql_kwargs
                                        )
-               )
+
+        ### 2.3.1) Metrics endpoint, and periodic summary line
+        if metrics_port:
+            print('Metrics at http://{0}:{1}/metrics'.format(
+                    *metrics.serve(metrics_port,host=metrics_host)
+                  ))
+        if metrics_summary_seconds:
+            metrics.start_summary(metrics_summary_seconds)
+
+        ### 2.4) Treat SIGTERM as CONTROL+C, so buffered sinks are
+        ###      flushed and closed on either
+        def sigterm(signum,frame): raise KeyboardInterrupt
+        signal.signal(signal.SIGTERM,sigterm)
+
         ### End prologue
         ################################################################
 
         ################################################################
         ### Here's the beef:  
-        ### - In a loop, log new elements that differ from old elements
+        ### - In a loop, read PLC once for each scan class that is due,
+        ###   and log new elements that differ from old elements to all
+        ###   loggers
         ################################################################
 
         while True:
 
             try:
-                for pylogger in pyloggers: pylogger.log_news(R())
-                time.sleep(intrvl)            ### Wait before repeating
+                if pool:
+                    time.sleep(1.0)           ### Workers read PLCs
+                elif replay:
+                    if None is acqs[0](): break   ### End of replay log
+                else:
+                    for i in sched.wait():    ### Wait for next deadline
+                        acqs[i]()             ### Read and log due class
+
+                ### Show sinks that are falling behind
+                if debug:
+                    for pylogger in pyloggers:
+                        if hasattr(pylogger,'depth') and pylogger.depth():
+                            print(pylogger.stats())
 
             except KeyboardInterrupt:
                 print('\n\n\n')               ### Help cmd line editor
                 break                         ### Exit loop on CONTROL+C
+
+        ### Ignore further CONTROL+C and SIGTERM, e.g. from an impatient
+        ### user, or from timeout signalling the process group, so every
+        ### sink below is drained, flushed and closed
+        for signum in (signal.SIGINT,signal.SIGTERM,):
+            signal.signal(signum,signal.SIG_IGN)
+
+        ### Close readers, and any extra PLC sessions; with --plc, stop
+        ### workers, and pass their last changes to sinks
+        if pool: pool.close()
+        for acq in acqs: acq.close()
+
+        ### Drain queues and spools to sinks, close sinks, and report
+        ### per-sink queue and spool statistics
+        for pylogger in pyloggers:
+            pylogger.close()
+            if hasattr(pylogger,'stats'): print(pylogger.stats())
+
+        ### Report change volume removed by filters, per scan class
+        for acq in acqs:
+            if acq.change_filter: print(acq.change_filter.stats())
+
+        ### Report sampling period, jitter and overruns, per scan class;
+        ### with --plc, per controller, with filter statistics
+        print(pool and pool.summary()
+              or replay and acqs[0].summary()
+              or sched.summary()
+             )
+
+        ### Stop metrics endpoint and summary; last summary line
+        metrics.close()
+        if metrics_summary_seconds: print(metrics.summary())
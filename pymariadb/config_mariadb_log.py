@@ -4,7 +4,26 @@ Python script:  config_mariadb_log.py
 Purpose:  Ensure PLC data logging table, with 'log' as the name,
           exists in MariaDB/MySQL database named 'test_something'
 
+          - Timestamps are DATETIME(6), i.e. with microseconds; convert
+            a 'log' table made by an earlier version with
+            ALTER TABLE log MODIFY timestamp DATETIME(6) NOT NULL;
+
+          With --compact, ensure compact tables exist instead:
+          - 'tags':  tag dictionary, tag_name <=> small integer tag_id
+          - 'tag_log':  (tag_id,timestamp DATETIME(6),tag_value), with
+                        (tag_id,timestamp) as the only key
+          - With --partition-days=N, 'tag_log' is RANGE-partitioned by
+            day, with partitions for today and the next N-1 days, so
+            old data can be removed by dropping partitions
+
 Usage:  python config_mariadb_log.py test_dbname [--debug]
+                                                 [--compact]
+                                                 [--partition-days=N]
+                                                 [--keep-days=M]
+
+  Re-run with --compact --partition-days=N e.g. daily to add partitions
+  for the next N days; add --keep-days=M to drop partitions for days
+  more than M days old
 
 Prerequisites:
 
@@ -28,6 +47,17 @@ import datetime
 import MySQLdb
 
 do_debug = '--debug' in sys.argv[2:]
+do_compact = '--compact' in sys.argv[2:]
+partition_days = int(([0]
+                     +[a[17:] for a in sys.argv[2:]
+                       if a[:17]=='--partition-days='
+                      ]
+                     )[-1]
+                    )
+keep_days = int(([0]
+                +[a[12:] for a in sys.argv[2:] if a[:12]=='--keep-days=']
+                )[-1]
+               )
 
 create_db_query = """
 CREATE DATABASE IF NOT EXISTS {0};
@@ -36,7 +66,7 @@ CREATE DATABASE IF NOT EXISTS {0};
 create_tbl_queries = """
 CREATE TABLE IF NOT EXISTS log
 ( rowid INT AUTO_INCREMENT PRIMARY KEY
-, timestamp DATETIME NOT NULL
+, timestamp DATETIME(6) NOT NULL
 , tag_name VARCHAR(32) NOT NULL
 , tag_value DOUBLE NOT NULL
 );
@@ -48,6 +78,77 @@ CREATE INDEX IF NOT EXISTS timestamp  ON log (timestamp);
 CREATE INDEX IF NOT EXISTS ts_tag     ON log (tag_name,timestamp);
 """
 
+create_compact_tbl_queries = """
+CREATE TABLE IF NOT EXISTS tags
+( tag_id MEDIUMINT UNSIGNED AUTO_INCREMENT PRIMARY KEY
+, tag_name VARCHAR(128) NOT NULL
+, UNIQUE KEY tag_name (tag_name)
+);
+
+CREATE TABLE IF NOT EXISTS tag_log
+( tag_id MEDIUMINT UNSIGNED NOT NULL
+, timestamp DATETIME(6) NOT NULL
+, tag_value DOUBLE NOT NULL
+, PRIMARY KEY (tag_id,timestamp)
+){0};
+"""
+
+### Day partition:  rows with timestamp before midnight after that day
+partition_def = "PARTITION p{0:%Y%m%d} VALUES LESS THAN (TO_DAYS('{1}'))"
+future_def = "PARTITION pfuture VALUES LESS THAN MAXVALUE"
+
+def day_partitions(first_day,ndays):
+  """Return list of partition definitions for ndays from first_day"""
+  return [partition_def.format(day,(day+datetime.timedelta(days=1)
+                                   ).isoformat()
+                              )
+          for day in [first_day+datetime.timedelta(days=i)
+                      for i in range(ndays)
+                     ]
+         ]
+
+def execute_queries(cu,queries):
+  """Execute semicolon-separated queries one at a time"""
+  for query in [q.strip() for q in queries.split(';')]:
+    if not query: continue
+    if do_debug: print(query+';')
+    cu.execute(query)
+
+def maintain_partitions(cu,ndays,keep):
+  """
+Add day partitions to tag_log through today+ndays-1, splitting them off
+pfuture; drop day partitions older than keep days (keep=0 => none)
+
+"""
+  cu.execute("""
+SELECT partition_name FROM information_schema.partitions
+WHERE table_schema=DATABASE() AND table_name='tag_log'
+  AND NOT (partition_name IS NULL)
+""")
+  names = sorted([row[0] for row in cu if row[0] != 'pfuture'])
+  if not names: return
+
+  today = datetime.datetime.utcnow().date()
+  last = datetime.datetime.strptime(names[-1][1:],'%Y%m%d').date()
+  first_new = max([today,last+datetime.timedelta(days=1)])
+  nnew = (today + datetime.timedelta(days=ndays) - first_new).days
+  if nnew > 0:
+    execute_queries(cu,("ALTER TABLE tag_log REORGANIZE PARTITION pfuture"
+                        " INTO ({0});"
+                       ).format(','.join(day_partitions(first_new,nnew)
+                                        +[future_def]
+                                        )
+                               )
+                   )
+
+  if keep > 0:
+    oldest = 'p{0:%Y%m%d}'.format(today - datetime.timedelta(days=keep))
+    drops = [name for name in names if name < oldest]
+    if drops:
+      execute_queries(cu,"ALTER TABLE tag_log DROP PARTITION {0};"
+                         .format(','.join(drops))
+                     )
+
 def config_mariadb_log(dbname):
 
   ### Validate Database name from command-line
@@ -70,13 +171,37 @@ def config_mariadb_log(dbname):
   ### Connect to MariaDB/MySQL server with database name
   cu=MySQLdb.connect(database=dbname,read_default_group='').cursor()
 
-  ### Execute TABLE and INDEX creation queries
-  if do_debug: print(create_tbl_queries)
-  cu.execute(create_tbl_queries)
-
-  ### Describe TABLE
-  cu.execute('DESCRIBE log;')
-  for row in cu: print(row)
+  if do_compact:
+
+    ### Execute compact TABLE creation queries, with optional
+    ### partitioning by day
+    partitions = ''
+    if partition_days > 0:
+      today = datetime.datetime.utcnow().date()
+      partitions = ("\nPARTITION BY RANGE (TO_DAYS(timestamp))\n({0})"
+                    .format('\n,'.join(day_partitions(today,partition_days)
+                                       +[future_def]
+                                       )
+                           )
+                   )
+    execute_queries(cu,create_compact_tbl_queries.format(partitions))
+    if partition_days > 0:
+      maintain_partitions(cu,partition_days,keep_days)
+
+    ### Describe TABLEs
+    for tbl in ('tags','tag_log',):
+      cu.execute('DESCRIBE {0};'.format(tbl))
+      for row in cu: print(row)
+
+  else:
+
+    ### Execute TABLE and INDEX creation queries
+    if do_debug: print(create_tbl_queries)
+    cu.execute(create_tbl_queries)
+
+    ### Describe TABLE
+    cu.execute('DESCRIBE log;')
+    for row in cu: print(row)
 
   ### Close connection
   cu.connection.close()
@@ -0,0 +1,173 @@
+"""
+replay_classes.py
+
+Purpose:  feed a recorded flat ASCII or CSV log, and its rotated
+          segments, back through the loggers (sinks), cycle by cycle,
+          in place of a PLC and acquisition stage (cf. --replay), as
+          fast as possible or at a multiple of real time
+
+          - Consecutive records with the same timestamp are one cycle
+          - Values are restored to int, float or bool where they parse
+            as such, else kept as logged strings; timestamps are UTC
+            datetimes, as acquisition stages pass them
+
+"""
+import time
+import flat_query
+import metrics_classes as MC
+
+########################################################################
+def parse_value(value):
+    """Return logged value string as int, float or bool, if it is one,
+else as the string"""
+    if value in ('True','False',): return 'True' == value
+    for cast in (int,float,):
+        try: return cast(value)
+        except ValueError: pass
+    return value
+
+########################################################################
+########################################################################
+
+class PYLOGIX_REPLAY:
+    """Replay source:  same .add(), .__call__() and .close() as
+acquisition_classes.PYLOGIX_ACQUISITION"""
+
+    ################################
+    def __init__(self,log_name,*args
+                ,pyloggers=None
+                ,speed=0.0
+                ,metrics=None
+                ,debug=False
+                ,**kwargs
+                ):
+        """
+ log_name:  path of flat ASCII or CSV log, as given to --flat-ascii or
+            --flat-csv; rotated segments, compressed or not, are
+            replayed first, oldest first
+pyloggers:  sequence of PYLOGIX_LOGGER instances (sinks); cf. .add()
+    speed:  multiple of real time, e.g. 10 => ten times faster than
+            logged; 0 => as fast as possible
+  metrics:  metrics_classes.PYLOGIX_METRICS, to time log reads and
+            each sink call, and to count cycles and changes; default is
+            a private instance
+    debug:  Set to True to send debugging info to stdout
+
+"""
+        self.log_name = log_name
+        self.speed = float(speed or 0)
+        self.debug = debug
+        self.change_filter = None          ### As acquisition stages
+        self.records = self.read_records()
+        self.pending = None                ### First record of next cycle
+        self.now = None
+        self.t0 = self.now0 = None
+
+        self.metrics = metrics or MC.PYLOGIX_METRICS()
+        self.h_read = self.metrics.histogram('replay_read')
+        self.h_sinks = list()
+        self.metrics.add_counters(self,dict(cycles='cycles'
+                                           ,changes='changes'
+                                           )
+                                 )
+        self.pyloggers = list()
+        for pylogger in (pyloggers or list()): self.add(pylogger)
+
+        ### Counters:  cycles replayed; records replayed
+        self.cycles = self.changes = 0
+        self.t_start = None
+
+    ################################
+    def add(self,pylogger):
+        """Add a sink to receive each cycle's changes"""
+        self.pyloggers.append(pylogger)
+        self.h_sinks.append(self.metrics.histogram('sink_submit'
+                                                  ,sink=MC.sink_name(pylogger)
+                                                  ))
+        return pylogger
+
+    ################################
+    def read_records(self):
+        """Yield (TagName,Value,Timestamp string) of every record, in
+logged order, segment by segment"""
+        for path,idx_path in flat_query.segments(self.log_name):
+            separator = None
+            with flat_query.open_segment(path) as fIn:
+                for line in fIn:
+                    line = line.decode('utf-8').rstrip('\r\n')
+                    try:
+                        record,separator = flat_query.split_line(line
+                                                                ,separator
+                                                                )
+                    except ValueError:
+                        continue     ### Blank or partial line
+                    yield record
+
+    ################################
+    def read(self):
+        """Return list of (TagName,Value,Timestamp) triplets of next
+cycle, or None at end of log"""
+        record = self.pending or next(self.records,None)
+        if None is record: return None
+        stamp = record[2]
+        changeds = list()
+        while not (None is record) and record[2] == stamp:
+            changeds.append(record)
+            record = next(self.records,None)
+        self.pending = record
+
+        now = flat_query.parse_time(stamp)
+        return [(name,parse_value(value),now,)
+                for name,value,stamp in changeds
+               ]
+
+    ################################
+    def __call__(self,*args,**kwargs):
+        """
+Replay one cycle:  read it, wait, at speed, until its logged time, pass
+it to every sink; return the changes, or None at end of log
+
+"""
+        if None is self.t_start: self.t_start = time.monotonic()
+        t0 = time.perf_counter()
+        changeds = self.read()
+        t1 = time.perf_counter()
+        self.h_read.observe(t1 - t0)
+        if None is changeds: return None
+
+        self.now = changeds[0][2]
+        if self.speed:
+            if None is self.t0: self.t0,self.now0 = time.monotonic(),self.now
+            delay = (self.t0 + (self.now - self.now0).total_seconds()
+                              / self.speed
+                    ) - time.monotonic()
+            if delay > 0.0: time.sleep(delay)
+            t1 = time.perf_counter()
+
+        self.cycles += 1
+        self.changes += len(changeds)
+        for pylogger,h_sink in zip(self.pyloggers,self.h_sinks):
+            pylogger.log_changeds(changeds,self.now,*args,**kwargs)
+            t2 = time.perf_counter()
+            h_sink.observe(t2 - t1)
+            t1 = t2
+        return changeds
+
+    ################################
+    def summary(self):
+        """Return one-line summary of cycles and records replayed, and
+rates"""
+        dt = max([time.monotonic() - (self.t_start or time.monotonic())
+                 ,1e-9
+                 ])
+        return ('replay cycles={0} changes={1} seconds={2:.3f}'
+                ' cycles_per_s={3:.1f} changes_per_s={4:.1f}'
+                .format(self.cycles,self.changes,dt
+                       ,self.cycles/dt,self.changes/dt
+                       )
+               )
+
+    ################################
+    def close(self):
+        """Stop reading log; sinks are closed by caller"""
+        self.records.close()
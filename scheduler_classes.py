@@ -0,0 +1,249 @@
+"""
+scheduler_classes.py
+
+Purpose:  fire sampling cycles on absolute deadlines of a monotonic
+          clock, so the sampling period does not drift by the time
+          spent reading the PLC and logging; several scan classes, each
+          with its own interval, can share one loop
+
+"""
+import time
+import math
+import metrics_classes as MC
+
+########################################################################
+########################################################################
+
+class FIXED_RATE_SCHEDULER:
+    """Wait for deadlines t0, t0+interval, t0+2*interval, ..."""
+
+    ### Overrun policies
+    POLICIES = ('skip','catch-up',)
+
+    ################################
+    def __init__(self,interval,*args
+                ,policy='skip'
+                ,clock=time.monotonic
+                ,sleep=time.sleep
+                ,debug=False
+                ,**kwargs
+                ):
+        """
+interval:  sampling period, s
+  policy:  what to do when a cycle runs past the next deadline:
+           - 'skip':  drop deadlines already passed, count them as
+                      missed, fire on the latest passed deadline
+           - 'catch-up':  fire once per passed deadline, back-to-back,
+                          until caught up
+   clock:  monotonic clock function; default time.monotonic
+   sleep:  sleep function; default time.sleep
+   debug:  Set to True to send overrun info to stdout
+
+"""
+        assert policy in self.POLICIES,('Invalid overrun policy [{0}];'
+                                        ' must be one of {1}'
+                                        .format(policy,self.POLICIES)
+                                       )
+        self.interval = float(interval)
+        self.policy = policy
+        self.clock = clock
+        self.sleep = sleep
+        self.debug = debug
+
+        self.t0 = None              ### Time of first deadline
+        self.k = 0                  ### Index of current deadline
+        self.last_fire = None       ### Time of most recent firing
+
+        ### Counters:  cycles fired; overruns; deadlines missed
+        self.fires = self.overruns = self.missed = 0
+
+        ### Period statistics:  count; sum; sum of squares; min; max
+        self.nperiod = 0
+        self.sum_period = self.sumsq_period = 0.0
+        self.min_period = self.max_period = None
+
+        ### Lateness (firing time - deadline) statistics:  sum; max
+        self.sum_late = self.max_late = 0.0
+
+    ################################
+    def wait(self):
+        """Sleep until next deadline; return that deadline"""
+        now = self.clock()
+
+        if None is self.t0:
+            ### First call:  fire immediately; deadlines follow from now
+            self.t0 = deadline = now
+        else:
+            deadline = self.next_deadline()
+            if now < deadline: self.sleep(deadline - now)
+            deadline = self.advance(now)
+
+        return self.fired(deadline)
+
+    ################################
+    def next_deadline(self):
+        """Return next deadline, without advancing to it"""
+        return self.t0 + (self.k + 1) * self.interval
+
+    ################################
+    def advance(self,now):
+        """
+Advance to next deadline; if now, the time the previous cycle's work
+ended, is already past that deadline, count an overrun and apply the
+overrun policy; return the deadline to fire on
+
+"""
+        self.k += 1
+        deadline = self.t0 + self.k * self.interval
+        if now >= deadline:
+            ### Overrun:  work ran past this deadline
+            behind = int((now - deadline) // self.interval)
+            self.overruns += 1
+            if behind and 'skip' == self.policy:
+                self.missed += behind
+                self.k += behind
+                deadline = self.t0 + self.k * self.interval
+            if self.debug:
+                print(dict(overrun_s=now-deadline,behind=behind
+                          ,policy=self.policy,interval=self.interval
+                          )
+                     )
+        return deadline
+
+    ################################
+    def fired(self,deadline):
+        """Update statistics on firing; return deadline"""
+        fire = self.clock()
+        self.fires += 1
+
+        late = fire - deadline
+        self.sum_late += late
+        self.max_late = max(self.max_late,late)
+
+        if not (None is self.last_fire):
+            period = fire - self.last_fire
+            self.nperiod += 1
+            self.sum_period += period
+            self.sumsq_period += period * period
+            if None is self.min_period or period < self.min_period:
+                self.min_period = period
+            if None is self.max_period or period > self.max_period:
+                self.max_period = period
+
+        self.last_fire = fire
+        return deadline
+
+    ################################
+    def jitter(self):
+        """Return standard deviation of period, s"""
+        if self.nperiod < 2: return 0.0
+        mean = self.sum_period / self.nperiod
+        var = self.sumsq_period / self.nperiod - mean * mean
+        return math.sqrt(max(var,0.0))
+
+    ################################
+    def summary(self):
+        """Return one-line summary of period, jitter and overruns"""
+        n = self.nperiod or 1
+        return ('cycles={0} interval={1:.6f}s mean_period={2:.6f}s'
+                ' jitter={3:.6f}s min_period={4:.6f}s max_period={5:.6f}s'
+                ' mean_late={6:.6f}s max_late={7:.6f}s'
+                ' overruns={8} missed={9} policy={10}'
+                .format(self.fires,self.interval
+                       ,self.sum_period / n,self.jitter()
+                       ,self.min_period or 0.0,self.max_period or 0.0
+                       ,self.sum_late / (self.fires or 1),self.max_late
+                       ,self.overruns,self.missed,self.policy
+                       )
+               )
+
+########################################################################
+########################################################################
+
+class MULTI_RATE_SCHEDULER:
+    """
+Wait for the next deadline of any of several scan classes, each on its
+own FIXED_RATE_SCHEDULER timeline; all timelines start together, so
+e.g. 0.1s, 1s and 60s classes line up on whole seconds and minutes
+
+"""
+
+    ### Deadlines closer than this, s, fire together
+    TOLERANCE = 1e-6
+
+    ################################
+    def __init__(self,intervals,*args
+                ,policy='skip'
+                ,clock=time.monotonic
+                ,sleep=time.sleep
+                ,metrics=None
+                ,controller_id=None
+                ,debug=False
+                ,**kwargs
+                ):
+        """
+intervals:  sequence of sampling periods, s, one per scan class
+   policy:  overrun policy, applied per scan class; cf.
+            FIXED_RATE_SCHEDULER
+    clock:  monotonic clock function; default time.monotonic
+    sleep:  sleep function; default time.sleep
+  metrics:  metrics_classes.PYLOGIX_METRICS, to time each wait for a
+            deadline; default is a private instance
+controller_id:  name of PLC, for metrics labels
+    debug:  Set to True to send overrun info to stdout
+
+"""
+        self.clock = clock
+        self.sleep = sleep
+        self.h_sleep = (metrics or MC.PYLOGIX_METRICS()
+                       ).histogram('sleep',controller=controller_id)
+        self.schedulers = [FIXED_RATE_SCHEDULER(interval
+                                               ,policy=policy
+                                               ,clock=clock
+                                               ,sleep=sleep
+                                               ,debug=debug
+                                               )
+                           for interval in intervals
+                          ]
+
+    ################################
+    def wait(self):
+        """
+Sleep until next deadline of any scan class; return list of indices of
+the scan classes due
+
+"""
+        now = self.clock()
+
+        if None is self.schedulers[0].t0:
+            ### First call:  fire all classes immediately
+            for scheduler in self.schedulers:
+                scheduler.t0 = now
+                scheduler.fired(now)
+            return list(range(len(self.schedulers)))
+
+        deadlines = [scheduler.next_deadline()
+                     for scheduler in self.schedulers
+                    ]
+        earliest = min(deadlines)
+        if now < earliest:
+            self.sleep(earliest - now)
+            self.h_sleep.observe(self.clock() - now)
+        else:
+            self.h_sleep.observe(0.0)         ### Overrun:  no sleep
+
+        dues = [i for i,deadline in enumerate(deadlines)
+                if deadline <= max([now,earliest]) + self.TOLERANCE
+               ]
+        for i in dues:
+            scheduler = self.schedulers[i]
+            scheduler.fired(scheduler.advance(now))
+        return dues
+
+    ################################
+    def summary(self):
+        """Return summary of period, jitter and overruns, one line per
+scan class"""
+        return '\n'.join([scheduler.summary()
+                          for scheduler in self.schedulers
+                         ])
@@ -0,0 +1,178 @@
+"""
+simulated_plc.py
+
+Purpose:  stand-in for pylogix.PLC, for benchmarks and for exercising
+          the loggers without a controller at --ip (cf. --simulate):
+          tags of configurable types, each changing with a configurable
+          probability per read, behind a configurable, optionally
+          jittered, round-trip latency, with optional failed requests
+
+          Types, chosen per tag name by fnmatch pattern:
+          - DINT:  counts up by one per change
+          - REAL:  random walk, rounded to 3 decimals
+          - BOOL:  toggles
+          - STRING:  'TagName#N', N counting changes
+
+"""
+import time
+import random
+import fnmatch
+from pylogix.lgx_response import Response
+
+### Simulated tag types
+TYPES = ('DINT','REAL','BOOL','STRING',)
+
+### Status of a failed request, as pylogix reports a lost connection
+FAILED_STATUS = 'Connection failure'
+
+########################################################################
+def tag_names(count,prefix='Tag'):
+    """Return count tag names e.g. Tag00000, Tag00001, ..."""
+    return ['{0}{1:05d}'.format(prefix,i) for i in range(int(count))]
+
+########################################################################
+########################################################################
+
+class SIMULATED_PLC:
+    """Fake pylogix.PLC:  .Read(tag), .Read(tag,count=N) and
+.Read([tags...]) of DINT, REAL, BOOL and STRING tags"""
+
+    ################################
+    def __init__(self,ip_address='',*args
+                ,Micro800=False
+                ,change_rate=0.1
+                ,latency=0.0
+                ,tags_per_request=0
+                ,server_slots=None
+                ,seed=None
+                ,types=None
+                ,jitter=0.0
+                ,error_rate=0.0
+                ,**kwargs
+                ):
+        """
+ ip_address:  ignored; present to match pylogix.PLC signature
+   Micro800:  True to read lists one tag per request, as pylogix does
+change_rate:  probability that any tag value changes between reads
+    latency:  simulated round-trip time, s, per request
+tags_per_request:  most tags one request can carry; longer lists are
+                   split into several requests, as pylogix does; 0 =>
+                   no limit
+server_slots:  threading.Semaphore shared between SIMULATED_PLCs, to
+               simulate the number of requests the controller serves
+               at once; None => no limit
+       seed:  random number generator seed, for repeatable runs
+      types:  sequence of (pattern,type) pairs, first match wins, e.g.
+              [('TT_*','REAL'),('*_ON','BOOL')]; type is one of TYPES;
+              tags matching no pattern are DINTs
+     jitter:  latency varies uniformly by up to this fraction of it
+ error_rate:  probability that any request fails:  its Responses have
+              Value None and Status FAILED_STATUS
+
+"""
+        self.IPAddress = ip_address
+        self.Micro800 = Micro800
+        self.change_rate = float(change_rate)
+        self.latency = float(latency)
+        self.tags_per_request = int(tags_per_request)
+        self.server_slots = server_slots
+        self.ConnectionSize = 4002
+        self.random = random.Random(seed)
+        self.values = dict()
+        self.types = list(types or list())
+        for pattern,tag_type in self.types:
+            assert tag_type in TYPES,('Invalid simulated type [{0}] for'
+                                      ' [{1}]; must be one of {2}'
+                                      .format(tag_type,pattern,TYPES)
+                                     )
+        self.tag_types = dict()
+        self.jitter = float(jitter)
+        self.error_rate = float(error_rate)
+
+        ### Request counters:  requests sent; tags read; failed requests
+        self.requests = self.tags_read = self.errors = 0
+
+    ################################
+    def __enter__(self): return self
+    def __exit__(self,*args): self.Close()
+    def Close(self): pass
+
+    ################################
+    def tag_type(self,tag):
+        """Return simulated type of tag, per first matching pattern;
+array elements, e.g. Arr[3], match by array name"""
+        tag_type = self.tag_types.get(tag,None)
+        if None is tag_type:
+            name = tag.split('[')[0]
+            tag_type = ([tag_type for pattern,tag_type in self.types
+                         if fnmatch.fnmatchcase(name,pattern)
+                        ]+['DINT'])[0]
+            self.tag_types[tag] = tag_type
+        return tag_type
+
+    ################################
+    def value(self,tag):
+        """Return current, possibly changed, value of one tag"""
+        self.tags_read += 1
+        if tag not in self.values:
+            self.values[tag] = [0,(0,0.0,False,'{0}#0'.format(tag),)[
+                                     TYPES.index(self.tag_type(tag))
+                                   ]
+                               ]
+        elif self.random.random() < self.change_rate:
+            state = self.values[tag]
+            state[0] += 1
+            tag_type = self.tag_type(tag)
+            if 'DINT' == tag_type:
+                state[1] += 1
+            elif 'REAL' == tag_type:
+                state[1] = round(state[1] + self.random.uniform(-1.0,1.0),3)
+            elif 'BOOL' == tag_type:
+                state[1] = not state[1]
+            else:
+                state[1] = '{0}#{1}'.format(tag,state[0])
+        return self.values[tag][1]
+
+    ################################
+    def Read(self,tag,count=1,datatype=None):
+        """
+Return Response, or list of Responses; one request per call, except
+that, as with pylogix, a list read from a Micro8xx is one request per
+tag
+
+- With count > 1, tag is an array, e.g. Arr[0], and the Response
+  .Value is the list of count elements from there, as with pylogix
+
+"""
+        if isinstance(tag,(list,tuple,)):
+            if self.Micro800: return [self.Read(t) for t in tag]
+            n = self.tags_per_request or len(tag) or 1
+            ok = [self.request() for i in range(0,len(tag),n)]
+            if not all(ok):
+                return [Response(t,None,FAILED_STATUS) for t in tag]
+            return [Response(t,self.value(t),0) for t in tag]
+        if not self.request(): return Response(tag,None,FAILED_STATUS)
+        if count > 1:
+            base,first = (tag.rstrip(']').split('[')+['0'])[:2]
+            return Response(tag,[self.value('{0}[{1}]'.format(base,i))
+                                 for i in range(int(first),int(first)+count)
+                                ],0)
+        return Response(tag,self.value(tag),0)
+
+    ################################
+    def request(self):
+        """Count one request, and wait for simulated round-trip; return
+False if the request failed"""
+        self.requests += 1
+        if self.latency > 0.0:
+            latency = self.latency
+            if self.jitter:
+                latency *= 1.0 + self.random.uniform(-self.jitter,self.jitter)
+            if None is self.server_slots:
+                time.sleep(latency)
+            else:
+                with self.server_slots: time.sleep(latency)
+        if self.error_rate and self.random.random() < self.error_rate:
+            self.errors += 1
+            return False
+        return True
@@ -0,0 +1,102 @@
+"""
+sink_registry.py
+
+Purpose:  look up logger (sink) classes by name, importing each one, and
+          its libraries, only when it is first used, so e.g. a CSV-only
+          run never imports pandas (eXcel) or googleapiclient (Google
+          Sheets)
+
+          - Built-in sinks are the PYLOGIX_LOGGER_* classes of
+            logger_classes
+          - Third-party sinks register under the entry-point group
+            pylogix_logger.sinks, e.g. in the plugin's pyproject.toml:
+
+              [project.entry-points."pylogix_logger.sinks"]
+              influx = "pylogix_influx:PYLOGIX_LOGGER_INFLUX"
+
+            and are used with --sink=influx:url=...,bucket=...; the
+            class is called with the key=value pairs as keyword
+            arguments (all strings), plus debug=
+
+"""
+import importlib
+
+### Entry-point group of third-party sinks
+ENTRY_POINT_GROUP = 'pylogix_logger.sinks'
+
+### Built-in sinks:  name => 'module:CLASS', replaced by the class on
+### first load
+SINKS = dict(flat_ascii='logger_classes:PYLOGIX_LOGGER_FLAT_ASCII'
+            ,csv='logger_classes:PYLOGIX_LOGGER_CSV'
+            ,excel='logger_classes:PYLOGIX_LOGGER_EXCEL'
+            ,parquet='logger_classes:PYLOGIX_LOGGER_PARQUET'
+            ,google_sheet='logger_classes:PYLOGIX_LOGGER_GOOGLE_SHEET'
+            ,mysql='logger_classes:PYLOGIX_LOGGER_MYSQL'
+            ,sqlite='logger_classes:PYLOGIX_LOGGER_SQLITE'
+            )
+
+### Entry points of installed plugins, name => EntryPoint; None until
+### first needed, as scanning installed distributions is not free
+plugins = None
+
+########################################################################
+def register(name,target):
+    """Register sink class, or 'module:CLASS' string, under name; a
+name already registered is replaced"""
+    SINKS[name] = target
+
+########################################################################
+def entry_points():
+    """Return dict of installed plugin entry points, name => EntryPoint"""
+    global plugins
+    if None is plugins:
+        import importlib.metadata
+        eps = importlib.metadata.entry_points()
+        ### - Python 3.10+ has .select; 3.8 and 3.9 return a dict
+        eps = (eps.select(group=ENTRY_POINT_GROUP) if hasattr(eps,'select')
+               else eps.get(ENTRY_POINT_GROUP,())
+              )
+        plugins = dict([(ep.name,ep,) for ep in eps])
+    return plugins
+
+########################################################################
+def names():
+    """Return sorted list of built-in and plugin sink names"""
+    return sorted(set(SINKS).union(entry_points()))
+
+########################################################################
+def load(name):
+    """
+Return sink class registered under name, importing its module on first
+use; built-in and register()ed names take precedence over plugins
+
+"""
+    target = SINKS.get(name,None)
+
+    if None is target:
+        ep = entry_points().get(name,None)
+        assert not (None is ep),('Unknown sink [{0}]; known sinks are {1}'
+                                 .format(name,names())
+                                )
+        target = SINKS[name] = ep.load()
+
+    elif isinstance(target,str):
+        module_name,class_name = target.split(':',1)
+        target = getattr(importlib.import_module(module_name),class_name)
+        SINKS[name] = target
+
+    return target
+
+########################################################################
+def parse(spec):
+    """Return (name,kwargs) from 'NAME[:key=value[,key=value...]]', e.g.
+'influx:url=http://localhost:8086,bucket=plc'"""
+    name,rest = (spec.split(':',1)+[''])[:2]
+    kwargs = dict()
+    for pair in [p for p in rest.split(',') if p]:
+        assert '=' in pair,('Invalid sink option [{0}] in [{1}];'
+                            ' expected key=value'.format(pair,spec)
+                           )
+        key,val = pair.split('=',1)
+        kwargs[key] = val
+    return name,kwargs
@@ -0,0 +1,409 @@
+"""
+spool_classes.py
+
+Purpose:  durable, append-only, on-disk spool (write-ahead buffer) in
+          front of network sinks (MariaDB/MySQL, Google Sheets), so
+          changes survive sink outages and process restarts, and are
+          replayed after reconnect
+
+"""
+import os
+import re
+import json
+import time
+import zlib
+import pickle
+import struct
+import threading
+import traceback
+import metrics_classes as MC
+
+### Record header:  payload length; CRC-32 of payload
+HEADER = struct.Struct('<II')
+
+########################################################################
+########################################################################
+
+class PYLOGIX_SPOOL:
+    """Segmented append-only files of checksummed change batches"""
+
+    rgx_segment = re.compile(r'^spool_(\d{12})[.]dat$')
+
+    ################################
+    def __init__(self,spool_dir,*args
+                ,segment_bytes=16<<20
+                ,fsync=True
+                ,debug=False
+                ,**kwargs
+                ):
+        """
+    spool_dir:  directory for segment files and cursor file
+segment_bytes:  start new segment file when current reaches this size
+        fsync:  fsync each appended batch to disk
+        debug:  Set to True to send debugging info to stdout
+
+Positions in the spool are (segment number,byte offset) tuples
+
+"""
+        self.spool_dir = spool_dir
+        self.segment_bytes = int(segment_bytes)
+        self.fsync = fsync
+        self.debug = debug
+        self.lock = threading.Lock()
+        os.makedirs(self.spool_dir,exist_ok=True)
+
+        ### Find last segment; truncate any partly-written record at
+        ### its end, left by a crash
+        seqs = self.segments() or [0]
+        self.seq = seqs[-1]
+        path = self.path(self.seq)
+        offset = 0
+        if os.path.exists(path):
+            for record,next_offset in self.scan(path,0):
+                offset = next_offset
+        self.fOut = open(path,'ab')
+        if self.fOut.tell() > offset:
+            if self.debug: print(dict(spool_truncated=path,offset=offset))
+            self.fOut.truncate(offset)
+            self.fOut.seek(offset)
+        self.offset = offset
+
+    ################################
+    def path(self,seq):
+        """Return path of segment file seq"""
+        return os.path.join(self.spool_dir,'spool_{0:012d}.dat'.format(seq))
+
+    ################################
+    def segments(self):
+        """Return sorted list of existing segment numbers"""
+        return sorted([int(match.groups()[0])
+                       for match in map(self.rgx_segment.match
+                                       ,os.listdir(self.spool_dir)
+                                       )
+                       if match
+                      ])
+
+    ################################
+    def scan(self,path,offset,limit=None):
+        """
+Yield (record,next offset) for valid records in segment file path,
+starting at offset, stopping before limit or at first invalid record
+
+"""
+        with open(path,'rb') as fIn:
+            fIn.seek(offset)
+            while None is limit or offset < limit:
+                header = fIn.read(HEADER.size)
+                if len(header) < HEADER.size: return
+                length,crc = HEADER.unpack(header)
+                payload = fIn.read(length)
+                if len(payload) < length or zlib.crc32(payload) != crc:
+                    if self.debug: print(dict(spool_bad_record=path
+                                             ,offset=offset
+                                             )
+                                        )
+                    return
+                offset += HEADER.size + length
+                yield pickle.loads(payload),offset
+
+    ################################
+    def append(self,changeds,now):
+        """Append one batch of changes; return spool end position"""
+        payload = pickle.dumps((changeds,now,),pickle.HIGHEST_PROTOCOL)
+        with self.lock:
+            if self.offset >= self.segment_bytes:
+                self.fOut.close()
+                self.seq += 1
+                self.offset = 0
+                self.fOut = open(self.path(self.seq),'ab')
+            self.fOut.write(HEADER.pack(len(payload),zlib.crc32(payload)))
+            self.fOut.write(payload)
+            self.fOut.flush()
+            if self.fsync: os.fsync(self.fOut.fileno())
+            self.offset += HEADER.size + len(payload)
+            return (self.seq,self.offset,)
+
+    ################################
+    def end(self):
+        """Return spool end position"""
+        with self.lock: return (self.seq,self.offset,)
+
+    ################################
+    def read(self,pos,limit,max_rows):
+        """
+Read batches from pos up to limit position, until at least max_rows
+rows (or one batch) have been read; return (list of batches,new pos)
+
+- A bad record in a completed segment skips the rest of that segment
+
+"""
+        batches = list()
+        nrows = 0
+        seq,offset = pos
+        while (seq,offset,) < tuple(limit) and nrows < max_rows:
+            seg_limit = limit[1] if seq == limit[0] else None
+            path = self.path(seq)
+            if os.path.exists(path):
+                for batch,offset in self.scan(path,offset,seg_limit):
+                    batches.append(batch)
+                    nrows += len(batch[0])
+                    if nrows >= max_rows: return batches,(seq,offset,)
+            if seq == limit[0]: break
+            seq,offset = seq+1,0
+        return batches,(seq,offset,)
+
+    ################################
+    def prune(self,pos):
+        """Remove segments wholly before position pos"""
+        for seq in self.segments():
+            if seq >= pos[0]: break
+            os.remove(self.path(seq))
+            if self.debug: print(dict(spool_removed=self.path(seq)))
+
+    ################################
+    def load_state(self):
+        """Return saved drainer state, or None"""
+        path = os.path.join(self.spool_dir,'cursor.json')
+        if not os.path.exists(path): return None
+        with open(path) as fIn: return json.load(fIn)
+
+    ################################
+    def save_state(self,state):
+        """Save drainer state atomically"""
+        path = os.path.join(self.spool_dir,'cursor.json')
+        with open(path+'.tmp','w') as fOut:
+            json.dump(state,fOut)
+            fOut.flush()
+            if self.fsync: os.fsync(fOut.fileno())
+        os.replace(path+'.tmp',path)
+
+    ################################
+    def close(self):
+        with self.lock: self.fOut.close()
+
+########################################################################
+########################################################################
+
+class PYLOGIX_SPOOLED_SINK:
+    """Spool in front of one PYLOGIX_LOGGER, with a drainer thread that
+forwards spooled changes to it, and replays backlog after an outage"""
+
+    ################################
+    def __init__(self,pylogger,spool_dir,*args
+                ,batch_rows=10000
+                ,replay_rows_per_second=0
+                ,retry_seconds=1.0
+                ,max_retry_seconds=60.0
+                ,tick_seconds=1.0
+                ,name=None
+                ,metrics=None
+                ,debug=False
+                ,**kwargs
+                ):
+        """
+              pylogger:  PYLOGIX_LOGGER instance (sink)
+             spool_dir:  directory for this sink's spool
+            batch_rows:  maximum rows per call to sink (at least one
+                         spooled cycle is always sent)
+replay_rows_per_second:  limit on rate of backlog replay; 0 => none
+         retry_seconds:  initial wait after sink failure; doubles after
+                         each further failure, up to max_retry_seconds
+          tick_seconds:  interval, s, for calling sink's .tick() when idle
+                  name:  name for thread and statistics
+               metrics:  metrics_classes.PYLOGIX_METRICS, to time each
+                         send to sink, and count send failures; default
+                         is a private instance
+                 debug:  Set to True to send debugging info to stdout
+
+Changes are forwarded at least once:  spool position is saved only
+after the sink has accepted and flushed a batch.  Each batch sent to
+the sink may combine many spooled cycles.
+
+After an outage, everything spooled up to the first successful send is
+backlog; newer, live, changes are sent first on each pass, and backlog
+is then replayed at up to replay_rows_per_second
+
+"""
+        self.pylogger = pylogger
+        self.name = name or type(pylogger).__name__
+        self.debug = debug
+        self.spool = PYLOGIX_SPOOL(spool_dir,debug=debug,**kwargs)
+        self.batch_rows = max([1,int(batch_rows)])
+        self.rate = float(replay_rows_per_second or 0)
+        self.retry_seconds = float(retry_seconds)
+        self.max_retry_seconds = float(max_retry_seconds)
+        self.tick_seconds = float(tick_seconds)
+
+        ### Drainer state:  next position to send; start of live data
+        ### and next live position, while replaying backlog, else None
+        state = self.spool.load_state() or dict()
+        first_seq = (self.spool.segments() or [0])[0]
+        self.cursor = tuple(state.get('cursor') or (first_seq,0,))
+        self.mark = state.get('mark') and tuple(state['mark'])
+        self.live = state.get('live') and tuple(state['live'])
+
+        self.outage = False
+        self.tokens = float(self.batch_rows)
+        self.t_tokens = time.monotonic()
+
+        ### Counters:  batches spooled; rows sent; send failures
+        self.spooled = self.sent = self.failures = 0
+
+        ### Stage timing:  sink call, with flush, per batch sent
+        metrics = metrics or MC.PYLOGIX_METRICS()
+        self.h_call = metrics.histogram('sink_call',sink=self.name)
+        metrics.add_counters(self,dict(errors='failures')
+                            ,source='spool',sink=self.name
+                            )
+
+        self.event = threading.Event()      ### Set on append, close
+        self.stop = threading.Event()       ### Set on close
+        self.closing = False
+        self.thread = threading.Thread(target=self.run
+                                      ,name='spool-{0}'.format(self.name)
+                                      ,daemon=True
+                                      )
+        self.thread.start()
+
+    ################################
+    def log_changeds(self,changeds,now,*args,**kwargs):
+        """Append one cycle's changes to spool; same signature as
+PYLOGIX_LOGGER.log_changeds"""
+        if not changeds: return
+        self.spool.append(changeds,now)
+        self.spooled += 1
+        self.event.set()
+
+    ################################
+    def send(self,pos,limit,max_rows):
+        """Send spooled batches from pos, before limit, to sink; return
+(rows sent,new position)"""
+        batches,new_pos = self.spool.read(pos,limit,max_rows)
+        if not batches: return 0,pos
+        changeds = list()
+        for batch_changeds,now in batches: changeds.extend(batch_changeds)
+        t0 = time.monotonic()
+        self.pylogger.log_changeds(changeds,now)
+        self.pylogger.flush()
+        self.h_call.observe(time.monotonic() - t0)
+        self.sent += len(changeds)
+        return len(changeds),new_pos
+
+    ################################
+    def save(self):
+        self.spool.save_state(dict(cursor=self.cursor
+                                  ,mark=self.mark
+                                  ,live=self.live
+                                  )
+                             )
+        self.spool.prune(self.cursor)
+
+    ################################
+    def drain_once(self):
+        """Send one pass of live and backlog data; return rows sent"""
+        end = self.spool.end()
+        nsent = 0
+
+        if None is self.mark:
+            ### During outage, probe sink with one spooled cycle
+            nsent,self.cursor = self.send(self.cursor,end
+                                         ,self.outage and 1 or self.batch_rows
+                                         )
+            if nsent and self.outage:
+                ### First success after outage:  what is spooled now is
+                ### backlog; anything after it is live
+                self.outage = False
+                self.mark = self.live = end
+                self.tokens = 0.0
+                self.t_tokens = time.monotonic()
+        else:
+            ### Live data first
+            nsent,self.live = self.send(self.live,end,self.batch_rows)
+
+            ### Then backlog, rate-limited
+            max_rows = self.batch_rows
+            if self.rate:
+                now = time.monotonic()
+                self.tokens = min([self.batch_rows
+                                  ,self.tokens + (now-self.t_tokens) * self.rate
+                                  ])
+                self.t_tokens = now
+                max_rows = int(self.tokens)
+            if max_rows > 0:
+                n,self.cursor = self.send(self.cursor,self.mark,max_rows)
+                self.tokens -= n
+                nsent += n
+            if self.cursor >= self.mark:
+                ### Backlog replayed
+                self.cursor,self.mark,self.live = self.live,None,None
+                if self.debug: print(dict(spool_replayed=self.name))
+
+        if nsent: self.save()
+        return nsent
+
+    ################################
+    def run(self):
+        """Drainer thread"""
+        delay = self.retry_seconds
+        while True:
+            try:
+                nsent = self.drain_once()
+                delay = self.retry_seconds
+            except:
+                ### Sink failed:  drop anything it holds, and resend from
+                ### spool after a delay
+                self.failures += 1
+                self.outage = True
+                if self.debug: traceback.print_exc()
+                try: self.pylogger.discard()
+                except: traceback.print_exc()
+                if self.closing: break
+                self.stop.wait(delay)
+                delay = min([delay*2,self.max_retry_seconds])
+                continue
+
+            ### On close, stop when nothing is left, or when replaying
+            ### backlog; unsent backlog stays in spool for next start
+            if self.closing and not (nsent and None is self.mark): break
+            if nsent: continue
+            if None is self.mark:
+                self.event.wait(self.tick_seconds)
+                self.event.clear()
+            else:
+                ### Replaying backlog:  wait for rate-limit tokens
+                self.event.wait(min([self.tick_seconds
+                                    ,1.0 / (self.rate or 1.0)
+                                    ])
+                               )
+                self.event.clear()
+            try: self.pylogger.tick()
+            except: traceback.print_exc()
+
+    ################################
+    def depth(self):
+        """Return approximate number of unsent spooled bytes"""
+        end = self.spool.end()
+        if end[0] == self.cursor[0]: return end[1] - self.cursor[1]
+        return ((end[0] - self.cursor[0]) * self.spool.segment_bytes
+                + end[1] - self.cursor[1]
+               )
+
+    ################################
+    def stats(self):
+        """Return dict of spool statistics"""
+        return dict(name=self.name,spool_bytes=self.depth()
+                   ,replaying=not (None is self.mark)
+                   ,spooled=self.spooled,sent=self.sent
+                   ,failures=self.failures
+                   )
+
+    ################################
+    def close(self,timeout=None):
+        """Send what can be sent, stop drainer thread, close sink"""
+        self.closing = True
+        self.stop.set()
+        self.event.set()
+        self.thread.join(timeout)
+        if self.thread.is_alive(): return  ### Timed out; sink still busy
+        self.spool.close()
+        self.pylogger.close()
@@ -0,0 +1,101 @@
+"""
+sqlite_query.py
+
+Purpose:  read values of selected tags, over a time range, from the
+          SQLite database written by PYLOGIX_LOGGER_SQLITE (--sqlite=),
+          with one primary key range scan per tag; no server is needed,
+          and the logger may keep writing (WAL mode) while this reads
+
+Usage:  python sqlite_query.py --sqlite=log.sqlite3 \\
+                               [--tag=TAG0[ --tag=TAG1[ ...]]] \\
+                               [--start=2024-01-31T10:00] \\
+                               [--end=2024-01-31T10:05]
+
+          - Prints 'TagName,Value,Timestamp' rows, as CSV, to stdout
+          - --start is inclusive; --end is exclusive; both are UTC
+
+From Python:
+
+  import sqlite_query
+  rows = sqlite_query.read('log.sqlite3',tags=['TAG0'],start=...,end=...)
+
+"""
+import sys
+import sqlite3
+import datetime
+
+EPOCH = datetime.datetime(1970,1,1)
+MICROSECOND = datetime.timedelta(microseconds=1)
+
+########################################################################
+def parse_time(s):
+    """Return UTC datetime from ISO string, or None"""
+    if None is s or isinstance(s,datetime.datetime): return s
+    return datetime.datetime.fromisoformat(s)
+
+########################################################################
+def read(sqlite_name,tags=None,start=None,end=None):
+    """
+Return list of (TagName,Value,Timestamp) triplets for tags in
+[start,end), sorted by timestamp, then tag; Timestamp is UTC datetime
+
+sqlite_name:  path of SQLite database, as given to PYLOGIX_LOGGER_SQLITE
+       tags:  sequence of tag names; None => all tags
+      start:  UTC datetime or ISO string, inclusive; None => no limit
+        end:  UTC datetime or ISO string, exclusive; None => no limit
+
+"""
+    start,end = parse_time(start),parse_time(end)
+    lo = start and (start - EPOCH) // MICROSECOND or -(1 << 63)
+    hi = end and (end - EPOCH) // MICROSECOND or (1 << 63) - 1
+
+    cn = sqlite3.connect('file:{0}?mode=ro'.format(sqlite_name),uri=True)
+    try:
+        tag_ids = dict([(tag_name,tag_id,) for tag_id,tag_name
+                        in cn.execute('SELECT tag_id,tag_name FROM tags')
+                       ])
+        if tags: tag_ids = dict([(tag,tag_ids[tag],) for tag in tags
+                                 if tag in tag_ids
+                                ])
+
+        ### One range scan of the (tag_id,timestamp) primary key per tag
+        rows = list()
+        for tag_name,tag_id in tag_ids.items():
+            rows.extend([(micros,tag_name,value,) for micros,value
+                         in cn.execute('SELECT timestamp,tag_value'
+                                       ' FROM tag_log WHERE tag_id=?'
+                                       ' AND timestamp>=? AND timestamp<?'
+                                      ,(tag_id,lo,hi,)
+                                      )
+                        ])
+    finally:
+        cn.close()
+
+    rows.sort()
+    return [(tag_name,value,EPOCH + micros * MICROSECOND,)
+            for micros,tag_name,value in rows
+           ]
+
+if "__main__" == __name__:
+
+    av1 = sys.argv[1:]
+
+    ### 1) SQLite database:  --sqlite=log.sqlite3
+
+    sqlite_name = ([None]+[a[9:] for a in av1 if a[:9]=='--sqlite='])[-1]
+    assert sqlite_name,__doc__
+
+    ### 2) Tags, and UTC time range [start,end)
+
+    tags = [a[6:] for a in av1 if a[:6]=='--tag='] or None
+    start = ([None]+[a[8:] for a in av1 if a[:8]=='--start='])[-1]
+    end = ([None]+[a[6:] for a in av1 if a[:6]=='--end='])[-1]
+
+    for tag,value,timestamp in read(sqlite_name,tags=tags,start=start
+                                   ,end=end
+                                   ):
+        sys.stdout.write('{0},{1},{2}\n'.format(
+                           tag,value,timestamp.isoformat(
+                                       timespec='microseconds'
+                                     )
+                         ))
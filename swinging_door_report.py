@@ -0,0 +1,117 @@
+"""
+swinging_door_report.py
+
+Purpose:  measure, offline, what swinging-door compression would do to
+          a recorded CSV log "Name,Value,Timestamp" (cf. --flat-csv):
+          per tag, samples in, points archived, compression ratio, and
+          maximum and RMS error of the trend rebuilt by linear
+          interpolation between archived points, at every sample
+
+Usage:  python swinging_door_report.py --csv=csv_log.csv \\
+                                       --filter=PATTERN:sdc=0.5[ ...]
+
+          - PATTERN is a glob of tag names, as with --filter in
+            pylogix_logger_drbitboy.py; the last matching rule applies
+          - Tags with no sdc deviation are reported as uncompressed;
+            non-numeric values are skipped
+
+"""
+import sys
+import math
+import bisect
+import datetime
+import filter_classes as FC
+
+########################################################################
+def seconds(stamp):
+    """Return seconds since epoch of ISO timestamp, from log"""
+    return datetime.datetime.fromisoformat(stamp.strip()).timestamp()
+
+########################################################################
+def load(csv_path):
+    """Return dict of tag name => list of (seconds,value) samples"""
+    samples = dict()
+    with open(csv_path) as fIn:
+        for line in fIn:
+            try:
+                name,value,stamp = line.rstrip('\n').rsplit(',',2)
+                value = float(value)
+            except ValueError:
+                continue          ### Blank line, or non-numeric value
+            samples.setdefault(name,list()).append((seconds(stamp),value,))
+    return samples
+
+########################################################################
+def compress(points,deviation):
+    """Return list of (seconds,value) points archived by swinging door"""
+    door = FC.PYLOGIX_SWINGING_DOOR(deviation)
+    archived = list()
+    for t,value in points:
+        archived.extend([(stamp,v,) for v,stamp in door.add(t,value,t)])
+    archived.extend([(stamp,v,) for v,stamp in door.flush()])
+    return archived
+
+########################################################################
+def errors(points,archived):
+    """Return maximum and RMS error of linear interpolation between
+archived points, at each of points"""
+    ts = [t for t,v in archived]
+    max_error = sumsq = 0.0
+    for t,value in points:
+        k = bisect.bisect_left(ts,t)
+        if k < len(ts) and ts[k] == t:
+            rebuilt = archived[k][1]
+        elif 0 == k or k == len(ts):
+            rebuilt = archived[min([k,len(ts)-1])][1]
+        else:
+            (t0,v0),(t1,v1) = archived[k-1],archived[k]
+            rebuilt = v0 + (v1 - v0) * (t - t0) / (t1 - t0)
+        error = abs(value - rebuilt)
+        max_error = max([max_error,error])
+        sumsq += error * error
+    return max_error,math.sqrt(sumsq / (len(points) or 1))
+
+if "__main__" == __name__:
+
+    av1 = sys.argv[1:]
+
+    ### 1) CSV log to read:  --csv=csv_log.csv
+
+    csv_path = ([None]+[a[6:] for a in av1 if a[:6]=='--csv='])[-1]
+    assert csv_path,__doc__
+
+    ### 2) Compression rules:  --filter=PATTERN:sdc=0.5[ --filter=...]
+
+    rules = [FC.PYLOGIX_FILTER_RULE.parse(a[9:])
+             for a in av1 if a[:9]=='--filter='
+            ]
+
+    samples = load(csv_path)
+    tags = sorted(samples)
+    deviations = [rule and rule.deviation or 0.0
+                  for rule in FC.PYLOGIX_CHANGE_FILTER(tags,rules).rules
+                 ]
+
+    fmt = '{0:<32} {1:>10} {2:>10} {3:>8} {4:>12} {5:>12} {6:>10}'
+    print(fmt.format('tag','samples','archived','ratio','max_error'
+                    ,'rms_error','deviation'
+                    )
+         )
+    total_in = total_out = 0
+    for tag,deviation in zip(tags,deviations):
+        points = samples[tag]
+        archived = deviation and compress(points,deviation) or points
+        max_error,rms_error = errors(points,archived)
+        total_in += len(points)
+        total_out += len(archived)
+        print(fmt.format(tag,len(points),len(archived)
+                        ,'{0:.2f}'.format(len(points)/(len(archived) or 1))
+                        ,'{0:.6g}'.format(max_error)
+                        ,'{0:.6g}'.format(rms_error)
+                        ,'{0:.6g}'.format(deviation)
+                        )
+             )
+    print(fmt.format('TOTAL',total_in,total_out
+                    ,'{0:.2f}'.format(total_in/(total_out or 1)),'','',''
+                    )
+         )
@@ -0,0 +1,239 @@
+"""
+worker_classes.py
+
+Purpose:  run each logger (sink) from logger_classes.py on its own
+          thread, fed from its own bounded queue, so a slow sink does
+          not delay the acquisition loop or the other sinks
+
+"""
+import time
+import pickle
+import tempfile
+import threading
+import traceback
+import collections
+import metrics_classes as MC
+
+########################################################################
+########################################################################
+
+class PYLOGIX_SINK_WORKER:
+    """Bounded queue plus worker thread in front of one PYLOGIX_LOGGER"""
+
+    ### Queue overflow policies
+    POLICIES = ('block','drop-oldest','spill',)
+
+    ################################
+    def __init__(self,pylogger,*args
+                ,maxsize=1000
+                ,policy='block'
+                ,spill_dir=None
+                ,tick_seconds=1.0
+                ,name=None
+                ,metrics=None
+                ,debug=False
+                ,**kwargs
+                ):
+        """
+ pylogger:  PYLOGIX_LOGGER instance (sink) to run on worker thread
+  maxsize:  maximum number of change batches held in memory
+   policy:  what to do when the queue is full:
+            - 'block':  wait until the worker makes room
+            - 'drop-oldest':  discard oldest queued batch
+            - 'spill':  write batches to a temporary file on disk,
+                        and feed them back to the sink in order
+spill_dir:  directory for spill file; default is system temp dir
+tick_seconds:  interval, s, for calling sink's .tick() when idle
+     name:  name for thread and statistics; default is sink class name
+  metrics:  metrics_classes.PYLOGIX_METRICS, to time each batch's wait
+            in queue and sink call, and to count errors, drops and
+            spills; default is a private instance
+    debug:  Set to True to send debugging info to stdout
+
+"""
+        assert policy in self.POLICIES,('Invalid queue overflow policy'
+                                        ' [{0}]; must be one of {1}'
+                                        .format(policy,self.POLICIES)
+                                       )
+        self.pylogger = pylogger
+        self.maxsize = max([1,int(maxsize)])
+        self.policy = policy
+        self.spill_dir = spill_dir
+        self.tick_seconds = float(tick_seconds)
+        self.name = name or type(pylogger).__name__
+        self.debug = debug
+
+        self.queue = collections.deque()
+        self.cv = threading.Condition()
+        self.closing = False
+
+        ### Spill file, opened on first overflow; read and write offsets
+        self.spill_file = None
+        self.spill_read = self.spill_write = 0
+        self.spill_pending = 0
+
+        ### Counters:  batches queued, processed, dropped, spilled;
+        ###            sink exceptions
+        self.queued = self.processed = self.dropped = self.spilled = 0
+        self.errors = 0
+
+        ### Lag, s, between enqueue and start of sink call:  last; max
+        self.last_lag = self.max_lag = 0.0
+
+        ### Stage timings:  queue wait (lag); sink call
+        metrics = metrics or MC.PYLOGIX_METRICS()
+        self.h_wait = metrics.histogram('queue_wait',sink=self.name)
+        self.h_call = metrics.histogram('sink_call',sink=self.name)
+        metrics.add_counters(self,dict(errors='errors'
+                                      ,sink_dropped='dropped'
+                                      ,sink_spilled='spilled'
+                                      )
+                            ,source='sink',sink=self.name
+                            )
+
+        self.thread = threading.Thread(target=self.run
+                                      ,name='sink-{0}'.format(self.name)
+                                      ,daemon=True
+                                      )
+        self.thread.start()
+
+    ################################
+    def log_changeds(self,changeds,now,*args,**kwargs):
+        """
+Queue one cycle's changes for the sink; same signature as
+PYLOGIX_LOGGER.log_changeds, so this worker can stand in for the sink
+
+- Cycles without changes are not queued; sinks do nothing for them
+
+"""
+        if not changeds: return
+
+        item = (changeds,now,time.monotonic(),)
+
+        with self.cv:
+            self.queued += 1
+
+            ### Once spilling, keep spilling until spill is drained, to
+            ### keep batches in order
+            if self.spill_pending or (len(self.queue) >= self.maxsize
+                                      and 'spill' == self.policy
+                                     ):
+                self.spill(item)
+
+            else:
+                if len(self.queue) >= self.maxsize:
+                    if 'drop-oldest' == self.policy:
+                        self.queue.popleft()
+                        self.dropped += 1
+                    else:
+                        while (len(self.queue) >= self.maxsize
+                               and not self.closing
+                              ):
+                            self.cv.wait()
+                self.queue.append(item)
+
+            self.cv.notify_all()
+
+    ################################
+    def spill(self,item):
+        """Append item to spill file; call with self.cv held"""
+        if None is self.spill_file:
+            self.spill_file = tempfile.TemporaryFile(prefix='pylogix_spill_'
+                                                    ,dir=self.spill_dir
+                                                    )
+        self.spill_file.seek(self.spill_write)
+        pickle.dump(item,self.spill_file)
+        self.spill_write = self.spill_file.tell()
+        self.spill_pending += 1
+        self.spilled += 1
+
+    ################################
+    def unspill(self):
+        """Return next item from spill file; call with self.cv held"""
+        self.spill_file.seek(self.spill_read)
+        item = pickle.load(self.spill_file)
+        self.spill_read = self.spill_file.tell()
+        self.spill_pending -= 1
+        if not self.spill_pending:
+            ### Spill drained:  reuse file from the start
+            self.spill_file.seek(0)
+            self.spill_file.truncate()
+            self.spill_read = self.spill_write = 0
+        return item
+
+    ################################
+    def run(self):
+        """
+Worker thread:  pass queued batches to the sink, in order; call sink's
+.tick() when idle, for time-based flushing
+
+"""
+        while True:
+            item = None
+            with self.cv:
+                if not (self.queue or self.spill_pending or self.closing):
+                    self.cv.wait(self.tick_seconds)
+                if self.queue: item = self.queue.popleft()
+                elif self.spill_pending: item = self.unspill()
+                elif self.closing: break   ### Closing, and queue empty
+                if not (None is item): self.cv.notify_all()
+
+            if None is item:
+                try:
+                    self.pylogger.tick()
+                except:
+                    self.errors += 1
+                    traceback.print_exc()
+                continue
+
+            changeds,now,t_enq = item
+            t0 = time.monotonic()
+            self.last_lag = t0 - t_enq
+            self.max_lag = max(self.max_lag,self.last_lag)
+            self.h_wait.observe(self.last_lag)
+
+            try:
+                self.pylogger.log_changeds(changeds,now)
+            except:
+                self.errors += 1
+                traceback.print_exc()
+            self.h_call.observe(time.monotonic() - t0)
+
+            self.processed += 1
+
+    ################################
+    def depth(self):
+        """Return number of batches waiting, in memory and spilled"""
+        return len(self.queue) + self.spill_pending
+
+    ################################
+    def lag(self):
+        """Return age, s, of oldest batch waiting in memory"""
+        with self.cv:
+            if not self.queue: return 0.0
+            return time.monotonic() - self.queue[0][2]
+
+    ################################
+    def stats(self):
+        """Return dict of queue statistics"""
+        return dict(name=self.name,depth=self.depth(),lag=self.lag()
+                   ,last_lag=self.last_lag,max_lag=self.max_lag
+                   ,queued=self.queued,processed=self.processed
+                   ,dropped=self.dropped,spilled=self.spilled
+                   ,errors=self.errors
+                   )
+
+    ################################
+    def close(self,timeout=None):
+        """Stop accepting waits, drain queue to sink, join thread, and
+close sink"""
+        with self.cv:
+            self.closing = True
+            self.cv.notify_all()
+        self.thread.join(timeout)
+        if self.thread.is_alive(): return  ### Timed out; sink still busy
+
+        self.pylogger.close()
+        if not (None is self.spill_file):
+            self.spill_file.close()
+            self.spill_file = None